@@ -1,11 +1,40 @@
 import sys
-from PySide6.QtWidgets import QApplication
-from utils import set_graphviz_on_path
-from gui import MainWindow
 
-if __name__ == "__main__":
-    set_graphviz_on_path() 
+def _run_gui(probe: bool = False):
+    # ウィンドウを先に出す。Graphviz の PATH 設定/展開は最初に描くときに（utils.graphviz_available）
+    if probe:
+        import startup; startup.mark("main")
+    from PySide6.QtWidgets import QApplication
     app = QApplication(sys.argv)
+    if probe: startup.mark("qapp")
+    from gui import MainWindow
+    if probe: startup.mark("import_gui")
     w = MainWindow()
+    if probe:
+        startup.mark("window")
+        from PySide6.QtCore import QObject, QEvent, QTimer
+
+        class _FirstPaint(QObject):
+            def eventFilter(self, obj, e):
+                if e.type() == QEvent.Paint and obj is w and not self.done:
+                    self.done = True; startup.mark("first_paint")
+                    QTimer.singleShot(0, lambda: (startup.report_probe(), app.quit()))
+                return False
+        fp = _FirstPaint(); fp.done = False; w.installEventFilter(fp)
     w.show()
+    if probe: startup.mark("shown")
     sys.exit(app.exec())
+
+if __name__ == "__main__":
+    if getattr(sys, "frozen", False):  # PyInstaller --onefile でのプロセスプール用（それ以外は読み込まない。起動を軽く）
+        import multiprocessing; multiprocessing.freeze_support()
+    if len(sys.argv) > 1 and sys.argv[1] == "--batch":
+        from batch import main  # Qt を読み込まないヘッドレス経路
+        sys.exit(main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "--project":
+        from project import main
+        sys.exit(main(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "--profile-startup":
+        from startup import profile  # 自分を --startup-probe で起動し直して測る
+        sys.exit(profile(__file__))
+    _run_gui(probe=len(sys.argv) > 1 and sys.argv[1] == "--startup-probe")
@@ -0,0 +1,231 @@
+"""
+ヘッドレスのバッチ解析（Qt を import しない）。
+
+    python PyCodeDictionary.py --batch src/ "tools/**/*.py" --workers 8 --out out_dir
+
+ディレクトリ（再帰的に *.py）/ glob / ファイルを受け取り、analyze_file と
+generate_flowchart_image をプロセスプールで並列実行。ファイルごとのレポートと
+summary.json / summary.txt を出力する。--structured jsonl|sqlite を付けると、ワーカーが返した行を
+親プロセスが1つの analysis.jsonl / analysis.sqlite にまとめて書く。
+
+--watch を付けると、最初の一括解析のあと入力を監視し、内容が変わったファイルだけを解析し直して
+summary を書き直す（Ctrl+C で終了）。同じプロセスで解析するので差分解析が効く。
+"""
+import os, sys, glob, json, time, argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict, Tuple, Optional
+
+from utils import BATCH_DIR, set_graphviz_on_path
+
+def collect_files(inputs: List[str]) -> List[Tuple[str, str]]:
+    """(絶対パス, レポート名) の一覧。レポート名は基準ディレクトリからの相対パスを '__' で連結"""
+    seen, out = set(), []
+    def _add(path: str, root: str):
+        ap = os.path.abspath(path)
+        if ap in seen or not ap.endswith(".py") or not os.path.isfile(ap): return
+        seen.add(ap)
+        rel = os.path.relpath(ap, root) if root else os.path.basename(ap)
+        out.append((ap, os.path.splitext(rel)[0].replace(os.sep, "__").replace("/", "__")))
+    for inp in inputs:
+        if not os.path.exists(inp) and not glob.has_magic(inp):
+            print(f"見つかりません: {inp}", file=sys.stderr); continue
+        if os.path.isdir(inp):
+            root = os.path.abspath(inp)
+            for d, dirs, files in os.walk(root):
+                dirs[:] = sorted(x for x in dirs if not x.startswith(".") and x != "__pycache__")
+                for f in sorted(files): _add(os.path.join(d, f), root)
+        else:
+            matches = sorted(glob.glob(inp, recursive=True)) if glob.has_magic(inp) else [inp]
+            for m in matches: _add(m, os.getcwd() if glob.has_magic(inp) else "")
+    return out
+
+def _analyze_one(path: str, report_base: str, out_dir: str, flowchart: bool, use_cache: bool,
+                 style: str = "auto", style_issues: Optional[List[str]] = None, rows: bool = False,
+                 incremental: bool = False) -> Dict:
+    # ワーカープロセス側。processor はここで初めて import（親は一覧作成と集計だけ）
+    from processor import analyze_file, generate_flowchart_image, _SHARED
+    t0 = time.perf_counter()
+    rec = dict(path=path, report=os.path.join(out_dir, f"{report_base}_analysis_with_pep8.txt"), error="")
+    try:
+        with open(path, "r", encoding="utf-8") as fp:
+            code = fp.read()
+        r = analyze_file(code, path, use_cache=use_cache, out_dir=out_dir, report_base=report_base,
+                         style_backend=style, style_issues=style_issues, structured="",
+                         incremental=incremental)  # 一括解析では各ファイル1回きりなので区間ごとの結果は持たない
+        if rows:
+            from structured import result_rows
+            rec["_rows"] = result_rows(r, _SHARED.PATTERN_TAGS)  # 親が受け取ってシンクへ（summary には残さない）
+        rec.update(
+            definitions=sum(1 for k in r.def_kinds.values() if k != "external"),
+            calls=r.function_calls.n_calls,
+            style_issues=len(r.style_issues),
+            suggestions=len(r.refactor_suggestions),
+            max_cc=max((m.cc for m in r.metrics.values()), default=0),
+            syntax_error=any("構文エラー" in s for s in r.refactor_suggestions),
+        )
+        t1 = time.perf_counter(); rec["analyze_sec"] = round(t1 - t0, 4)
+        if flowchart:
+            png, svg, msg = generate_flowchart_image(r.function_calls, r.def_kinds, report_base, out_dir=out_dir,
+                                                    use_cache=use_cache)
+            rec.update(png=png or "", svg=svg or "", flowchart=msg)
+            rec["flowchart_sec"] = round(time.perf_counter() - t1, 4)
+    except Exception as e:
+        rec["error"] = f"{type(e).__name__}: {e}"
+    rec["total_sec"] = round(time.perf_counter() - t0, 4)
+    return rec
+
+def _failed(path: str, report_base: str, out_dir: str, e: BaseException) -> Dict:
+    """ワーカーが結果を返せなかった（プロセスが落ちた、結果を送れない等）ファイルのエラー行"""
+    return dict(path=path, report=os.path.join(out_dir, f"{report_base}_analysis_with_pep8.txt"),
+                error=f"{type(e).__name__}: {e}", total_sec=0.0)
+
+def run_batch(inputs: List[str], out_dir: str, workers: int, flowchart: bool = True,
+              use_cache: bool = True, quiet: bool = False, style: str = "auto", structured: str = "") -> Dict:
+    files = collect_files(inputs)
+    os.makedirs(out_dir, exist_ok=True)
+    if flowchart: set_graphviz_on_path()  # 子プロセスは PATH を引き継ぐ
+    t0 = time.perf_counter()
+    pre: Dict[str, List[str]] = {}
+    if style == "flake8-batch":
+        # 全ファイルを1回の flake8 --jobs でチェックしてから各ワーカーへ結果を渡す
+        from stylecheck import check_many_flake8
+        pre = check_many_flake8([p for p, _ in files], jobs=workers)
+    results: List[Dict] = []
+    sink = None
+    if structured:
+        from structured import open_sink
+        sink = open_sink(structured, out_dir)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            futs = {ex.submit(_analyze_one, p, base, out_dir, flowchart, use_cache,
+                              "flake8" if style == "flake8-batch" else style, pre.get(p) if pre else None,
+                              bool(sink)): (p, base)
+                    for p, base in files}
+            for i, fut in enumerate(as_completed(futs), 1):
+                try:
+                    rec = fut.result()
+                except Exception as e:
+                    rec = _failed(*futs[fut], out_dir, e)
+                results.append(rec)
+                rows = rec.pop("_rows", None)
+                if sink is not None and rows is not None: sink.add(rec["path"], rows)
+                if not quiet:
+                    mark = "NG" if rec["error"] else "ok"
+                    print(f"[{i}/{len(files)}] {mark} {rec['path']} ({rec['total_sec']:.2f}s)", file=sys.stderr)
+    finally:
+        # 途中で止まっても、そこまでの結果でシンクを閉じて summary を書く
+        if sink is not None: sink.close()
+        summary = _summarize(results, workers, style, sink.path if sink is not None else "", time.perf_counter() - t0)
+        _write_summary(out_dir, summary)
+    return summary
+
+def _summarize(results: List[Dict], workers: int, style: str, structured: str, wall: float) -> Dict:
+    results = sorted(results, key=lambda r: r["path"])
+    return dict(
+        files=len(results),
+        errors=sum(1 for r in results if r["error"]),
+        syntax_errors=sum(1 for r in results if r.get("syntax_error")),
+        definitions=sum(r.get("definitions", 0) for r in results),
+        calls=sum(r.get("calls", 0) for r in results),
+        style_issues=sum(r.get("style_issues", 0) for r in results),
+        suggestions=sum(r.get("suggestions", 0) for r in results),
+        workers=workers,
+        style=style,
+        structured=structured,
+        wall_sec=round(wall, 3),
+        cpu_sec=round(sum(r["total_sec"] for r in results), 3),
+        results=results,
+    )
+
+def watch_batch(inputs: List[str], out_dir: str, summary: Dict, flowchart: bool = True, use_cache: bool = True,
+                quiet: bool = False, style: str = "auto", structured: str = "", settle: float = 0.3,
+                rescan: float = 10.0) -> Dict:
+    """
+    run_batch の後に呼ぶ。変わったファイルはこのプロセスで1つずつ解析し直す（差分解析あり）。
+    rescan 秒ごとに入力を集め直し、新しいファイル / 消えたファイルも反映する。
+    """
+    from watcher import ContentWatcher
+    results = {r["path"]: r for r in summary["results"]}
+    style1 = "flake8" if style == "flake8-batch" else style
+    files = dict(collect_files(inputs))
+    with ContentWatcher(files, settle=settle) as w:
+        print(f"監視中（{w.backend}）: {len(files)} ファイル。Ctrl+C で終了", file=sys.stderr)
+        try:
+            while True:
+                changed = set(w.wait(rescan))
+                files = dict(collect_files(inputs)); w.set_paths(files)
+                todo = sorted(p for p in files if p in changed or p not in results)
+                gone = sorted(set(results) - set(files))
+                if not todo and not gone: continue
+                t0 = time.perf_counter()
+                sink = None
+                if structured:
+                    from structured import open_sink
+                    sink = open_sink(structured, out_dir, append=True)
+                try:
+                    for p in gone:
+                        del results[p]
+                        if sink is not None: sink.remove(p)
+                        if not quiet: print(f"削除 {p}", file=sys.stderr)
+                    for p in todo:
+                        rec = _analyze_one(p, files[p], out_dir, flowchart, use_cache, style1, None, bool(sink), True)
+                        rows = rec.pop("_rows", None)
+                        if sink is not None and rows is not None: sink.add(p, rows)
+                        results[p] = rec
+                        if not quiet:
+                            mark = "NG" if rec["error"] else "ok"
+                            print(f"[watch] {mark} {p} ({rec['total_sec']:.2f}s)", file=sys.stderr)
+                finally:
+                    if sink is not None: sink.close()
+                summary = _summarize(list(results.values()), 1, style, summary["structured"], time.perf_counter() - t0)
+                _write_summary(out_dir, summary)
+        except KeyboardInterrupt:
+            pass
+    return summary
+
+def _write_summary(out_dir: str, s: Dict):
+    with open(os.path.join(out_dir, "summary.json"), "w", encoding="utf-8") as fp:
+        json.dump(s, fp, ensure_ascii=False, indent=2)
+    lines = [
+        f"ファイル数: {s['files']}  エラー: {s['errors']}  構文エラー: {s['syntax_errors']}",
+        f"定義: {s['definitions']}  呼び出し: {s['calls']}  PEP8: {s['style_issues']}  提案: {s['suggestions']}",
+        f"ワーカー: {s['workers']}  経過: {s['wall_sec']}s  合計処理時間: {s['cpu_sec']}s",
+        "",
+    ]
+    for r in s["results"]:
+        if r["error"]:
+            lines.append(f"NG  {r['path']}: {r['error']}")
+        else:
+            lines.append(f"ok  {r['path']}: 定義 {r['definitions']} / 呼び出し {r['calls']} / PEP8 {r['style_issues']}"
+                         f" / 提案 {r['suggestions']} / 最大複雑度 {r.get('max_cc', 0)} ({r['total_sec']}s)")
+    with open(os.path.join(out_dir, "summary.txt"), "w", encoding="utf-8") as fp:
+        fp.write("\n".join(lines) + "\n")
+
+def _default_workers() -> int:
+    try: return len(os.sched_getaffinity(0))  # CI のCPU割り当てを尊重
+    except AttributeError: return os.cpu_count() or 1
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="PyCodeDictionary --batch", description="ヘッドレスでまとめて解析")
+    ap.add_argument("inputs", nargs="+", help="ディレクトリ / glob（'**' 可）/ .py ファイル")
+    ap.add_argument("-j", "--workers", type=int, default=_default_workers(), help="ワーカープロセス数（既定: CPU数）")
+    ap.add_argument("-o", "--out", default=BATCH_DIR, help=f"出力先（既定: {BATCH_DIR}）")
+    ap.add_argument("--no-flowchart", action="store_true", help="フローチャートを出力しない")
+    ap.add_argument("--no-cache", action="store_true", help="解析キャッシュを使わない")
+    ap.add_argument("--style", choices=["auto", "inprocess", "flake8", "flake8-batch"], default="auto",
+                    help="PEP8チェック方式（flake8-batch: 全ファイルを1回の flake8 --jobs で実行）")
+    ap.add_argument("--structured", choices=["jsonl", "sqlite"], default="",
+                    help="定義/呼び出し/タグ/PEP8/提案を analysis.jsonl か analysis.sqlite にもまとめて出力")
+    ap.add_argument("--watch", action="store_true", help="一括解析のあと監視し、内容が変わったファイルだけ解析し直す")
+    ap.add_argument("-q", "--quiet", action="store_true", help="進捗を表示しない")
+    a = ap.parse_args(argv)
+    s = run_batch(a.inputs, a.out, max(1, a.workers), flowchart=not a.no_flowchart,
+                  use_cache=not a.no_cache, quiet=a.quiet, style=a.style, structured=a.structured)
+    print(f"{s['files']} files, {s['errors']} errors, {s['wall_sec']}s → {os.path.join(a.out, 'summary.txt')}")
+    if a.watch:
+        s = watch_batch(a.inputs, a.out, s, flowchart=not a.no_flowchart, use_cache=not a.no_cache,
+                        quiet=a.quiet, style=a.style, structured=a.structured)
+    return 1 if s["errors"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
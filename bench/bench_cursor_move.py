@@ -0,0 +1,87 @@
+"""
+エディタのカーソル移動レイテンシのベンチマーク（検索ヒット多数のとき）。
+
+旧実装（カーソル移動のたびに現在行 + 全ヒット分の ExtraSelection を作り直す）と
+現在の CodeEditor（現在行の1件だけ。ヒットは paintEvent で表示中の行にだけ重ね描き）を比べる。
+1回の移動 = setTextCursor + ビューポートの再描画。
+
+    QT_QPA_PLATFORM=offscreen python bench/bench_cursor_move.py             # 既定: 1万ヒット
+    QT_QPA_PLATFORM=offscreen python bench/bench_cursor_move.py --hits 50000 --moves 500
+"""
+import os, sys, time, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from PySide6.QtWidgets import QApplication, QTextEdit  # noqa: E402
+from PySide6.QtGui import QColor, QTextCharFormat, QTextCursor  # noqa: E402
+
+
+def _legacy_highlight_current_line(self):
+    # 旧 CodeEditor._highlight_current_line（比較用にそのまま保持）
+    sels = []
+    fmt_line = QTextCharFormat()
+    fmt_line.setBackground(QColor(70, 110, 225, 60))
+    sel_line = QTextEdit.ExtraSelection()
+    sel_line.cursor = self.textCursor()
+    sel_line.format = fmt_line
+    sels.append(sel_line)
+    for (start, length) in self._search_positions:
+        c = self.textCursor()
+        c.setPosition(start)
+        c.setPosition(start + length, QTextCursor.KeepAnchor)
+        f = QTextCharFormat()
+        f.setBackground(QColor(255,255,0,150))
+        f.setForeground(QColor(200,0,0))
+        e = QTextEdit.ExtraSelection()
+        e.cursor = c; e.format = f
+        sels.append(e)
+    self.setExtraSelections(sels)
+
+def make_text(hits: int) -> str:
+    """1行に `needle` が2つずつ入った hits/2 行のテキスト"""
+    return "".join(f"row {i:06d} = needle + needle  # filler text for width\n" for i in range(hits // 2))
+
+def measure(editor, moves: int) -> float:
+    """1回あたりの平均秒数（右へ1文字 → 再描画）"""
+    c = editor.textCursor(); c.setPosition(0); editor.setTextCursor(c)
+    QApplication.processEvents()
+    t0 = time.perf_counter()
+    for _ in range(moves):
+        c.movePosition(QTextCursor.Right)
+        editor.setTextCursor(c)
+        editor.viewport().repaint()
+    return (time.perf_counter() - t0) / moves
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--hits", type=int, default=10000)
+    ap.add_argument("--moves", type=int, default=200)
+    a = ap.parse_args(argv)
+    app = QApplication.instance() or QApplication([])
+    from gui import CodeEditor
+
+    class LegacyEditor(CodeEditor):
+        _highlight_current_line = _legacy_highlight_current_line
+        def paintEvent(self, e):  # 旧実装にオーバーレイは無い
+            super(CodeEditor, self).paintEvent(e)
+
+    text = make_text(a.hits)
+    results = {}
+    for name, cls in (("legacy", LegacyEditor), ("overlay", CodeEditor)):
+        ed = cls(); ed.resize(900, 700); ed.show()
+        app.processEvents()  # 表示とレイアウトを計測の前に済ませる
+        ed.setPlainText(text)
+        positions, i = [], 0
+        while len(positions) < a.hits:
+            i = text.find("needle", i)
+            if i < 0: break
+            positions.append((i, 6)); i += 6
+        ed._search_positions, ed._search_starts = positions, [s for s, _ in positions]
+        ed._search_index = 0
+        results[name] = measure(ed, a.moves)
+        ed.close()
+    old, new = results["legacy"], results["overlay"]
+    print(f"hits={a.hits}  moves={a.moves}  legacy={old*1000:.2f}ms/move  overlay={new*1000:.3f}ms/move  x{old/new:.1f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""
+差分解析（processor.analyze_file(incremental=True)）のベンチマーク。
+
+同じファイルを「全体解析」「差分解析（初回）」「関数1つの中を編集」「先頭に1行追加（以降の行がずれる）」
+「変更なし」で解析し、時間と使い回した区間の数を出す。毎回、全体解析の結果と一致することも確認する。
+
+    python bench/bench_incremental.py                  # 既定: 約2万行の生成モジュール
+    python bench/bench_incremental.py --lines 5000
+    python bench/bench_incremental.py path/to/module.py
+"""
+import os, sys, time, tempfile, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import processor  # noqa: E402
+from bench_single_pass import make_module  # noqa: E402
+
+def _edit_inside(code: str) -> str:
+    """真ん中あたりのトップレベル関数/クラスの本体に1行足す"""
+    lines = code.splitlines(True)
+    heads = [i for i, l in enumerate(lines) if l.startswith(("def ", "class "))]
+    i = heads[len(heads) // 2] + 1
+    while i < len(lines) and not lines[i].strip(): i += 1
+    indent = lines[i][:len(lines[i]) - len(lines[i].lstrip())] or "    "
+    return "".join(lines[:i] + [f"{indent}_bench_probe = 1\n"] + lines[i:])
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("path", nargs="?", help="計測する .py（省略時は合成モジュール）")
+    ap.add_argument("--lines", type=int, default=20000)
+    a = ap.parse_args(argv)
+    if a.path:
+        with open(a.path, "r", encoding="utf-8") as fp: code = fp.read()
+    else:
+        code = make_module(a.lines)
+    path = a.path or "bench_module.py"
+    out = tempfile.mkdtemp()
+
+    def run(c: str, inc: bool):
+        t0 = time.perf_counter()
+        r = processor.analyze_file(c, path, use_cache=False, out_dir=out, structured="", incremental=inc)
+        return r, processor._SHARED.PATTERN_TAGS, time.perf_counter() - t0
+
+    full = run(code, False)
+    print(f"lines={code.count(chr(10))}  full={full[2]*1000:.1f}ms")
+    edited = _edit_inside(code)
+    for label, c in (("cold", code), ("edit", edited), ("shift", "# bench\n" + edited), ("same", "# bench\n" + edited)):
+        r, tags, dt = run(c, True)
+        st = processor.incremental_stats(path) or {}
+        ref = full if c is code else run(c, False)
+        if (r, tags) != ref[:2]:
+            print(f"結果が一致しません（{label}）"); return 1
+        print(f"  {label:6} {dt*1000:8.1f}ms  区間 {st.get('units', 0)}  parse {st.get('parsed', 0)}  AST再利用 {st.get('reused', 0)}"
+              f"  PEP8やり直し {st.get('restyled', 0)}  pyflakesスタブ {st.get('stubbed', 0)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+単一パス解析エンジンのベンチマーク。
+
+旧実装（ast.parse 2回 + ast.walk 5回 + 関数ごとの ast.walk）と
+AnalysisEngine（parse 1回 + 走査 1回）を同じソースで計測し、結果が一致することも確認する。
+
+    python bench/bench_single_pass.py                # 既定: 約2万行の生成モジュール
+    python bench/bench_single_pass.py --lines 50000 --repeat 5
+    python bench/bench_single_pass.py path/to/module.py
+"""
+import os, sys, re, ast, time, argparse
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import processor  # noqa: E402
+from processor import AstAnalyzer, run_engine  # noqa: E402
+
+
+# ---- 旧実装（比較用にそのまま保持） ----
+def _legacy_nest_depth(node, depth=0) -> int:
+    if not hasattr(node, 'body') or not node.body: return depth
+    m = depth
+    for child in node.body:
+        m = max(m, _legacy_nest_depth(child, depth+1))
+    return m
+
+def _legacy_suggest_refactoring(code: str) -> List[str]:
+    sug = []
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return ["構文エラーが発生しています。コードの構文を確認してください。"]
+    if len(re.findall(r'(\w+)\s*=\s*\1', code)) > 3:
+        sug.append("同じ処理が繰り返されています。関数化を検討してください。")
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and len(node.body) > 20:
+            sug.append(f"関数 '{node.name}' が長すぎます（20行超）。分割を検討。")
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.If, ast.For, ast.While)) and _legacy_nest_depth(node) > 3:
+            sug.append("ネストが深すぎる箇所があります。フラット化を検討。")
+    used, allv = set(), set()
+    for n in ast.walk(tree):
+        if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Load): used.add(n.id)
+        elif isinstance(n, ast.Name) and isinstance(n.ctx, ast.Store): allv.add(n.id)
+    unused = (allv - used) - set(dir(processor.__builtins__))  # processor 内で評価した場合と同じ集合
+    if unused: sug.append("未使用の変数: " + ", ".join(sorted(unused)))
+    for n in ast.walk(tree):
+        if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef)) and len(n.name) < 3:
+            sug.append(f"関数 '{n.name}' の名前が短すぎます。説明的に。")
+    if "for " in code and "append(" in code:
+        sug.append("リスト作成で for+append が使われています。内包表記を検討。")
+    return sug
+
+class _LegacyAnalyzer(AstAnalyzer):
+    def _handle_function_like(self, node, is_async: bool):
+        if self._class_stack: key, kind = f"{self._class_stack[-1]}.{node.name}", "method"
+        else:                 key, kind = node.name, "function"
+        if key not in self.def_positions:
+            self.def_positions[key] = getattr(node, "lineno", 1); self.def_kinds[key] = kind
+        self.calls.setdefault(key, [])
+        if is_async: self._mark_tag(key, "async")
+        if any(isinstance(n, (ast.Yield, ast.YieldFrom)) for n in ast.walk(node)): self._mark_tag(key, "generator")
+        prev = self._current_symbol; self._current_symbol = key
+        self.generic_visit(node); self._current_symbol = prev
+
+def legacy_path(code: str):
+    refac = _legacy_suggest_refactoring(code)
+    az = _LegacyAnalyzer(); az.visit(ast.parse(code))
+    return refac, az.def_positions, az.def_kinds, az.calls, az.pattern_tags
+
+def engine_path(code: str):
+    eng = run_engine(code)
+    return eng.refactor_suggestions(code), eng.def_positions, eng.def_kinds, eng.calls, eng.pattern_tags
+
+
+# ---- 合成モジュール ----
+def make_module(target_lines: int) -> str:
+    out, i = ["import os, requests", "sess = requests.Session()", ""], 0
+    while len(out) < target_lines:
+        out += [
+            f"class Gen{i}:",
+            "    def run(self, xs):",
+            "        acc = []",
+            "        for x in xs:",
+            "            if x:",
+            "                while x > 0:",
+            "                    if x % 2:",
+            "                        acc.append(self.step(x))",
+            "                    x = x - 1",
+            "        return acc",
+            "    def step(self, v):",
+            f"        with open('f{i}.txt') as fp:",
+            "            fp.write(str(v))",
+            f"        return helper_{i}(v)",
+            "",
+            f"def helper_{i}(v):",
+            "    def inner():",
+            "        yield v",
+            "    sess.get('http://example.com')",
+            "    return list(inner())",
+            "",
+            f"async def fetch_{i}(u):",
+            f"    return await helper_{i}(u)",
+            "",
+        ]
+        i += 1
+    return "\n".join(out) + "\n"
+
+
+def _best(fn, code: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter(); fn(code); best = min(best, time.perf_counter() - t0)
+    return best
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("path", nargs="?", help="計測する .py（省略時は合成モジュール）")
+    ap.add_argument("--lines", type=int, default=20000)
+    ap.add_argument("--repeat", type=int, default=3)
+    a = ap.parse_args(argv)
+    if a.path:
+        with open(a.path, "r", encoding="utf-8") as fp: code = fp.read()
+    else:
+        code = make_module(a.lines)
+    if legacy_path(code) != engine_path(code):
+        print("結果が一致しません（旧実装と単一パス）"); return 1
+    t_old = _best(legacy_path, code, a.repeat)
+    t_new = _best(engine_path, code, a.repeat)
+    print(f"lines={code.count(chr(10))}  legacy={t_old*1000:.1f}ms  single-pass={t_new*1000:.1f}ms  x{t_old/t_new:.2f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
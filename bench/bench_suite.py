@@ -0,0 +1,206 @@
+"""
+ベンチマーク一式: 合成コーパス（bench/corpus.py の shape ごと）で解析パイプラインの各段を計測し、JSON に保存する。
+--baseline で保存済みの結果と比べ、遅くなった段があれば一覧を出して終了コード 1 を返す（CI 向け）。
+
+段（phase）:
+  parse / AstAnalyzer / engine（AnalysisEngine 単一パス）/ suggest_refactoring / style（PEP8）/ keywords
+  analyze_file（キャッシュ・差分解析なしの全体）/ build_flowchart_dot / generate_flowchart_image（Graphviz がなければ省略）
+  _svg_bbox_map（呼び出しグラフから dot と同じ形の SVG を作って読む。Graphviz の版に左右されない）
+  _fill_tree（MainWindow._fill_tree をオフスクリーンの QTreeView で。PySide6 がなければ省略）
+
+    python bench/bench_suite.py                                 # 全 shape、各3000行、3回の最小値
+    python bench/bench_suite.py --shapes deep,dense --lines 10000 -o base.json
+    python bench/bench_suite.py --baseline base.json             # 計測して base.json と比較
+    python bench/bench_suite.py --result new.json --baseline base.json   # 計測せずに2つの結果を比較
+"""
+import os, sys, gc, ast, json, time, shutil, hashlib, platform, tempfile, argparse, statistics
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import processor  # noqa: E402
+from processor import (  # noqa: E402
+    AstAnalyzer, run_engine, suggest_refactoring, perform_style_check, extract_keywords_in_code, analyze_file,
+    build_flowchart_dot, generate_flowchart_image, _svg_bbox_map, resolve_style_backend,
+)
+from utils import SAVE_DIR, graphviz_available  # noqa: E402
+from callgraph import CallGraph  # noqa: E402
+from corpus import SHAPES, make_corpus  # noqa: E402
+
+FORMAT = 1  # 結果 JSON の形式（変えたら比較を拒否する）
+PHASES = ["parse", "AstAnalyzer", "engine", "suggest_refactoring", "style", "keywords", "analyze_file",
+          "build_flowchart_dot", "generate_flowchart_image", "_svg_bbox_map", "_fill_tree"]
+
+
+def synth_svg(function_calls: CallGraph, def_kinds: Dict[str, str]) -> str:
+    """dot -Tsvg と同じ入れ子（graph0 の translate、node/edge の <g>、title + ellipse/polygon）の SVG"""
+    names = sorted(function_calls.names)
+    out = ['<?xml version="1.0" encoding="UTF-8" standalone="no"?>',
+           f'<svg xmlns="http://www.w3.org/2000/svg" width="{len(names) * 40}pt" height="800pt">',
+           '<g id="graph0" class="graph" transform="scale(1 1) rotate(0) translate(4 796)">']
+    for i, n in enumerate(names):
+        x, y = (i % 40) * 120.0, -(i // 40) * 60.0
+        shape = (f'<polygon fill="#e7f1ff" stroke="#2b6cb0" points="{x},{y} {x+100},{y} {x+100},{y-36} {x},{y-36} {x},{y}"/>'
+                 if def_kinds.get(n) == "class" or i % 2 else
+                 f'<ellipse fill="#e7f1ff" stroke="#2b6cb0" cx="{x+50}" cy="{y-18}" rx="50" ry="18"/>')
+        out.append(f'<g id="node{i+1}" class="node"><title>{n}</title>{shape}'
+                   f'<text x="{x+50}" y="{y-14}">{n}</text></g>')
+    e = 0
+    for u, v, _ in sorted(function_calls.edges()):  # dot と同じく (呼び出し元, 呼び出し先) ごとに1本
+        e += 1
+        out.append(f'<g id="edge{e}" class="edge"><title>{u}&#45;&gt;{v}</title>'
+                   f'<path fill="none" stroke="#5b8ff9" d="M0,0C10,10 20,20 30,30"/></g>')
+    out.append("</g></svg>")
+    return "\n".join(out)
+
+
+def _headless_tree():
+    """MainWindow を作らずに _fill_tree / _expand_tree を呼べる入れ物（QTreeView + ResultTreeModel）"""
+    try:
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+        from PySide6.QtWidgets import QApplication, QTreeView
+        import gui
+        from resultmodel import ResultTreeModel
+    except ImportError:
+        return None
+    app = QApplication.instance() or QApplication([])
+    w = SimpleNamespace(tree=QTreeView(), tree_model=ResultTreeModel(), _app=app)
+    w.tree.setModel(w.tree_model)
+    w._expand_tree = lambda: gui.MainWindow._expand_tree(w)
+    return lambda result: gui.MainWindow._fill_tree(w, result)
+
+
+def _phases(code: str, path: str, out_dir: str, fill_tree) -> Dict[str, Optional[Callable[[], object]]]:
+    """段ごとの計測対象（前段の結果は計測外で作っておく）。None は省略"""
+    tree = ast.parse(code)
+    result = analyze_file(code, path, use_cache=False, out_dir=out_dir, structured="", incremental=False)
+    calls, kinds = result.function_calls, result.def_kinds
+    svg = os.path.join(out_dir, "synth.svg")
+    with open(svg, "w", encoding="utf-8") as fp: fp.write(synth_svg(calls, kinds))
+    return {
+        "parse": lambda: ast.parse(code),
+        "AstAnalyzer": lambda: AstAnalyzer().visit(tree),
+        "engine": lambda: run_engine(code, tree),
+        "suggest_refactoring": lambda: suggest_refactoring(code),
+        "style": lambda: perform_style_check(path, code=code, tree=tree),
+        "keywords": lambda: extract_keywords_in_code(code),
+        "analyze_file": lambda: analyze_file(code, path, use_cache=False, out_dir=out_dir, structured="",
+                                             incremental=False),
+        "build_flowchart_dot": lambda: build_flowchart_dot(calls, kinds),
+        "generate_flowchart_image": (lambda: generate_flowchart_image(calls, kinds, "bench", out_dir, use_cache=False))
+                                    if graphviz_available() else None,
+        "_svg_bbox_map": lambda: _svg_bbox_map(svg),
+        "_fill_tree": (lambda: fill_tree(result)) if fill_tree else None,
+    }
+
+
+def _time(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """timeit と同じく計測中は GC を止める（前の段のごみの回収が次の段に入らないように）"""
+    ts = []
+    for _ in range(repeat):
+        gc.collect(); gc.disable()
+        try:
+            t0 = time.perf_counter(); fn(); ts.append(time.perf_counter() - t0)
+        finally:
+            gc.enable()
+    return {"best": min(ts), "median": statistics.median(ts)}
+
+
+def run_suite(shapes: List[str], lines: int, repeat: int, seed: int = 0, phases: Optional[List[str]] = None,
+              quiet: bool = False) -> dict:
+    fill_tree = _headless_tree() if not phases or "_fill_tree" in phases else None
+    out_dir = tempfile.mkdtemp(prefix="pcd_bench_")
+    res: Dict[str, dict] = {}
+    try:
+        for shape in shapes:
+            code = make_corpus(shape, lines, seed)
+            path = os.path.join(out_dir, f"{shape}.py")
+            with open(path, "w", encoding="utf-8") as fp: fp.write(code)
+            todo = _phases(code, path, out_dir, fill_tree)
+            entry = {"lines": code.count("\n"), "digest": hashlib.blake2b(code.encode(), digest_size=8).hexdigest(),
+                     "phases": {}}
+            for name in PHASES:
+                fn = todo.get(name)
+                if fn is None or (phases and name not in phases): continue
+                entry["phases"][name] = t = _time(fn, repeat)
+                if not quiet: print(f"  {shape:6} {name:26} {t['best']*1000:9.2f}ms  (median {t['median']*1000:.2f})")
+            res[shape] = entry
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+    return {
+        "format": FORMAT,
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+            "implementation": platform.python_implementation(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "graphviz": processor._graphviz_version() if graphviz_available() else "",
+            "style_backend": resolve_style_backend(), "lines": lines, "repeat": repeat, "seed": seed,
+        },
+        "results": res,
+    }
+
+
+def compare(base: dict, new: dict, threshold: float = 0.25, min_delta: float = 0.002) -> List[Tuple]:
+    """
+    (shape, phase, 基準秒, 今回秒, 比) のうち、比が 1+threshold を超え、かつ差が min_delta 秒を超えるもの。
+    best 同士で比べる（ほかのプロセスの影響を受けにくい）。どちらかにしかない段は比べない。
+    """
+    out = []
+    for shape, b in base.get("results", {}).items():
+        n = new.get("results", {}).get(shape)
+        if n is None: continue
+        for phase, bt in b["phases"].items():
+            nt = n["phases"].get(phase)
+            if nt is None: continue
+            old, now = bt["best"], nt["best"]
+            if now - old > min_delta and now > old * (1 + threshold):
+                out.append((shape, phase, old, now, now / old if old else float("inf")))
+    return out
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--shapes", default=",".join(SHAPES), help=f"カンマ区切り（{', '.join(SHAPES)}）")
+    ap.add_argument("--phases", default="", help="カンマ区切りで段を絞る（既定: 全部）")
+    ap.add_argument("--lines", type=int, default=3000)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("-o", "--out", default=os.path.join(SAVE_DIR, "bench", "suite_latest.json"))
+    ap.add_argument("--baseline", help="比較する保存済みの結果 JSON")
+    ap.add_argument("--result", help="計測せず、この結果 JSON を --baseline と比べる")
+    ap.add_argument("--threshold", type=float, default=0.25, help="これ以上遅くなったら回帰（0.25 = 25%%）")
+    ap.add_argument("--min-delta-ms", type=float, default=2.0, help="差がこれ未満なら回帰としない（計測誤差）")
+    ap.add_argument("-q", "--quiet", action="store_true")
+    a = ap.parse_args(argv)
+
+    if a.result:
+        with open(a.result, "r", encoding="utf-8") as fp: new = json.load(fp)
+    else:
+        shapes = [s for s in a.shapes.split(",") if s]
+        bad = [s for s in shapes if s not in SHAPES]
+        if bad: ap.error(f"unknown shape: {', '.join(bad)}")
+        new = run_suite(shapes, a.lines, a.repeat, a.seed, [p for p in a.phases.split(",") if p], a.quiet)
+        os.makedirs(os.path.dirname(os.path.abspath(a.out)), exist_ok=True)
+        with open(a.out, "w", encoding="utf-8") as fp: json.dump(new, fp, ensure_ascii=False, indent=2)
+        print(f"→ {a.out}")
+    if not a.baseline: return 0
+
+    with open(a.baseline, "r", encoding="utf-8") as fp: base = json.load(fp)
+    if base.get("format") != new.get("format"):
+        print("結果の形式が違うので比較できません", file=sys.stderr); return 2
+    for shape, b in base["results"].items():
+        n = new["results"].get(shape)
+        if n and n["digest"] != b["digest"]:
+            print(f"注意: {shape} のコーパスが基準と異なります（--lines/--seed か生成器が変わった）", file=sys.stderr)
+    for k in ("python", "platform", "graphviz", "style_backend"):
+        if base["meta"].get(k) != new["meta"].get(k):
+            print(f"注意: {k} が違います（{base['meta'].get(k)} → {new['meta'].get(k)}）", file=sys.stderr)
+    reg = compare(base, new, a.threshold, a.min_delta_ms / 1000)
+    if not reg:
+        print(f"回帰なし（しきい値 +{a.threshold:.0%}）"); return 0
+    print(f"回帰 {len(reg)} 件（しきい値 +{a.threshold:.0%}）:")
+    for shape, phase, old, now, ratio in reg:
+        print(f"  {shape:6} {phase:26} {old*1000:9.2f}ms → {now*1000:9.2f}ms  x{ratio:.2f}")
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+"""
+「シンボルへ移動」（symbolindex.SymbolIndex）の索引作成時間と1回の検索時間のベンチマーク。
+
+合成したシンボル（mod123.Cls45.parse_header_value_678 のような修飾名）で、
+前方一致 / 頭文字 / 部分一致 / 飛び飛び一致それぞれに当たる問い合わせを測る。Qt は使わない。
+
+    python bench/bench_symbol_index.py                 # 既定: 10万シンボル
+    python bench/bench_symbol_index.py --symbols 20000 --repeat 50
+"""
+import os, sys, time, random, argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from symbolindex import SymbolIndex  # noqa: E402
+
+WORDS = ["get", "set", "parse", "header", "message", "value", "flow", "chart", "image", "render", "build",
+         "load", "save", "node", "edge", "index", "search", "token", "cache", "file", "path", "name", "item",
+         "list", "dict", "config", "http", "client", "server", "request"]
+QUERIES = ["parse", "render_node", "x", "ge", "gfi", "hdr", "nodeedge", "cls12.get", "srch", "pmv"]
+
+def synth(n: int, seed: int = 0):
+    rnd = random.Random(seed)
+    for i in range(n):
+        name = "_".join(rnd.sample(WORDS, rnd.randint(2, 4))) + f"_{i}"
+        kind = "function"
+        if i % 3 == 0: name, kind = f"Cls{i % 997}.{name}", "method"
+        yield f"mod{i % 300}.{name}", kind, i + 1
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--symbols", type=int, default=100_000)
+    ap.add_argument("--repeat", type=int, default=20)
+    a = ap.parse_args(argv)
+    entries = list(synth(a.symbols))
+    t0 = time.perf_counter(); ix = SymbolIndex(entries); build = time.perf_counter() - t0
+    print(f"symbols={len(ix)}  build={build:.2f}s")
+    worst = 0.0
+    for q in QUERIES:
+        ix.search(q)  # 2文字の索引など、初回だけ作るものを除いて測る
+        t0 = time.perf_counter()
+        for _ in range(a.repeat): r = ix.search(q)
+        dt = (time.perf_counter() - t0) / a.repeat; worst = max(worst, dt)
+        print(f"  {q:12} {dt*1000:6.3f}ms  {len(r):3}件  {ix.names[r[0]] if r else ''}")
+    print(f"worst={worst*1000:.3f}ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
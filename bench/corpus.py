@@ -0,0 +1,103 @@
+"""
+ベンチマーク用の合成 Python モジュール（同じ shape / 行数 / seed なら毎回同じ文字列）。
+
+- deep:  if/for/while/with/try が10段前後まで入れ子になった関数（ネスト検出・リファクタ提案向け）
+- wide:  メソッドが数百あるクラス（self.xxx() の呼び出しで、メソッド間の辺が多い）
+- dense: トップレベル関数がそれぞれ多数の関数を呼ぶ（呼び出しグラフの辺が多い。フローチャート/レイアウト向け）
+- async: async def / await / async for / async with、yield / yield from、requests セッション経由の通信
+- mixed: bench_single_pass.make_module と同じ（クラス・入れ子・I/O・ネットワーク・async の混在）
+
+    python bench/corpus.py deep --lines 2000 > deep.py
+"""
+import sys, random, argparse
+from typing import Callable, Dict, List
+
+_HEADS = ["if x > {d}:", "for y{d} in range(x):", "while x > {d}:", "with open('f{d}.txt') as fp{d}:", "try:"]
+
+def _nest(i: int, d: int, depth: int, rnd: random.Random) -> List[str]:
+    pad = "    " * (d + 1)
+    if d == depth: return [pad + f"acc.append(step_{i % 50}(x, {d}))"]
+    head = _HEADS[rnd.randrange(len(_HEADS))].format(d=d)
+    out = [pad + head, pad + f"    acc.append(step_{i % 50}(x, {d}))"] + _nest(i, d + 1, depth, rnd)
+    if head == "try:": out += [pad + "except ValueError:", pad + "    pass"]
+    return out
+
+def _deep(n: int, rnd: random.Random) -> List[str]:
+    out, i = ["import os", "", ""], 0
+    while len(out) < n:
+        out += [f"def deep_{i}(x):", "    acc = []", *_nest(i, 0, rnd.randint(6, 12), rnd), "    return acc", "", ""]
+        i += 1
+    for k in range(50):
+        out += [f"def step_{k}(x, d):", "    return os.path.join(str(x), str(d))", "", ""]
+    return out
+
+def _wide(n: int, rnd: random.Random) -> List[str]:
+    out, c = ["import os", "", ""], 0
+    while len(out) < n:
+        methods = rnd.randint(150, 300)
+        out += [f"class Wide{c}:", "    def __init__(self):", "        self.total = 0", ""]
+        for m in range(methods):
+            callees = rnd.sample(range(methods), min(3, methods))
+            out += [f"    def m{m}(self, v):",
+                    "        self.total += v",
+                    *(f"        self.m{k}(v - 1)" for k in callees),
+                    f"        return os.path.join(str(v), 'x{m}')", ""]
+        out.append("")
+        c += 1
+    return out
+
+def _dense(n: int, rnd: random.Random) -> List[str]:
+    funcs = max(20, n // 12)
+    out = ["import os", "", ""]
+    for f in range(funcs):
+        callees = rnd.sample(range(funcs), min(8, funcs))
+        out += [f"def node_{f}(v):",
+                *(f"    v = node_{k}(v) if v > {j} else v" for j, k in enumerate(callees)),
+                "    return v", "", ""]
+    return out
+
+def _async(n: int, rnd: random.Random) -> List[str]:
+    out, i = ["import asyncio", "import requests", "", "sess = requests.Session()", "", ""], 0
+    while len(out) < n:
+        out += [f"async def fetch_{i}(url):",
+                f"    async with lock_{i % 10}():",
+                f"        async for chunk in stream_{i % 10}(url):",
+                "            await asyncio.sleep(0)",
+                "    return sess.get(url)", "", "",
+                f"def gen_{i}(xs):",
+                "    for x in xs:",
+                f"        if x % {rnd.randint(2, 9)}:",
+                "            yield x",
+                f"    yield from gen_{max(0, i - 1)}(xs[1:])", "", "",
+                f"async def agen_{i}(xs):",
+                "    for x in xs:",
+                f"        yield await fetch_{i}(x)", "", ""]
+        i += 1
+    for k in range(10):
+        out += [f"def lock_{k}():", "    return asyncio.Lock()", "", "",
+                f"async def stream_{k}(url):", "    yield url", "", ""]
+    return out
+
+def _mixed(n: int, rnd: random.Random) -> List[str]:
+    from bench_single_pass import make_module
+    return make_module(n).splitlines()
+
+SHAPES: Dict[str, Callable[[int, random.Random], List[str]]] = {
+    "deep": _deep, "wide": _wide, "dense": _dense, "async": _async, "mixed": _mixed,
+}
+
+def make_corpus(shape: str, lines: int, seed: int = 0) -> str:
+    out = SHAPES[shape](lines, random.Random(f"{shape}:{seed}"))
+    return "\n".join(out).rstrip("\n") + "\n"
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("shape", choices=sorted(SHAPES))
+    ap.add_argument("--lines", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=0)
+    a = ap.parse_args(argv)
+    sys.stdout.write(make_corpus(a.shape, a.lines, a.seed))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+import os, json, shutil, hashlib, tempfile
+from typing import Dict, Optional, Any
+
+from utils import SAVE_DIR
+
+def content_key(*parts: str) -> str:
+    """ソース等の内容から決まるキー（sha256）"""
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(p.encode("utf-8", "surrogatepass")); h.update(b"\0")
+    return h.hexdigest()
+
+class DiskCache:
+    """
+    SAVE_DIR/cache/<name>/<key>/ にエントリ（複数ファイル可）を置くキャッシュ。
+    参照のたびにエントリの mtime を更新し、合計サイズが上限を超えたら古い順（LRU）に消す。
+    """
+    def __init__(self, name: str, max_bytes: int):
+        self.root = os.path.join(SAVE_DIR, "cache", name)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._total: Optional[int] = None  # 初回 put 時に1度だけ走査して以降は差分で追跡
+
+    def _entry(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def get_dir(self, key: str) -> Optional[str]:
+        d = self._entry(key)
+        if not os.path.isdir(d):
+            self.misses += 1; return None
+        try: os.utime(d)
+        except OSError: pass
+        self.hits += 1
+        return d
+
+    def get_json(self, key: str, name: str = "data.json") -> Optional[Any]:
+        d = self.get_dir(key)
+        if d is None: return None
+        try:
+            with open(os.path.join(d, name), "r", encoding="utf-8") as fp:
+                return json.load(fp)
+        except Exception:
+            self.hits -= 1; self.misses += 1
+            shutil.rmtree(d, ignore_errors=True)
+            return None
+
+    def put_json(self, key: str, obj: Any, name: str = "data.json", replace: bool = False):
+        """replace=True なら既存のエントリを置き換える（既定は先に作られた方を残す）"""
+        self._commit(key, {name: json.dumps(obj, ensure_ascii=False).encode("utf-8")}, replace)
+
+    def put_files(self, key: str, files: Dict[str, str]):
+        """files: {エントリ内ファイル名: コピー元パス}"""
+        blobs = {}
+        for name, src in files.items():
+            with open(src, "rb") as fp: blobs[name] = fp.read()
+        self._commit(key, blobs)
+
+    def _commit(self, key: str, blobs: Dict[str, bytes], replace: bool = False):
+        # 一時ディレクトリに書いてから rename（並列プロセスでも半端なエントリを見せない）
+        freed = 0
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            tmp = tempfile.mkdtemp(prefix=".tmp_", dir=self.root)
+            for name, data in blobs.items():
+                with open(os.path.join(tmp, name), "wb") as fp: fp.write(data)
+            dst = self._entry(key)
+            try:
+                os.rename(tmp, dst)
+            except OSError:
+                if not replace:
+                    shutil.rmtree(tmp, ignore_errors=True); return  # 先に他プロセスが作成済み
+                old = tmp + "_old"  # 古い方を脇へ退けてから入れる（読み手には一瞬ミスに見えるだけ）
+                os.rename(dst, old); os.rename(tmp, dst)
+                with os.scandir(old) as it: freed = sum(f.stat().st_size for f in it)
+                shutil.rmtree(old, ignore_errors=True)
+        except Exception:
+            return
+        if self._total is None: self._total = self._scan_total()
+        else: self._total += sum(len(b) for b in blobs.values()) - freed
+        if self._total > self.max_bytes: self.evict()
+
+    def _entries(self):
+        out = []
+        try:
+            with os.scandir(self.root) as it:
+                for e in it:
+                    if not e.is_dir() or e.name.startswith(".tmp_"): continue
+                    size = 0
+                    try:
+                        with os.scandir(e.path) as files:
+                            for f in files: size += f.stat().st_size
+                        out.append((e.stat().st_mtime, size, e.path))
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+        return out
+
+    def _scan_total(self) -> int:
+        return sum(s for _, s, _ in self._entries())
+
+    def evict(self):
+        """合計が上限の 9 割に収まるまで、最後に使われたのが古い順に削除"""
+        entries = sorted(self._entries())
+        total = sum(s for _, s, _ in entries)
+        limit = int(self.max_bytes * 0.9)
+        for _, size, path in entries:
+            if total <= limit: break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size; self.evictions += 1
+        self._total = total
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True); self._total = 0
+
+    def stats(self) -> Dict[str, int]:
+        return dict(hits=self.hits, misses=self.misses, evictions=self.evictions)
@@ -0,0 +1,420 @@
+"""
+呼び出しグラフのデータ構造とアルゴリズム。Qt を使わない。
+
+- CallGraph: 名前を整数 ID にして、呼び出し元ごとの (呼び出し先, 回数) を CSR（array）で持つ。
+  同じ呼び出し先への重複は回数1つにまとまる。{呼び出し元: [呼び出し先, ...]} としても読める（互換ビュー）。
+  with_rows で一部の呼び出し元の行だけ差し替えられる（差分解析）
+- strongly_connected: 強連結成分（Tarjan、再帰なし）。呼び出し先の成分が先に出る（逆トポロジカル順）
+- propagate_tags: io / net / async を呼び出し先から呼び出し元へ伝える。成分ごとにまとめて1回ずつ見るので、
+  再帰の輪があっても反復せずに O(ノード + 辺) で決まる。repropagate_tags は変わったノードだけ決め直す差分版
+- analyze_graph: 呼び出しの輪 / 入口から辿れない定義（未使用の候補）/ ファンイン・ファンアウトの上位。
+  どれも O(ノード + 辺)（上位 k 件は heapq で O(n log k)）
+- config_symbols: config.py の entry_symbols / leaf_symbols（任意）
+
+モジュール直下（と クラス本体）での呼び出しは呼び出し元 MODULE_CALLER（プロジェクトでは `モジュール名.<module>`）の行になる。
+定義ではないので描画では除き（without_module_calls）、analyze_graph ではその呼び出し先を入口にする。
+
+アルゴリズムは dict（{呼び出し元: [呼び出し先, ...]}）も受け取る（CallGraph.of で1回変換する）。
+"""
+import heapq
+from array import array
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+
+class CallGraph(Mapping):
+    """
+    names[i] が ID i の名前。呼び出し元（元の dict のキー。呼び出しのない定義も含む）が先に 0..n_keys-1、
+    呼び出し先にしか出てこないもの（外部の関数など）がその後ろ。
+    ID u の呼び出し先は targets[offsets[u]:offsets[u+1]]（最初に呼んだ順）、回数は counts の同じ位置。
+    Mapping としては {呼び出し元: [呼び出し先を回数ぶん並べたもの]}（呼ぶたびに1つずつの並びではなく、同じ先はまとまる）。
+    """
+    __slots__ = ("names", "ids", "n_keys", "offsets", "targets", "counts")
+
+    def __init__(self, names: List[str], n_keys: int, offsets: array, targets: array, counts: array):
+        self.names = names
+        self.ids: Dict[str, int] = {n: i for i, n in enumerate(names)}
+        self.n_keys = n_keys
+        self.offsets, self.targets, self.counts = offsets, targets, counts
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple[str, Iterable[Tuple[str, int]]]]) -> "CallGraph":
+        """rows: (呼び出し元, [(呼び出し先, 回数), ...])。同じ呼び出し元は1回だけ"""
+        return cls._build(rows, True)
+
+    @classmethod
+    def from_calls(cls, calls: Mapping) -> "CallGraph":
+        """{呼び出し元: [呼び出し先, ...]}（重複は回数になる）"""
+        return cls._build(calls.items(), False)
+
+    @classmethod
+    def _build(cls, rows, counted: bool) -> "CallGraph":
+        rows = rows if isinstance(rows, list) else list(rows)
+        names = [u for u, _ in rows]
+        ids = {u: i for i, u in enumerate(names)}
+        offsets, targets, counts = array("i", [0]), array("i"), array("i")
+        for _, vs in rows:
+            row: Dict[int, int] = {}  # 呼び出し先 ID → 回数（挿入順 = 最初に呼んだ順）
+            for e in vs:
+                v, c = e if counted else (e, 1)
+                i = ids.get(v)
+                if i is None:
+                    i = ids[v] = len(names); names.append(v)
+                row[i] = row.get(i, 0) + c
+            targets.extend(row); counts.extend(row.values()); offsets.append(len(targets))
+        offsets.extend([len(targets)] * (len(names) - len(rows)))
+        g = cls.__new__(cls)
+        g.names, g.ids, g.n_keys = names, ids, len(rows)
+        g.offsets, g.targets, g.counts = offsets, targets, counts
+        return g
+
+    @classmethod
+    def of(cls, calls: Union["CallGraph", Mapping]) -> "CallGraph":
+        return calls if isinstance(calls, CallGraph) else cls.from_calls(calls)
+
+    def with_rows(self, rows: Mapping) -> Optional["CallGraph"]:
+        """
+        rows（{呼び出し元: [呼び出し先, ...]}）の行だけ差し替えたグラフ。ほかの行は配列を切り出してそのまま使う。
+        ノードの並びが from_calls で作り直したときと変わる（知らない名前が出る、呼び出し先にしか出てこない名前の
+        初出の順が変わる/消える）ときは None（作り直す）。
+        """
+        ids, n_keys = self.ids, self.n_keys
+        new: Dict[int, Dict[int, int]] = {}
+        for u, vs in rows.items():
+            i = ids.get(u)
+            if i is None or i >= n_keys: return None
+            row: Dict[int, int] = {}
+            for v in vs:
+                j = ids.get(v)
+                if j is None: return None
+                row[j] = row.get(j, 0) + 1
+            new[i] = row
+        off, tgt, cnt = self.offsets, self.targets, self.counts
+        offsets, targets, counts = array("i", [0]), array("i"), array("i")
+        prev = 0
+        for i in sorted(new) + [len(self.names)]:
+            shift = len(targets) - off[prev]
+            targets.extend(tgt[off[prev]:off[i]]); counts.extend(cnt[off[prev]:off[i]])
+            offsets.extend(o + shift for o in off[prev + 1:i + 1])
+            if i == len(self.names): break
+            targets.extend(new[i]); counts.extend(new[i].values()); offsets.append(len(targets))
+            prev = i + 1
+        nxt = n_keys  # 呼び出し先にしか出てこない ID が初出の順に並んでいるか
+        for v in targets:
+            if v == nxt: nxt += 1
+            elif v > nxt: return None
+        if nxt != len(self.names): return None
+        g = CallGraph.__new__(CallGraph)
+        g.names, g.ids, g.n_keys = self.names, ids, n_keys
+        g.offsets, g.targets, g.counts = offsets, targets, counts
+        return g
+
+    # ---- 整数 ID のまま使う（アルゴリズム用） ----
+    def callee_ids(self, u: int) -> array:
+        return self.targets[self.offsets[u]:self.offsets[u + 1]]
+
+    def indegree(self) -> List[int]:
+        """ID → 呼ばれた回数"""
+        deg = [0] * len(self.names)
+        for v, c in zip(self.targets, self.counts): deg[v] += c
+        return deg
+
+    def outdegree(self) -> List[int]:
+        """ID → 呼んだ回数"""
+        off, cnt = self.offsets, self.counts
+        return [sum(cnt[off[u]:off[u + 1]]) for u in range(len(self.names))]
+
+    # ---- 名前で使う ----
+    def callees(self, u: str) -> List[Tuple[str, int]]:
+        """[(呼び出し先, 回数)]（最初に呼んだ順）。知らない名前は空"""
+        i = self.ids.get(u)
+        if i is None: return []
+        a, b = self.offsets[i], self.offsets[i + 1]
+        names = self.names
+        return [(names[v], c) for v, c in zip(self.targets[a:b], self.counts[a:b])]
+
+    def edges(self) -> Iterator[Tuple[str, str, int]]:
+        """(呼び出し元, 呼び出し先, 回数)。呼び出し元の順、その中は最初に呼んだ順"""
+        names, off, tgt, cnt = self.names, self.offsets, self.targets, self.counts
+        for u in range(self.n_keys):
+            for p in range(off[u], off[u + 1]): yield names[u], names[tgt[p]], cnt[p]
+
+    @property
+    def n_calls(self) -> int:
+        """呼び出しの総数（重複を含む）"""
+        return sum(self.counts)
+
+    # ---- 互換ビュー（{呼び出し元: [呼び出し先, ...]}） ----
+    def __getitem__(self, u: str) -> List[str]:
+        i = self.ids.get(u)
+        if i is None or i >= self.n_keys: raise KeyError(u)
+        return [v for v, c in self.callees(u) for _ in range(c)]
+
+    def __contains__(self, u) -> bool:
+        i = self.ids.get(u)
+        return i is not None and i < self.n_keys
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.names[:self.n_keys])
+
+    def __len__(self) -> int:
+        return self.n_keys
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, CallGraph):
+            return (self.n_keys == other.n_keys and self.names == other.names and self.offsets == other.offsets
+                    and self.targets == other.targets and self.counts == other.counts)
+        return Mapping.__eq__(self, other)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"CallGraph({self.n_keys} callers, {len(self.names)} nodes, {len(self.targets)} edges)"
+
+    # ---- キャッシュ（JSON）用 ----
+    def to_json(self) -> dict:
+        return dict(names=self.names, n_keys=self.n_keys, offsets=self.offsets.tolist(),
+                    targets=self.targets.tolist(), counts=self.counts.tolist())
+
+    @classmethod
+    def from_json(cls, d: dict) -> "CallGraph":
+        return cls(list(d["names"]), d["n_keys"], array("i", d["offsets"]), array("i", d["targets"]),
+                   array("i", d["counts"]))
+
+
+MODULE_CALLER = "<module>"
+
+def is_module_caller(name: str) -> bool:
+    return name == MODULE_CALLER or name.endswith("." + MODULE_CALLER)
+
+def without_module_calls(calls: Union[CallGraph, Mapping]) -> CallGraph:
+    """モジュール直下からの呼び出しの行を除いたグラフ（そこからしか呼ばれない外部の関数も消える）。無ければそのまま"""
+    g = CallGraph.of(calls)
+    if not any(is_module_caller(n) for n in g.names[:g.n_keys]): return g
+    return CallGraph.from_rows([(u, g.callees(u)) for u in g if not is_module_caller(u)])
+
+
+PROPAGATED_TAGS = ("async", "io", "net")  # 呼び出し元へ伝えるタグ（generator / recursive は本人だけのもの）
+
+def _scc_ids(g: CallGraph) -> List[List[int]]:
+    """全ノードの強連結成分（ID）。呼び出し先の成分が先"""
+    n = len(g.names)
+    off, tgt = g.offsets, g.targets
+    index = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    pos = off.tolist()[:n]  # ノードごとに次に見る辺
+    stack: List[int] = []
+    out: List[List[int]] = []
+    counter = 0
+    for root in range(n):  # 呼び出し先だけのノードは呼び出し元から先に辿られる
+        if index[root] >= 0: continue
+        index[root] = low[root] = counter; counter += 1; stack.append(root); on_stack[root] = True
+        work = [root]
+        while work:
+            v = work[-1]
+            p, end = pos[v], off[v + 1]
+            while p < end:
+                w = tgt[p]; p += 1
+                if index[w] < 0:
+                    index[w] = low[w] = counter; counter += 1; stack.append(w); on_stack[w] = True
+                    work.append(w); break
+                if on_stack[w] and index[w] < low[v]: low[v] = index[w]
+            else:  # v の呼び出し先を見終わった
+                work.pop()
+                if work and low[v] < low[work[-1]]: low[work[-1]] = low[v]
+                if low[v] == index[v]:
+                    comp = []
+                    while True:
+                        w = stack.pop(); on_stack[w] = False; comp.append(w)
+                        if w == v: break
+                    out.append(comp)
+            pos[v] = p
+    return out
+
+def strongly_connected(calls: Union[CallGraph, Mapping]) -> List[List[str]]:
+    """calls に出てくる全ノード（呼び出し先だけのものも）を強連結成分に分ける"""
+    g = CallGraph.of(calls)
+    names = g.names
+    return [[names[v] for v in comp] for comp in _scc_ids(g)]
+
+def propagate_tags(calls: Union[CallGraph, Mapping], tags: Dict[str, Set[str]],
+                   names: Iterable[str] = PROPAGATED_TAGS) -> Dict[str, Dict[str, str]]:
+    """
+    呼び出し先から引き継いだタグ: ノード → {タグ: 経由する呼び出し先}（本人に直接あるタグは含めない）。
+    経由先を辿ると必ずそのタグが直接あるノードに着く（再帰の輪の中は、輪の出口に近い方へ向かう）。
+    タグは1ビットずつの整数にして、成分ごとに OR で集める。
+    """
+    g = CallGraph.of(calls)
+    bits = {t: 1 << i for i, t in enumerate(dict.fromkeys(names))}
+    n = len(g.names)
+    off, tgt = g.offsets, g.targets
+    own = [0] * n
+    for sym, ts in tags.items():
+        i = g.ids.get(sym)
+        if i is None: continue  # 呼び出し関係のない定義には何も伝わらない
+        for t in ts: own[i] |= bits.get(t, 0)
+    reach = [-1] * n  # ノード → 自分から届くタグ（直接を含む）。-1 はまだ（同じ成分の中）
+    via: Dict[int, Dict[int, int]] = {}  # ノード → {タグのビット: 経由する呼び出し先}
+    for comp in _scc_ids(g):  # 呼び出し先の成分は先に決まっている
+        acc = 0
+        for v in comp:
+            o = own[v]; acc |= o
+            for p in range(off[v], off[v + 1]):
+                r = reach[tgt[p]]
+                if r <= 0: continue
+                acc |= r
+                extra = r & ~o
+                if extra:
+                    d = via.setdefault(v, {})
+                    for b in bits.values():
+                        if extra & b and b not in d: d[b] = tgt[p]
+        for v in comp: reach[v] = acc
+        if len(comp) > 1 and acc: _via_in_cycle(g, comp, own, acc, bits, via)
+    tag_of = {b: t for t, b in bits.items()}
+    nm = g.names
+    return {nm[v]: {tag_of[b]: nm[w] for b, w in d.items()} for v, d in via.items()}
+
+def repropagate_tags(calls: CallGraph, tags: Dict[str, Set[str]], prev_calls: CallGraph, prev_tags: Dict[str, Set[str]],
+                     prev: Dict[str, Dict[str, str]], changed: Iterable[str],
+                     names: Iterable[str] = PROPAGATED_TAGS) -> Dict[str, Dict[str, str]]:
+    """
+    propagate_tags の差分版。calls と prev_calls はノードの並びが同じもの（CallGraph.with_rows の結果など）。
+    changed（呼び出し先か直接のタグが変わったノード）の経由先だけ決め直し、ほかは prev（前回の結果）を使う。
+    ノードから届くタグ = 直接のタグ + prev で引き継いだタグ。changed が輪の中にある/あった、changed どうしで呼ぶ、
+    届くタグが変わる（呼び出し元の結果まで変わる）ときは propagate_tags で全体を求め直す。
+    """
+    g = calls
+    bits = {t: 1 << i for i, t in enumerate(dict.fromkeys(names))}
+    tag_of = {b: t for t, b in bits.items()}
+    to_bits = lambda ts: sum(b for t, b in bits.items() if t in ts) if ts else 0
+    nm, off, tgt = g.names, g.offsets, g.targets
+    reach = lambda v: to_bits(tags.get(nm[v])) | to_bits(prev.get(nm[v]))
+    ch = {g.ids[c] for c in changed if c in g.ids}
+    out = dict(prev)
+    for u in ch:
+        if any(v in ch for v in g.callee_ids(u)) or _on_cycle(g, u) or _on_cycle(prev_calls, u):
+            return propagate_tags(g, tags, names)
+        o = to_bits(tags.get(nm[u]))
+        acc, d = o, {}
+        for p in range(off[u], off[u + 1]):
+            r = reach(tgt[p])
+            if not r: continue
+            acc |= r
+            extra = r & ~o
+            for b in bits.values():
+                if extra & b and b not in d: d[b] = tgt[p]
+        if acc != to_bits(prev_tags.get(nm[u])) | to_bits(prev.get(nm[u])):
+            return propagate_tags(g, tags, names)
+        if d: out[nm[u]] = {tag_of[b]: nm[w] for b, w in d.items()}
+        else: out.pop(nm[u], None)
+    return out
+
+def _on_cycle(g: CallGraph, u: int) -> bool:
+    """u から呼び出し先を辿って u に戻れるか"""
+    off, tgt = g.offsets, g.targets
+    stack = list(g.callee_ids(u))
+    seen = set(stack)
+    while stack:
+        v = stack.pop()
+        if v == u: return True
+        for p in range(off[v], off[v + 1]):
+            w = tgt[p]
+            if w not in seen: seen.add(w); stack.append(w)
+    return False
+
+def _via_in_cycle(g: CallGraph, comp: List[int], own: List[int], reach: int, bits: Dict[str, int],
+                  via: Dict[int, Dict[int, int]]):
+    """輪の中でまだ経由先のないノードに、タグごとに輪の出口（直接持つ/外の呼び出し先から届く）からの逆向き BFS で決める"""
+    members = set(comp)
+    pred: Dict[int, List[int]] = {}
+    for u in comp:
+        for w in g.callee_ids(u):
+            if w in members: pred.setdefault(w, []).append(u)
+    for b in bits.values():
+        if not reach & b: continue
+        frontier = [v for v in comp if own[v] & b or b in via.get(v, ())]
+        seen = set(frontier)
+        while frontier:
+            nxt = []
+            for v in frontier:
+                for u in pred.get(v, ()):
+                    if u in seen: continue
+                    seen.add(u); nxt.append(u)
+                    via.setdefault(u, {})[b] = v
+            frontier = nxt
+
+# ---- 呼び出しグラフの分析（ツリー / レポート用） ----
+DEFINED_KINDS = ("class", "method", "function")
+GRAPH_TOP = 20  # ファンイン/ファンアウトを何件まで出すか
+
+def config_symbols() -> Tuple[Set[str], Set[str]]:
+    """(entry_symbols, leaf_symbols)。config.py が無ければ空"""
+    try:
+        import config as _cfg
+        return set(getattr(_cfg, "entry_symbols", []) or []), set(getattr(_cfg, "leaf_symbols", []) or [])
+    except Exception:
+        return set(), set()
+
+def _private(name: str) -> bool:
+    local = name.rsplit(".", 1)[-1]
+    return local.startswith("_") and not (local.startswith("__") and local.endswith("__"))
+
+@dataclass
+class GraphReport:
+    entries: List[str]                    # 辿り始めた定義（外から呼ばれない成分の公開の定義 + config.entry_symbols）
+    cycles: List[List[str]]               # 2つ以上の定義が呼び合う輪（大きい順。自分だけの再帰は recursive タグ）
+    unreachable: List[str]                # 入口から辿れない定義（未使用の候補）
+    fan_in: List[Tuple[str, int, int]]    # (名前, 呼び出し元の数, 呼ばれた回数) の多い順
+    fan_out: List[Tuple[str, int, int]]   # (名前, 呼び出し先の数, 呼んだ回数) の多い順
+
+def analyze_graph(calls: Union[CallGraph, Mapping], def_kinds: Dict[str, str], entries: Optional[Iterable[str]] = None,
+                  top: int = GRAPH_TOP) -> GraphReport:
+    """
+    entries 省略時は config.entry_symbols。どちらの場合も、強連結成分の外から呼ばれていない成分にある公開の定義
+    （_ で始まらない。__init__ などは公開扱い）を入口に足す（外から呼ばれうる）。自分自身や輪の中からの呼び出しは数えないので、
+    公開の再帰関数や呼び合う公開の組は入口になる（輪が外から呼ばれていれば、そこから辿れる）。
+    外から呼ばれない _private や、_private だけの輪が「到達できない」。
+    モジュール直下からの呼び出し（MODULE_CALLER の行）の呼び出し先も入口（`if __name__ == "__main__":` から呼ぶ _main など）。
+    MODULE_CALLER は定義ではないのでファンアウトには出さない。
+    """
+    g = CallGraph.of(calls)
+    nm, ids, off, tgt, cnt = g.names, g.ids, g.offsets, g.targets, g.counts
+    indeg = g.indegree()
+    callers = [0] * len(nm)  # 異なる呼び出し元の数（CSR の辺は呼び出し元ごとに重複なし）
+    for v in tgt: callers[v] += 1
+    top_level = {u for u in range(g.n_keys) if is_module_caller(nm[u])}
+    fan_out = [(nm[u], off[u + 1] - off[u], sum(cnt[off[u]:off[u + 1]]))
+               for u in range(g.n_keys) if off[u + 1] > off[u] and u not in top_level]
+    defined = [n for n, k in def_kinds.items() if k in DEFINED_KINDS]
+    sccs = _scc_ids(g)
+    comp = [0] * len(nm)
+    for k, c in enumerate(sccs):
+        for v in c: comp[v] = k
+    called = [False] * len(sccs)  # 成分 → 成分の外から呼ばれているか
+    for u in range(g.n_keys):
+        for p in range(off[u], off[u + 1]):
+            if comp[tgt[p]] != comp[u]: called[comp[tgt[p]]] = True
+    start = set(config_symbols()[0] if entries is None else entries)
+    start.update(n for n in defined if (n not in ids or not called[comp[ids[n]]]) and not _private(n))
+    start.update(nm[v] for u in top_level for v in g.callee_ids(u))
+    seen = [False] * len(nm)
+    stack = [ids[n] for n in start if n in ids]
+    for u in stack: seen[u] = True
+    while stack:
+        u = stack.pop()
+        for p in range(off[u], off[u + 1]):
+            w = tgt[p]
+            if not seen[w]: seen[w] = True; stack.append(w)
+    reached = lambda n: n in start if n not in ids else seen[ids[n]]
+    cycles = [sorted(nm[v] for v in c) for c in sccs if len(c) > 1]
+    cycles.sort(key=lambda c: (-len(c), c[0]))
+    pick = lambda rows: heapq.nsmallest(top, rows, key=lambda r: (-r[1], -r[2], r[0]))
+    return GraphReport(
+        entries=sorted(n for n in start if def_kinds.get(n) in DEFINED_KINDS and reached(n)),
+        cycles=cycles,
+        unreachable=sorted(n for n in defined if not reached(n)),
+        fan_in=pick([(nm[v], c, indeg[v]) for v, c in enumerate(callers) if c]),
+        fan_out=pick(fan_out),
+    )
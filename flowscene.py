@@ -0,0 +1,188 @@
+"""
+フローチャートを SVG を経由せずに QGraphicsScene へ直接組み立てるレンダラ。
+
+`dot -Tjson0` のレイアウト（*_function_flowchart_layout.json）の座標から、ノード/エッジ/クラスタを
+Qt 標準の軽量アイテム（描画は C++ 側）として並べる。
+- ラベルは DeviceCoordinateCache でピクセルを使い回し、縮小表示ではラベル非表示 + アンチエイリアスなし（LOD）
+- クリック判定はシーンの BSP インデックスに任せる（透明なホットスポットを重ねない）
+"""
+import json
+from typing import Callable, Dict, List, Optional, Tuple
+
+from PySide6.QtCore import Qt, QPointF, QRectF
+from PySide6.QtGui import QColor, QFont, QPainter, QPainterPath, QPen, QPolygonF
+from PySide6.QtWidgets import (
+    QGraphicsItem, QGraphicsPathItem, QGraphicsPolygonItem, QGraphicsRectItem, QGraphicsScene,
+    QGraphicsSimpleTextItem, QGraphicsView
+)
+
+LOD_LABEL = 0.45  # これより縮小したらラベルを非表示
+_FONT_FAMILY = "Kosugi Maru"
+
+def _pt(s: str, top: float) -> QPointF:
+    x, y = s.split(",")[:2]
+    return QPointF(float(x), top - float(y))  # Graphviz は左下原点
+
+def _font(size: float) -> QFont:
+    f = QFont(_FONT_FAMILY); f.setPixelSize(max(6, int(round(size))))
+    return f
+
+def _label(parent: QGraphicsItem, text: str, size: float, center: QPointF, color: str = "#222222"):
+    """parent 座標で center に中央揃え"""
+    t = QGraphicsSimpleTextItem(text, parent)
+    t.setFont(_font(size)); t.setBrush(QColor(color))
+    t.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
+    t.setAcceptedMouseButtons(Qt.NoButton)
+    r = t.boundingRect()
+    t.setPos(center.x() - r.width() / 2, center.y() - r.height() / 2)
+    return t
+
+
+class NodeItem(QGraphicsPathItem):
+    """ノード（形と枠/塗りだけ）。クリックで on_click(name)"""
+    def __init__(self, obj: dict, top: float, on_click: Optional[Callable[[str], None]]):
+        super().__init__()
+        self.name = obj.get("name", "")
+        w, h = float(obj.get("width", 0.75)) * 72.0, float(obj.get("height", 0.5)) * 72.0
+        rect = QRectF(-w/2, -h/2, w, h)
+        shape, style = obj.get("shape", "box"), obj.get("style", "")
+        path = QPainterPath()
+        if shape == "ellipse": path.addEllipse(rect)
+        elif "rounded" in style: path.addRoundedRect(rect, 6, 6)
+        else: path.addRect(rect)
+        if obj.get("peripheries", "1") == "2":  # 再帰: 二重枠
+            outer = rect.adjusted(-4, -4, 4, 4)
+            if shape == "ellipse": path.addEllipse(outer)
+            else: path.addRect(outer)
+            path.setFillRule(Qt.WindingFill)
+        self.setPath(path)
+        self.setPos(_pt(obj["pos"], top))
+        pen = QPen(QColor(obj.get("color", "#666666")), float(obj.get("penwidth", 1.0)))
+        if "dashed" in style: pen.setStyle(Qt.DashLine)
+        self.setPen(pen)
+        self._fill = QColor(obj.get("fillcolor", "#FFFFFF"))
+        self.setBrush(self._fill)
+        label = obj.get("label", "\\N")
+        self.label = _label(self, self.name if label == "\\N" else label, float(obj.get("fontsize", 14)), QPointF(0, 0))
+        self.on_click = on_click
+        self.setAcceptHoverEvents(True)
+        self.setCursor(Qt.PointingHandCursor)
+        self.setZValue(1)
+
+    def hoverEnterEvent(self, e):
+        self.setBrush(self._fill.darker(112)); super().hoverEnterEvent(e)
+
+    def hoverLeaveEvent(self, e):
+        self.setBrush(self._fill); super().hoverLeaveEvent(e)
+
+    def mousePressEvent(self, e):
+        if e.button() == Qt.LeftButton and self.on_click:
+            self.on_click(self.name); e.accept()
+        else:
+            super().mousePressEvent(e)
+
+
+def _edge_items(obj: dict, top: float) -> Tuple[QGraphicsPathItem, Optional[QGraphicsSimpleTextItem]]:
+    """スプライン（子に矢じり）と回数ラベル。マウスは受けない"""
+    tip, pts = None, []
+    for tok in obj.get("pos", "").split():
+        if tok.startswith("e,"): tip = _pt(tok[2:], top)
+        elif not tok.startswith("s,"): pts.append(_pt(tok, top))
+    path = QPainterPath()
+    if pts:
+        path.moveTo(pts[0])
+        for i in range(1, len(pts) - 2, 3):
+            path.cubicTo(pts[i], pts[i+1], pts[i+2])
+    color = QColor(obj.get("color", "#666666"))
+    item = QGraphicsPathItem(path)
+    item.setPen(QPen(color, float(obj.get("penwidth", 1.0))))
+    item.setAcceptedMouseButtons(Qt.NoButton)
+    if tip is not None and pts:
+        base = pts[-1]; d = tip - base
+        n = (d.x() ** 2 + d.y() ** 2) ** 0.5 or 1.0
+        ux, uy = d.x() / n, d.y() / n
+        w = 3.5 * float(obj.get("arrowsize", 1.0))
+        head = QGraphicsPolygonItem(QPolygonF([tip, QPointF(base.x() - uy*w, base.y() + ux*w),
+                                               QPointF(base.x() + uy*w, base.y() - ux*w)]), item)
+        head.setPen(QPen(color, 1.0)); head.setBrush(color)
+    label = None
+    if obj.get("label") and "lp" in obj:
+        label = _label(item, obj["label"], float(obj.get("fontsize", 10)), _pt(obj["lp"], top), "#333333")
+    return item, label
+
+
+class FlowScene(QGraphicsScene):
+    """ラベルの一覧を持ち、表示倍率に応じてまとめて表示/非表示を切り替える"""
+    def __init__(self):
+        super().__init__()
+        self.setItemIndexMethod(QGraphicsScene.BspTreeIndex)
+        self.labels: List[QGraphicsSimpleTextItem] = []
+        self.nodes: Dict[str, NodeItem] = {}
+        self._labels_shown = True
+
+    def set_detail(self, scale: float):
+        show = scale >= LOD_LABEL
+        if show == self._labels_shown: return
+        self._labels_shown = show
+        for t in self.labels: t.setVisible(show)
+
+
+def build_flow_scene(layout: dict, on_click: Optional[Callable[[str], None]] = None,
+                     tooltip: Optional[Callable[[str], str]] = None) -> FlowScene:
+    """json0 レイアウト → シーン（scene.nodes: ノード名 → NodeItem）"""
+    x0, y0, x1, y1 = map(float, layout.get("bb", "0,0,0,0").split(","))
+    top = y1
+    scene = FlowScene()
+    objects: List[dict] = layout.get("objects", [])
+    nsub = int(layout.get("_subgraph_cnt", 0))
+    for o in objects[:nsub]:
+        if "bb" not in o or not o.get("name", "").startswith("cluster"): continue
+        cx0, cy0, cx1, cy1 = map(float, o["bb"].split(","))
+        r = QGraphicsRectItem(QRectF(cx0, top - cy1, cx1 - cx0, cy1 - cy0))
+        r.setPen(QPen(QColor(o.get("color", "#999999")), 1.0)); r.setAcceptedMouseButtons(Qt.NoButton); r.setZValue(-1)
+        if o.get("label"):
+            lp = _pt(o["lp"], top) if "lp" in o else QPointF((cx0 + cx1) / 2, top - cy1 + 12)
+            scene.labels.append(_label(r, o["label"], float(o.get("fontsize", 14)), lp, "#444444"))
+        scene.addItem(r)
+    for o in objects[nsub:]:
+        if "pos" not in o: continue
+        it = NodeItem(o, top, on_click)
+        if tooltip: it.setToolTip(tooltip(it.name))
+        scene.addItem(it); scene.nodes[it.name] = it; scene.labels.append(it.label)
+    for e in layout.get("edges", []):
+        if "pos" not in e: continue
+        item, label = _edge_items(e, top)
+        scene.addItem(item)
+        if label is not None: scene.labels.append(label)
+    scene.setSceneRect(QRectF(x0, 0, x1 - x0, y1 - y0).adjusted(-4, -4, 4, 4))
+    return scene
+
+def load_flow_scene(layout_path: str, on_click=None, tooltip=None) -> FlowScene:
+    with open(layout_path, "r", encoding="utf-8") as fp:
+        return build_flow_scene(json.load(fp), on_click, tooltip)
+
+
+class FlowView(QGraphicsView):
+    """ドラッグでパン、Ctrl+ホイールでズーム（カーソル位置を中心に）。倍率が変わるとシーンの LOD を更新"""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setRenderHints(QPainter.Antialiasing | QPainter.TextAntialiasing)
+        self.setDragMode(QGraphicsView.ScrollHandDrag)
+        self.setViewportUpdateMode(QGraphicsView.SmartViewportUpdate)
+        self.setOptimizationFlags(QGraphicsView.DontSavePainterState)
+        self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+
+    def _update_detail(self):
+        scale = self.transform().m11()
+        self.setRenderHint(QPainter.Antialiasing, scale >= LOD_LABEL)  # 縮小時はAAなし（数千本のエッジでも軽く）
+        sc = self.scene()
+        if isinstance(sc, FlowScene): sc.set_detail(scale)
+
+    def fitInView(self, *args, **kwargs):
+        super().fitInView(*args, **kwargs); self._update_detail()
+
+    def wheelEvent(self, e):
+        if e.modifiers() & Qt.ControlModifier:
+            f = 1.15 if e.angleDelta().y() > 0 else 1 / 1.15
+            self.scale(f, f); self._update_detail(); e.accept(); return
+        super().wheelEvent(e)
@@ -1,21 +1,34 @@
-import os, sys, re, json
-from PySide6.QtCore import Qt, QEvent, QPoint, QPropertyAnimation, QEasingCurve, QRect, QSize
+import os, sys, re, json, threading, bisect
+from functools import lru_cache
+from PySide6.QtCore import (
+    Qt, QEvent, QPoint, QPropertyAnimation, QEasingCurve, QRect, QSize, QObject, QRunnable, QThreadPool, Signal,
+    QTimer, QFileSystemWatcher
+)
 from PySide6.QtGui import (
     QIcon, QColor, QFont, QAction, QTextCursor, QTextCharFormat, QPainter, QFontMetrics
 )
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QStyle,
-    QTreeWidget, QTreeWidgetItem, QFileDialog, QSplitter, QGraphicsView, QGraphicsScene,
-    QDialog, QTextBrowser, QApplication, QPlainTextEdit, QLineEdit, QTextEdit, QGraphicsRectItem
+    QTreeView, QFileDialog, QSplitter, QGraphicsScene,
+    QDialog, QTextBrowser, QApplication, QPlainTextEdit, QLineEdit, QTextEdit, QGraphicsRectItem, QListWidget
 )
-from PySide6.QtSvgWidgets import QGraphicsSvgItem  # SVG表示用
+
+from flowscene import FlowScene, FlowView, load_flow_scene
+import resultmodel
+from resultmodel import ResultTreeModel
+from symbolindex import SymbolIndex
+from watcher import text_digest
+import perftrace
+from perftrace import span
 
 from utils import (
     build_qss, apply_drop_shadow, apply_text_shadow, UI_FONT_FAMILY, MENU_WIDTH, RESIZE_MARGIN,
-    ensure_save_dir, get_icon_path, APP_TITLE, README_MD, SAVE_DIR
+    ensure_save_dir, get_icon_path, APP_TITLE, README_MD, SAVE_DIR, FOCUS_AUTO_NODES, FOCUS_HOPS,
+    FLOW_RENDERER, LARGE_FILE_CHARS, LARGE_FILE_CHUNK_LINES, WATCH_FILES, WATCH_DEBOUNCE_MS
 )
 from processor import (
-    analyze_file, generate_flowchart_image, highlight_positions_in_text
+    analyze_file, generate_flowchart_image, highlight_positions_in_text, analysis_cache_stats, incremental_stats,
+    CancelToken, Cancelled, FocusGraph
 )
 
 
@@ -30,57 +43,128 @@ class LineNumberArea(QWidget):
     def paintEvent(self, event):
         self.editor.line_number_area_paint_event(event)
 
+def _line_chunks(text: str, n: int):
+    """text を n 行ずつ（末尾の改行は含めない）。appendPlainText で順に足すと setPlainText(text) と同じ行構成になる"""
+    a = 0
+    while True:
+        b = a
+        for _ in range(n):
+            b = text.find("\n", b) + 1
+            if b == 0:
+                yield text[a:]; return
+        yield text[a:b-1]; a = b
+
+@lru_cache(maxsize=32)
+def _compile_search(pattern: str, case_sensitive: bool, use_regex: bool, whole_word: bool):
+    """検索語 → 正規表現（不正な正規表現は None）"""
+    flags = 0 if case_sensitive else re.IGNORECASE
+    if not use_regex: pattern = re.escape(pattern)
+    if whole_word:    pattern = r"\b" + pattern + r"\b"
+    try:
+        return re.compile(pattern, flags)
+    except re.error:
+        return None
+
+class _SearchSignals(QObject):
+    done = Signal(int, object)  # (世代, [(開始, 長さ)])
+
+class _SearchJob(QRunnable):
+    """全文検索をワーカースレッドで。新しい検索が始まったら（世代が変わったら）途中で打ち切る"""
+    def __init__(self, editor: "CodeEditor", gen: int, regex, text: str):
+        super().__init__()
+        self.editor, self.gen, self.regex, self.text = editor, gen, regex, text
+        self.signals = _SearchSignals()
+
+    def run(self):
+        out = []
+        for i, m in enumerate(self.regex.finditer(self.text)):
+            if i % 4096 == 0 and self.gen != self.editor._search_gen: return
+            out.append((m.start(), m.end() - m.start()))
+        self.signals.done.emit(self.gen, out)
+
 class CodeEditor(QPlainTextEdit):
+    search_status = Signal(int, int)  # (現在のヒット番号 0始まり / -1, ヒット数)
+    # 検索ヒットは ExtraSelection ではなく paintEvent で表示中の行にだけ重ね描き（色は全ヒット共通）
+    HIT_FILL = QColor(255, 255, 0, 150)
+    HIT_CURRENT = QColor(255, 150, 0, 170)
+    HIT_LINE = QColor(200, 0, 0)
+    LINE_FILL = QColor(70, 110, 225, 60)
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self._line_area = LineNumberArea(self)
+        self._digit_w = self._line_h = self._gutter_w = 0  # フォントが変わった時だけ測り直す
+        self._total_lines = 1
+        self._source = ""      # 表示中の全文（分割読み込み中も検索はこちらを使う）
+        self.large = False     # 大きいファイル（分割読み込み + Enter で検索）
+        self._chunks = None    # 読み込み途中の残り（_line_chunks）
+        self._load_gen = 0
+        self._pending = None   # 未読み込みの位置への移動 ("line"/"pos", 値)
         self.blockCountChanged.connect(self._update_line_number_area_width)
         self.updateRequest.connect(self._update_line_number_area)
         self.cursorPositionChanged.connect(self._highlight_current_line)
-        self._update_line_number_area_width(0)
-        self._search_positions = []
+        self._search_positions = []  # (開始, 長さ) を開始位置順に。F3/Shift+F3 は全件を巡回
+        self._search_starts = []
         self._search_index = -1
+        self._search_gen = 0
+        self._search_keep = False  # 実行中の検索が読み込み直し後の再検索か（表示を動かさない）
+        self._line_fmt = QTextCharFormat()
+        self._line_fmt.setBackground(self.LINE_FILL)
 
         f = self.font()
         f.setFamily(UI_FONT_FAMILY)  
         f.setPointSize(10)
         f.setStyleHint(QFont.Monospace)
         self.setFont(f)
+        self._refresh_metrics()
 
         self.setLineWrapMode(QPlainTextEdit.NoWrap)
-        self.setTabStopDistance(QFontMetrics(self.font()).horizontalAdvance(" ") * 4)
 
-    def line_number_area_width(self) -> int:
-        digits = max(3, len(str(max(1, self.blockCount()))))
+    def _refresh_metrics(self):
         fm = QFontMetrics(self.font())
-        return 10 + fm.horizontalAdvance('9') * digits
+        self._digit_w, self._line_h = fm.horizontalAdvance('9'), fm.height()
+        self.setTabStopDistance(fm.horizontalAdvance(" ") * 4)
+        self._gutter_w = 0
+        self._update_line_number_area_width(0)
+
+    def changeEvent(self, e):
+        super().changeEvent(e)
+        if e.type() == QEvent.FontChange and getattr(self, "_digit_w", 0): self._refresh_metrics()
+
+    def line_number_area_width(self) -> int:
+        # 分割読み込み中も最終的な行数で幅を決める（読み込みのたびにガター幅が変わらないように）
+        digits = max(3, len(str(max(1, self.blockCount(), self._total_lines))))
+        return 10 + self._digit_w * digits
 
     def _update_line_number_area_width(self, _):
-        self.setViewportMargins(self.line_number_area_width(), 0, 0, 0)
+        w = self.line_number_area_width()
+        if w == self._gutter_w: return
+        self._gutter_w = w
+        self.setViewportMargins(w, 0, 0, 0)
+        cr = self.contentsRect()
+        self._line_area.setGeometry(QRect(cr.left(), cr.top(), w, cr.height()))
 
     def line_number_area_paint_event(self, event):
         painter = QPainter(self._line_area)
-        painter.fillRect(event.rect(), QColor(15, 30, 60, 180))
+        clip = event.rect()
+        painter.fillRect(clip, QColor(15, 30, 60, 180))
+        painter.setPen(QColor("#b8dcff"))
         block = self.firstVisibleBlock()
         blockNumber = block.blockNumber()
-        top = self.contentOffset().y() + self.blockBoundingGeometry(block).translated(self.contentOffset()).top()
-        bottom = top + self.blockBoundingRect(block).height()
-        fm = QFontMetrics(self.font())
-        while block.isValid() and top <= event.rect().bottom():
-            if block.isVisible() and bottom >= event.rect().top():
-                number = str(blockNumber + 1)
-                painter.setPen(QColor("#b8dcff"))
-                painter.drawText(0, int(top), self._line_area.width()-6, fm.height(),
-                                 Qt.AlignRight | Qt.AlignVCenter, number)
+        top = self.blockBoundingGeometry(block).translated(self.contentOffset()).top()
+        w, lh = self._line_area.width() - 6, self._line_h
+        while block.isValid() and top <= clip.bottom():
+            bottom = top + self.blockBoundingRect(block).height()
+            if block.isVisible() and bottom >= clip.top():
+                painter.drawText(0, int(top), w, lh, Qt.AlignRight | Qt.AlignVCenter, str(blockNumber + 1))
             block = block.next()
             top = bottom
-            bottom = top + self.blockBoundingRect(block).height()
             blockNumber += 1
 
     def resizeEvent(self, e):
         super().resizeEvent(e)
         cr = self.contentsRect()
-        self._line_area.setGeometry(QRect(cr.left(), cr.top(), self.line_number_area_width(), cr.height()))
+        self._line_area.setGeometry(QRect(cr.left(), cr.top(), self._gutter_w, cr.height()))
 
     def _update_line_number_area(self, rect, dy):
         if dy:
@@ -91,69 +175,154 @@ class CodeEditor(QPlainTextEdit):
             self._update_line_number_area_width(0)
 
     def _highlight_current_line(self):
-        sels = []
-        fmt_line = QTextCharFormat()
-        fmt_line.setBackground(QColor(70, 110, 225, 60))
+        # カーソル移動で作り直すのは現在行の1件だけ（検索ヒットは paintEvent 側）
         sel_line = QTextEdit.ExtraSelection()  # PySide6は QTextEdit.ExtraSelection
         sel_line.cursor = self.textCursor()
-        sel_line.format = fmt_line
-        sels.append(sel_line)
-
-        for (start, length) in getattr(self, "_search_positions", []):
-            c = self.textCursor()
-            c.setPosition(start)
-            c.setPosition(start + length, QTextCursor.KeepAnchor)
-            f = QTextCharFormat()
-            f.setBackground(QColor(255,255,0,150))
-            f.setForeground(QColor(200,0,0))
-            e = QTextEdit.ExtraSelection()
-            e.cursor = c; e.format = f
-            sels.append(e)
-        self.setExtraSelections(sels)
-
-    def highlight_search(self, pattern: str, case_sensitive: bool=False, use_regex: bool=False, whole_word: bool=False):
-        import re
-        self._search_positions = []
-        if not pattern:
-            self._search_index = -1
-            self._highlight_current_line()
-            return
-        flags = 0 if case_sensitive else re.IGNORECASE
-        if not use_regex: pattern = re.escape(pattern)
-        if whole_word:    pattern = r"\b" + pattern + r"\b"
-        text = self.toPlainText()
-        try:
-            regex = re.compile(pattern, flags)
-        except re.error:
-            self._search_index = -1
-            self._highlight_current_line()
-            return
-        for m in regex.finditer(text):
-            self._search_positions.append((m.start(), m.end()-m.start()))
-        self._search_index = 0 if self._search_positions else -1
+        sel_line.format = self._line_fmt
+        self.setExtraSelections([sel_line])
+
+    def paintEvent(self, e):
+        super().paintEvent(e)
+        if self._search_positions: self._paint_search_hits(e.rect())
+
+    def _paint_search_hits(self, clip: QRect):
+        painter = QPainter(self.viewport())
+        offset = self.contentOffset()
+        cur = self._search_positions[self._search_index][0] if self._search_index >= 0 else -1
+        block = self.firstVisibleBlock()
+        starts, hits = self._search_starts, self._search_positions
+        while block.isValid():
+            geo = self.blockBoundingGeometry(block).translated(offset)
+            if geo.top() > clip.bottom(): break
+            if block.isVisible() and geo.bottom() >= clip.top():
+                bpos, layout = block.position(), block.layout()
+                i = bisect.bisect_left(starts, bpos)
+                j = bisect.bisect_left(starts, bpos + block.length(), i)
+                for start, length in hits[i:j]:
+                    rel = start - bpos
+                    line = layout.lineForTextPosition(rel)
+                    if not line.isValid(): continue
+                    end = min(rel + max(length, 1), line.textStart() + line.textLength())
+                    x1, x2 = line.cursorToX(rel)[0], line.cursorToX(end)[0]
+                    r = QRect(int(geo.left() + x1), int(geo.top() + line.y()), max(2, int(x2 - x1)), int(line.height()))
+                    painter.fillRect(r, self.HIT_CURRENT if start == cur else self.HIT_FILL)
+                    painter.fillRect(r.left(), r.bottom() - 1, r.width(), 2, self.HIT_LINE)
+            block = block.next()
+        painter.end()
+
+    # ---- 読み込み（大きいファイルは分割して流し込む） ----
+    def setPlainText(self, text: str):
+        self._search_gen += 1  # 別ファイルを開いたら前の検索結果は捨てる
+        self._search_positions, self._search_starts, self._search_index = [], [], -1
+        self._load_gen += 1    # 読み込み途中の前のファイルは打ち切り
+        self._source, self._pending = text, None
+        self._total_lines = text.count("\n") + 1
+        self.large = len(text) >= LARGE_FILE_CHARS
+        self.setUndoRedoEnabled(not self.large)  # 読み取り専用なので、大きいファイルでは取り消し履歴を持たない
+        if self.large:
+            self._chunks = _line_chunks(text, LARGE_FILE_CHUNK_LINES)
+            super().setPlainText(next(self._chunks))
+            QTimer.singleShot(0, lambda g=self._load_gen: self._load_more(g))
+        else:
+            self._chunks = None
+            super().setPlainText(text)
+        self._update_line_number_area_width(0)
+        self.search_status.emit(-1, 0)
+
+    def is_loading(self) -> bool:
+        return self._chunks is not None
+
+    def _load_more(self, gen: int):
+        if gen != self._load_gen or self._chunks is None: return
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._chunks = None; self._run_pending(); return
+        self.appendPlainText(chunk)
+        self._run_pending()
+        QTimer.singleShot(0, lambda: self._load_more(gen))  # 1回ごとにイベントループへ戻す
+
+    def _run_pending(self):
+        if self._pending is None: return
+        kind, v = self._pending
+        if self.is_loading():
+            if kind == "line" and v > self.blockCount(): return
+            if kind == "pos" and v >= self.document().characterCount(): return
+            if kind == "view" and (v[0] >= self.document().characterCount() or v[1] >= self.blockCount()): return
+        self._pending = None
+        if kind == "line": self.goto_line(v)
+        elif kind == "pos": self._goto_pos(v)
+        else: self.restore_view(v)
+
+    def view_state(self) -> tuple:
+        """(カーソル位置, 縦スクロール, 横スクロール)。読み込み直しの前後で表示を保つ"""
+        return (self.textCursor().position(), self.verticalScrollBar().value(), self.horizontalScrollBar().value())
+
+    def restore_view(self, state: tuple):
+        pos, v, h = state
+        if self.is_loading() and (pos >= self.document().characterCount() or v >= self.blockCount()):
+            self._pending = ("view", state); return  # そこまで読み込まれたら戻す
+        c = self.textCursor()
+        c.setPosition(min(pos, self.document().characterCount() - 1))
+        self.setTextCursor(c)
+        self.verticalScrollBar().setValue(v); self.horizontalScrollBar().setValue(h)
         self._highlight_current_line()
-        if self._search_index >= 0:
-            self._goto_pos(self._search_positions[0][0])
+
+    # ---- 検索（全文はワーカースレッド、描画は表示中の行だけ） ----
+
+    def set_search_positions(self, positions, index: int = 0, move: bool = True):
+        """ヒット一覧（開始位置順）を差し替えて index 番目へ移動（move=False は表示を動かさない）"""
+        self._search_positions = list(positions)
+        self._search_starts = [s for s, _ in self._search_positions]
+        self._search_index = index if self._search_positions else -1
+        self.search_status.emit(self._search_index, len(self._search_positions))
+        self.viewport().update()
+        if self._search_index >= 0 and move:
+            self._goto_pos(self._search_positions[self._search_index][0])
+
+    def highlight_search(self, pattern: str, case_sensitive: bool=False, use_regex: bool=False, whole_word: bool=False,
+                         keep_view: bool = False):
+        """keep_view: 読み込み直し後の再検索。表示は動かさず、カーソル以降の最初のヒットを「現在」にする"""
+        self._search_gen += 1  # 実行中の古い検索は結果を捨てる
+        self._search_keep = keep_view
+        regex = _compile_search(pattern, case_sensitive, use_regex, whole_word) if pattern else None
+        if regex is None:
+            self.set_search_positions([]); return
+        job = _SearchJob(self, self._search_gen, regex, self._source)  # 読み込み途中でも全文から
+        job.signals.done.connect(self._on_search_done)
+        QThreadPool.globalInstance().start(job)
+
+    def _on_search_done(self, gen: int, positions):
+        if gen != self._search_gen: return
+        if not self._search_keep: self.set_search_positions(positions); return
+        i = bisect.bisect_left([s for s, _ in positions], self.textCursor().position())
+        self.set_search_positions(positions, i if i < len(positions) else 0, move=False)
 
     def find_next(self):
         if not self._search_positions: return
         self._search_index = (self._search_index + 1) % len(self._search_positions)
+        self.search_status.emit(self._search_index, len(self._search_positions))
         self._goto_pos(self._search_positions[self._search_index][0])
 
     def find_prev(self):
         if not self._search_positions: return
         self._search_index = (self._search_index - 1) % len(self._search_positions)
+        self.search_status.emit(self._search_index, len(self._search_positions))
         self._goto_pos(self._search_positions[self._search_index][0])
 
     def _goto_pos(self, pos: int):
+        if self.is_loading() and pos >= self.document().characterCount():
+            self._pending = ("pos", pos); return  # その行が読み込まれたら移動
         c = self.textCursor()
         c.setPosition(pos)
         self.setTextCursor(c)
         self.centerCursor()
         self._highlight_current_line()
+        if self._search_positions: self.viewport().update()  # 「現在のヒット」の色を移す
 
     def goto_line(self, line: int):
         if line < 1: line = 1
+        if self.is_loading() and line > self.blockCount():
+            self._pending = ("line", line); return
         doc = self.document()
         blk = doc.findBlockByLineNumber(line-1)
         if blk.isValid():
@@ -167,8 +336,7 @@ class CodeEditor(QPlainTextEdit):
             delta = e.angleDelta().y()
             f = self.font()
             f.setPointSize(max(6, f.pointSize() + (1 if delta>0 else -1)))
-            self.setFont(f)
-            self._update_line_number_area_width(0)
+            self.setFont(f)  # ガター幅などは changeEvent で測り直す
             e.accept(); return
         super().wheelEvent(e)
 
@@ -176,6 +344,8 @@ class CodeEditor(QPlainTextEdit):
 # 検索バー
 
 class SearchBar(QWidget):
+    DEBOUNCE_MS = 180  # 入力が止まってから検索（1文字ごとに全文検索しない）
+
     def __init__(self, editor: 'CodeEditor | None' = None, parent=None):
         super().__init__(parent)
         self.setObjectName("searchBar")
@@ -183,7 +353,11 @@ class SearchBar(QWidget):
         lay = QHBoxLayout(self); lay.setContentsMargins(8,6,8,6); lay.setSpacing(6)
         self.edit = QLineEdit(); self.edit.setObjectName("searchEdit"); self.edit.setPlaceholderText("検索 (Enter=次へ / Shift+Enter=前へ)")
         self.btn_prev = QPushButton("◀"); self.btn_next = QPushButton("▶")
-        lay.addWidget(self.edit, 1); lay.addWidget(self.btn_prev); lay.addWidget(self.btn_next)
+        self.count = QLabel("")
+        self._searched = ""  # 最後に検索した語（Enter で「次へ」か「検索」かを決める）
+        lay.addWidget(self.edit, 1); lay.addWidget(self.count); lay.addWidget(self.btn_prev); lay.addWidget(self.btn_next)
+        self._debounce = QTimer(self); self._debounce.setSingleShot(True); self._debounce.setInterval(self.DEBOUNCE_MS)
+        self._debounce.timeout.connect(self._run_search)
         self.edit.returnPressed.connect(self._return_pressed)
         self.btn_next.clicked.connect(self._on_next)
         self.btn_prev.clicked.connect(self._on_prev)
@@ -194,9 +368,17 @@ class SearchBar(QWidget):
 
     def set_editor(self, editor: 'CodeEditor'):
         self.editor = editor
+        editor.search_status.connect(self._on_search_status)
+
+    def _on_search_status(self, index: int, count: int):
+        if not self.edit.text(): self.count.setText("")
+        elif count == 0: self.count.setText("0件")
+        else: self.count.setText(f"{index + 1}/{count}")
 
     def _return_pressed(self):
         if not self.editor: return
+        if self._debounce.isActive() or self.edit.text() != self._searched:  # 入力直後の Enter は待たずに検索
+            self._debounce.stop(); self._run_search(); return
         if QApplication.keyboardModifiers() & Qt.ShiftModifier:
             self.editor.find_prev()
         else:
@@ -209,7 +391,18 @@ class SearchBar(QWidget):
         if self.editor: self.editor.find_prev()
 
     def _on_text_changed(self, s: str):
-        if self.editor: self.editor.highlight_search(s)
+        if self.editor and self.editor.large:  # 大きいファイルは打鍵ごとに全文検索しない
+            self.count.setText("Enterで検索" if s else ""); return
+        self._debounce.start()
+
+    def _run_search(self):
+        self._searched = self.edit.text()
+        if self.editor: self.editor.highlight_search(self._searched)
+
+    def rerun(self):
+        """ファイルを読み込み直した後、最後に検索した語でもう一度（表示位置はそのまま）"""
+        if self.editor and self.isVisible() and self._searched:
+            self.editor.highlight_search(self._searched, keep_view=True)
 
 
 # D&D ドロップエリア
@@ -256,6 +449,51 @@ class ReadmeDialog(QDialog):
         self.setStyleSheet(build_qss(compact=False))
 
 
+# シンボルへ移動（Ctrl+P）
+
+class SymbolPalette(QDialog):
+    """入力のたびに SymbolIndex.search で候補を出し直す（索引は作成済みなので待ち時間なし）。Enter / ダブルクリックで on_pick(名前)"""
+    def __init__(self, index: SymbolIndex, on_pick, parent=None):
+        super().__init__(parent)
+        self.index, self.on_pick = index, on_pick
+        self._ids = []
+        self.setWindowFlags(Qt.Dialog | Qt.FramelessWindowHint)
+        self.setAttribute(Qt.WA_TranslucentBackground)
+        self.resize(640, 420)
+        outer = QVBoxLayout(self); outer.setContentsMargins(0,0,0,0)
+        bg = QWidget(); bg.setObjectName("bgRoot"); outer.addWidget(bg)
+        bgLay = QVBoxLayout(bg); bgLay.setContentsMargins(10,10,10,10)
+        card = QWidget(); card.setObjectName("glassRoot"); bgLay.addWidget(card)
+        self._shadow = apply_drop_shadow(card)
+        lay = QVBoxLayout(card); lay.setContentsMargins(12,12,12,12)
+        self.edit = QLineEdit(); self.edit.setPlaceholderText(f"シンボルへ移動（{len(index)}件）: 前方一致 / 頭文字 gfi / 部分一致 / 飛び飛び")
+        self.list = QListWidget(); self.list.setUniformItemSizes(True)
+        lay.addWidget(self.edit); lay.addWidget(self.list, 1)
+        self.edit.textChanged.connect(self._update)
+        self.edit.returnPressed.connect(self._pick_current)
+        self.list.itemActivated.connect(lambda _: self._pick_current())
+        self.edit.installEventFilter(self)
+        self.setStyleSheet(build_qss(compact=False))
+        self._update("")
+
+    def _update(self, text: str):
+        self._ids = self.index.search(text) if text.strip() else list(range(min(50, len(self.index))))
+        self.list.clear()
+        self.list.addItems([self.index.label(i) for i in self._ids])
+        if self._ids: self.list.setCurrentRow(0)
+
+    def _pick_current(self):
+        row = self.list.currentRow()
+        if 0 <= row < len(self._ids):
+            self.accept(); self.on_pick(self.index.names[self._ids[row]])
+
+    def eventFilter(self, obj, e):
+        # 入力欄にフォーカスを置いたまま ↑↓ / PageUp/Down で候補を選ぶ
+        if obj is self.edit and e.type() == QEvent.KeyPress and e.key() in (Qt.Key_Up, Qt.Key_Down, Qt.Key_PageUp, Qt.Key_PageDown):
+            QApplication.sendEvent(self.list, e); return True
+        return super().eventFilter(obj, e)
+
+
 # SVG ホットスポット
 
 class HotSpotItem(QGraphicsRectItem):
@@ -283,12 +521,120 @@ class HotSpotItem(QGraphicsRectItem):
         self.setToolTip(text)
 
 
+# バックグラウンド解析（解析 → ツリー、続けてフローチャート）
+
+_PIPELINE_LOCK = threading.Lock()  # processor の _SHARED を使うため、同時に走るパイプラインは1本
+
+class _JobSignals(QObject):
+    progress = Signal(int, str)
+    analyzed = Signal(int, object, object, object)  # (job_id, AnalyzeResult, FocusGraph, SymbolIndex)
+    flow_ready = Signal(int, object, object, str)
+    flow_kept = Signal(int)  # 呼び出し関係が前回と同じ（表示中のフローチャートをそのまま使う）
+    project_ready = Signal(int, object, object, object, str)  # (job_id, ProjectResult, FocusGraph, SymbolIndex, レポートのパス)
+    failed = Signal(int, str)
+
+class AnalysisJob(QRunnable):
+    """prev_fg: 同じファイルを表示中なら前回の FocusGraph（グラフが変わらなければ使い回して描き直さない）"""
+    def __init__(self, job_id: int, path: str, code: str, token: CancelToken, prev_fg: FocusGraph | None = None):
+        super().__init__()
+        self.job_id, self.path, self.code, self.token, self.prev_fg = job_id, path, code, token, prev_fg
+        self.signals = _JobSignals()
+
+    def run(self):
+        s, jid, name = self.signals, self.job_id, os.path.basename(self.path)
+        try:
+            with _PIPELINE_LOCK:  # 古いジョブは cancel 済みなのですぐ抜ける
+                self.token.check()
+                s.progress.emit(jid, f"解析中: {name}（PEP8/AST）")
+                with span("analyze_file", file=name):
+                    result = analyze_file(self.code, self.path, cancel=self.token)
+                with span("symbol_index"):
+                    index = SymbolIndex.from_result(result.def_positions, result.def_kinds)
+                prev = self.prev_fg
+                if prev is not None and prev.same_graph(result.function_calls, result.def_kinds):
+                    s.analyzed.emit(jid, result, prev, index)
+                    s.flow_kept.emit(jid); return
+                with span("focus_graph"):
+                    fg = FocusGraph(result.function_calls, result.def_kinds)
+                s.analyzed.emit(jid, result, fg, index)
+                s.progress.emit(jid, f"フローチャート生成中: {name}")
+                base = os.path.splitext(name)[0]
+                with span("flowchart"):
+                    if len(fg) > FOCUS_AUTO_NODES and fg.default_center():
+                        # 大きいグラフは全体を dot に渡さず、中心になりそうなノードの近傍だけ描く
+                        png_path, svg_path, msg = fg.render(fg.default_center(), FOCUS_HOPS, base, cancel=self.token)
+                    else:
+                        png_path, svg_path, msg = generate_flowchart_image(result.function_calls, result.def_kinds, base,
+                                                                           cancel=self.token)
+                s.flow_ready.emit(jid, png_path, svg_path, msg)
+        except Cancelled:
+            pass
+        except Exception as e:
+            s.failed.emit(jid, f"{type(e).__name__}: {e}")
+
+class ProjectJob(QRunnable):
+    """プロジェクト解析（解析 → レポート → ツリー、続けてフローチャート）。_SHARED を使うので AnalysisJob と同じロックの中で"""
+    def __init__(self, job_id: int, root: str, token: CancelToken):
+        super().__init__()
+        self.job_id, self.root, self.token = job_id, root, token
+        self.signals = _JobSignals()
+
+    def run(self):
+        from project import analyze_project, write_project_report
+        s, jid = self.signals, self.job_id
+        try:
+            with _PIPELINE_LOCK:
+                self.token.check()
+                with span("analyze_project", root=self.root):
+                    pr = analyze_project(self.root)
+                self.token.check()
+                with span("report"):
+                    report = write_project_report(pr)
+                with span("symbol_index"):
+                    index = SymbolIndex.from_result(pr.def_positions, pr.def_kinds)
+                with span("focus_graph"):
+                    fg = FocusGraph(pr.function_calls, pr.def_kinds, pr.module_of,
+                                    pattern_tags=pr.pattern_tags, module_name=pr.package, metrics={})
+                s.project_ready.emit(jid, pr, fg, index, report)
+                s.progress.emit(jid, f"フローチャート生成中: {pr.package}")
+                base = f"{pr.package}_project"
+                with span("flowchart"):
+                    if len(fg) > FOCUS_AUTO_NODES and fg.default_center():
+                        png_path, svg_path, msg = fg.render(fg.default_center(), FOCUS_HOPS, base, cancel=self.token)
+                    else:
+                        png_path, svg_path, msg = fg.render_full(base, cancel=self.token)
+                s.flow_ready.emit(jid, png_path, svg_path, msg)
+        except Cancelled:
+            pass
+        except Exception as e:
+            s.failed.emit(jid, f"{type(e).__name__}: {e}")
+
+class FlowJob(QRunnable):
+    """フローチャートだけを描き直す（フォーカス表示 / 全体表示の切り替え）。fn(token) → (png, svg, msg)"""
+    def __init__(self, job_id: int, fn, token: CancelToken):
+        super().__init__()
+        self.job_id, self.fn, self.token = job_id, fn, token
+        self.signals = _JobSignals()
+
+    def run(self):
+        try:
+            with _PIPELINE_LOCK:
+                self.token.check()
+                with span("flowchart"):
+                    png_path, svg_path, msg = self.fn(self.token)
+            self.signals.flow_ready.emit(self.job_id, png_path, svg_path, msg)
+        except Cancelled:
+            pass
+        except Exception as e:
+            self.signals.failed.emit(self.job_id, f"{type(e).__name__}: {e}")
+
+
 # メインウィンドウ
 
 class MainWindow(QWidget):
-    ROLE_DECL_LINE = Qt.UserRole + 1
-    ROLE_PEP8_LINE = Qt.UserRole + 2
-    ROLE_SYMBOL_NAME = Qt.UserRole + 3
+    ROLE_DECL_LINE = resultmodel.ROLE_DECL_LINE
+    ROLE_PEP8_LINE = resultmodel.ROLE_PEP8_LINE
+    ROLE_SYMBOL_NAME = resultmodel.ROLE_SYMBOL_NAME
 
     def __init__(self):
         super().__init__()
@@ -349,17 +695,27 @@ class MainWindow(QWidget):
         main.addLayout(tool)
 
         # 中央：ツリー/コード/フロービュー
-        self.tree = QTreeWidget(); self.tree.setHeaderHidden(True)
-        self.tree.itemDoubleClicked.connect(self._on_tree_double_clicked)
+        self.tree_model = ResultTreeModel(self)
+        self.tree = QTreeView(); self.tree.setHeaderHidden(True); self.tree.setModel(self.tree_model)
+        self.tree.setUniformRowHeights(True)  # 行の高さを1回だけ測る（数千行でもスクロールが軽い）
+        self.tree.doubleClicked.connect(self._on_tree_double_clicked)
+        self.tree.clicked.connect(self._on_tree_clicked)
+        self.tree_filter = QLineEdit(); self.tree_filter.setPlaceholderText("ツリーを絞り込み…")
+        self.tree_filter.setClearButtonEnabled(True)
+        self._tree_filter_timer = QTimer(self); self._tree_filter_timer.setSingleShot(True); self._tree_filter_timer.setInterval(150)
+        self._tree_filter_timer.timeout.connect(self._apply_tree_filter)
+        self.tree_filter.textChanged.connect(lambda _: self._tree_filter_timer.start())
+        tree_box = QWidget(); tlay = QVBoxLayout(tree_box); tlay.setContentsMargins(0,0,0,0); tlay.setSpacing(4)
+        tlay.addWidget(self.tree_filter); tlay.addWidget(self.tree, 1)
 
         self.code = CodeEditor(); self.code.setReadOnly(True)
         self.searchBar = SearchBar(self.code, self)
         main.addWidget(self.searchBar)
 
-        self.flowview = QGraphicsView(); self.flowview.setScene(QGraphicsScene()); self.flowview.setMinimumHeight(220)
+        self.flowview = FlowView(); self.flowview.setScene(QGraphicsScene()); self.flowview.setMinimumHeight(220)
 
         split_lr = QSplitter(); split_lr.setOrientation(Qt.Horizontal)
-        split_lr.addWidget(self.tree); split_lr.addWidget(self.code); split_lr.setSizes([260, 520])
+        split_lr.addWidget(tree_box); split_lr.addWidget(self.code); split_lr.setSizes([260, 520])
         main.addWidget(split_lr, 1)
         main.addWidget(self.flowview, 0)
 
@@ -379,7 +735,13 @@ class MainWindow(QWidget):
         cbar = QHBoxLayout(); cbar.addWidget(QLabel("メニュー")); b = QPushButton("⇐"); b.clicked.connect(lambda: self._toggle_menu(False))
         cbar.addStretch(); cbar.addWidget(b); mlay.addLayout(cbar)
         mlay.addWidget(self._make_menu_button("README", self._show_readme))
+        mlay.addWidget(self._make_menu_button("フォルダを解析（プロジェクト）", self._pick_project))
+        mlay.addWidget(self._make_menu_button("フローチャート全体を表示", self._show_full_flow))
         mlay.addWidget(self._make_menu_button("保存フォルダを開く", self._open_save_dir))
+        self.btn_watch = self._make_menu_button("", lambda: self._set_watch(not self._watch_on))
+        mlay.addWidget(self.btn_watch)
+        self.btn_perf = self._make_menu_button("", lambda: self._set_perf(not perftrace.ENABLED))
+        mlay.addWidget(self.btn_perf)
         mlay.addStretch()
 
         self.menu_anim = QPropertyAnimation(self.menu, b"geometry", self)
@@ -395,6 +757,30 @@ class MainWindow(QWidget):
         self.current_code = ""
         self.def_positions = {}
         self.def_kinds = {}
+        self.metrics = {}
+        self.project = None  # プロジェクト解析中は ProjectResult（ノード→ファイル/行の解決に使う）
+        self._project_done = ""  # プロジェクト解析の完了メッセージ（フローチャートが届いたら後ろに足す）
+        self._pool = QThreadPool(self); self._pool.setMaxThreadCount(2)
+        self._job = None
+        self._job_id = 0
+        self._job_token = None
+        self.focus_graph = None   # 表示中のグラフ（クリックでその近傍だけを描き直す）
+        self.flow_base = ""
+        self._flow_id = 0
+        self._flow_token = None
+        self.symbol_index = None  # Ctrl+P 用（解析のたびにワーカー側で作り直す）
+        self._shown_path = None   # ツリーに表示中の単一ファイル（同じファイルの再解析は差分で更新）
+        self._flow_fg = None      # フローチャートを描き終えたときの FocusGraph（再解析で変わらなければ描き直さない）
+
+        # ファイル監視（保存の連続はタイマーでまとめ、内容のハッシュが変わったときだけ読み込み直す）
+        self._watcher = QFileSystemWatcher(self)
+        self._watch_timer = QTimer(self); self._watch_timer.setSingleShot(True); self._watch_timer.setInterval(WATCH_DEBOUNCE_MS)
+        self._watch_timer.timeout.connect(self._check_watched)
+        self._watcher.fileChanged.connect(lambda _p: self._watch_timer.start())
+        self._watcher.directoryChanged.connect(lambda _p: self._watch_timer.start())  # 一時ファイル → rename の保存
+        self._loaded_digest = ""
+        self._set_watch(WATCH_FILES)
+        self._set_perf(perftrace.ENABLED)
 
         # ショートカット
         self._sc_open  = QAction(self); self._sc_open.setShortcut("Ctrl+O"); self._sc_open.triggered.connect(self._pick_file); self.addAction(self._sc_open)
@@ -402,6 +788,7 @@ class MainWindow(QWidget):
         self._sc_find  = QAction(self); self._sc_find.setShortcut("Ctrl+F"); self._sc_find.triggered.connect(self._toggle_searchbar); self.addAction(self._sc_find)
         self._sc_next  = QAction(self); self._sc_next.setShortcut("F3"); self._sc_next.triggered.connect(lambda: self.code.find_next()); self.addAction(self._sc_next)
         self._sc_prev  = QAction(self); self._sc_prev.setShortcut("Shift+F3"); self._sc_prev.triggered.connect(lambda: self.code.find_prev()); self.addAction(self._sc_prev)
+        self._sc_symbol= QAction(self); self._sc_symbol.setShortcut("Ctrl+P"); self._sc_symbol.triggered.connect(self._show_symbol_palette); self.addAction(self._sc_symbol)
 
     # ---- タイトルバー小ボタン ----
     def _style_title_btn(self, btn: QPushButton, role: str | None = None):
@@ -440,104 +827,301 @@ class MainWindow(QWidget):
             if f.lower().endswith(".py"):
                 self._load_and_analyze(f); break
 
-    def _load_and_analyze(self, path: str):
-        try:
-            with open(path, "r", encoding="utf-8") as fp:
-                code = fp.read()
-        except Exception as e:
-            self.status.setText(f"読み込み失敗: {e}")
-            return
+    def _load_and_analyze(self, path: str, code: str | None = None):
+        if code is None:
+            try:
+                with open(path, "r", encoding="utf-8") as fp:
+                    code = fp.read()
+            except Exception as e:
+                self.status.setText(f"読み込み失敗: {e}")
+                return
+        same = path == self._shown_path and self.project is None
         self.current_file = path
         self.current_code = code
+        self._loaded_digest = text_digest(code)
+        self.project = None
+        self._rewatch()
+        self.symbol_index = None  # 解析が終わるまでは前のファイルの行へ飛ばさない
+        if not same: self._shown_path = self._flow_fg = None
         self.code.setPlainText(code)
-        self.status.setText(f"解析中: {os.path.basename(path)}")
-
-        result = analyze_file(code, path)
+        self.status.setText(f"解析中: {os.path.basename(path)}" + ("（大きいファイル: 表示は分割して読み込み）" if self.code.large else ""))
+        self._start_job(path, code, self._flow_fg)
+
+    # ---- ファイル監視 ----
+    def _set_watch(self, on: bool):
+        self._watch_on = on
+        self.btn_watch.setText(f"ファイル監視: {'オン' if on else 'オフ'}")
+        self._rewatch()
+        if on: self._watch_timer.start()  # オフの間に保存されていたら拾う
+
+    def _rewatch(self):
+        old = self._watcher.files() + self._watcher.directories()
+        if old: self._watcher.removePaths(old)
+        path = self.current_file
+        if self._watch_on and path and self.project is None and os.path.exists(path):
+            self._watcher.addPaths([path, os.path.dirname(os.path.abspath(path))])
+
+    def _check_watched(self):
+        path = self.current_file
+        if not self._watch_on or not path or self.project is not None: return
+        if path not in self._watcher.files() and os.path.exists(path):
+            self._watcher.addPath(path)  # rename で置き換えられると監視から外れる
+        try:
+            with open(path, "r", encoding="utf-8") as fp: code = fp.read()
+        except (OSError, UnicodeDecodeError):
+            return  # 消えた / 書き込み途中。次の通知を待つ
+        if text_digest(code) == self._loaded_digest: return  # 保存し直しただけ
+        view = self.code.view_state()
+        self._load_and_analyze(path, code)
+        self.code.restore_view(view)
+        self.searchBar.rerun()
+
+    def _cancel_job(self):
+        if self._job_token is not None: self._job_token.cancel()
+        self._job_token = None; self._job = None
+        self._cancel_flow()
+
+    def _cancel_flow(self):
+        if self._flow_token is not None: self._flow_token.cancel()
+        self._flow_token = None; self._flow_id += 1
+
+    def _start_job(self, path: str, code: str, prev_fg: FocusGraph | None = None):
+        self._cancel_job()  # 実行中の古いジョブは中断（flake8/dot も kill）
+        perftrace.take()  # 前のジョブの span は捨てる
+        self._job_id += 1
+        self._job_token = CancelToken()
+        job = AnalysisJob(self._job_id, path, code, self._job_token, prev_fg)
+        job.signals.progress.connect(self._on_job_progress)
+        job.signals.analyzed.connect(self._on_job_analyzed)
+        job.signals.flow_ready.connect(self._on_job_flow_ready)
+        job.signals.flow_kept.connect(self._on_job_flow_kept)
+        job.signals.failed.connect(self._on_job_failed)
+        self._job = job
+        self._pool.start(job)
+
+    def _on_job_progress(self, job_id: int, text: str):
+        if job_id == self._job_id: self.status.setText(text)
+
+    def _on_job_analyzed(self, job_id: int, result, fg, index):
+        if job_id != self._job_id: return
+        self.focus_graph = fg
+        self.symbol_index = index
+        self.flow_base = os.path.splitext(os.path.basename(self.current_file or ""))[0]
         self.def_positions = result.def_positions
         self.def_kinds = result.def_kinds
-        self._fill_tree(result)
-
-        base = os.path.splitext(os.path.basename(path))[0]
-        png_path, svg_path, msg = generate_flowchart_image(result.function_calls, result.def_kinds, base)
-        self._show_flow_image(svg_path, png_path)
+        self.metrics = result.metrics
+        with span("tree"):
+            if self._shown_path == self.current_file:
+                self.tree_model.update_result(result)  # 変わったセクションだけ差し替え（展開状態を保つ）
+            else:
+                self._fill_tree(result)
+        self._shown_path = self.current_file
+
+    def _on_job_flow_ready(self, job_id: int, png_path, svg_path, msg: str):
+        if job_id != self._job_id: return
+        with span("scene"):
+            note = self._show_flow_image(svg_path, png_path)
+        self._flow_fg = self.focus_graph
         tail = f"（SVG: 出力済み）" if svg_path else ""
-        self.status.setText(f"解析完了: {os.path.basename(path)} → {os.path.join(SAVE_DIR, base+'_analysis_with_pep8.txt')} / {msg} {tail}")
+        self._set_done_status(f"{msg} {tail}{note}")
+
+    def _on_job_flow_kept(self, job_id: int):
+        if job_id != self._job_id: return
+        # 呼び出し関係は同じ（行番号だけ変わった）→ シーンはそのまま、ツールチップの行番号だけ更新
+        sc = self.flowview.scene()
+        for name, item in (sc.nodes.items() if isinstance(sc, FlowScene) else ()):
+            item.setToolTip(self._flow_tooltip(name))
+        for item in (sc.items() if sc is not None and not isinstance(sc, FlowScene) else ()):
+            if isinstance(item, HotSpotItem): item.setToolTipText(self._flow_tooltip(item.name))
+        self._set_done_status("フローチャート: 呼び出し関係に変化なし（表示を維持）")
+
+    def _set_done_status(self, msg: str):
+        name = os.path.basename(self.current_file or "")
+        base = os.path.splitext(name)[0]
+        cs = analysis_cache_stats()
+        inc = incremental_stats(self.current_file or "")
+        tail = f" / 差分解析: {inc['units']}区間中 {inc['reused']} を再利用（PEP8 再チェック {inc['restyled']}）" if inc else ""
+        self.status.setText(f"解析完了: {name} → {os.path.join(SAVE_DIR, base+'_analysis_with_pep8.txt')} / {msg}"
+                            f" / キャッシュ hit {cs['hits']} miss {cs['misses']}{tail}{self._perf_tail(base)}")
+        self._job = None
+
+    def _perf_tail(self, base: str) -> str:
+        """計測オンなら、ここまでの span を SAVE_DIR/trace/<base>_trace.json に書き、段ごとの合計を返す"""
+        events = perftrace.take()
+        if not perftrace.ENABLED or not events: return ""
+        try:
+            path = os.path.basename(perftrace.save_trace(events, base))
+        except OSError as e:
+            path = f"書き出し失敗: {e}"
+        return f" / 計測: {perftrace.summary(events)}（{path}）"
+
+    def _set_perf(self, on: bool):
+        perftrace.enable(on)
+        self.btn_perf.setText(f"計測: {'オン' if on else 'オフ'}")
+
+    def _on_job_failed(self, job_id: int, err: str):
+        if job_id != self._job_id: return
+        perftrace.take()
+        self.status.setText(f"解析失敗: {err}"); self._job = None
+
+    # ---- フォーカス表示（近傍だけ描き直し）----
+    def _start_flow_job(self, fn, text: str):
+        self._cancel_flow()  # 連打されたら古い描画は捨てる
+        self._flow_token = CancelToken()
+        perftrace.take()
+        job = FlowJob(self._flow_id, fn, self._flow_token)
+        job.signals.flow_ready.connect(self._on_flow_ready)
+        job.signals.failed.connect(lambda jid, err: jid == self._flow_id and self.status.setText(f"描画失敗: {err}"))
+        self.status.setText(text)
+        self._pool.start(job)
+
+    def _on_flow_ready(self, flow_id: int, png_path, svg_path, msg: str):
+        if flow_id != self._flow_id: return
+        with span("scene"):
+            note = self._show_flow_image(svg_path, png_path)
+        self.status.setText(msg + note + self._perf_tail(f"{self.flow_base}_focus"))
+
+    def _focus_on(self, name: str):
+        fg = self.focus_graph
+        if fg is None or name not in fg.nodes: return
+        base = self.flow_base
+        self._start_flow_job(lambda tok: fg.render(name, FOCUS_HOPS, base, cancel=tok), f"フォーカス表示を生成中: {name}")
+
+    def _show_full_flow(self):
+        self._toggle_menu(False)
+        fg = self.focus_graph
+        if fg is None: return
+        base = self.flow_base
+        self._start_flow_job(lambda tok: fg.render_full(base, cancel=tok), f"フローチャート全体を生成中（{len(fg)}ノード）")
+
+    def _on_tree_clicked(self, index):
+        sym = index.data(self.ROLE_SYMBOL_NAME)
+        if sym: self._focus_on(sym)
+
+    def _on_hotspot_clicked(self, name: str):
+        fg = self.focus_graph
+        if fg is not None and name in fg.placeholders:  # 「+N 呼び出し元/先」→ 元ノードを中心に展開
+            self._focus_on(fg.placeholders[name]); return
+        self._jump_to_symbol(name)
+        self._focus_on(name)
+
+    # ---- プロジェクト（複数ファイル）解析 ----
+    def _pick_project(self):
+        self._toggle_menu(False)
+        d = QFileDialog.getExistingDirectory(self, "プロジェクトのフォルダを選択")
+        if d: self._load_project(d)
+
+    def _load_project(self, root: str):
+        self._cancel_job()  # 単一ファイル解析の結果が後から届いても無視
+        perftrace.take()
+        self._job_id += 1
+        self._job_token = CancelToken()
+        job = ProjectJob(self._job_id, root, self._job_token)
+        job.signals.progress.connect(self._on_job_progress)
+        job.signals.project_ready.connect(self._on_project_ready)
+        job.signals.flow_ready.connect(self._on_project_flow_ready)
+        job.signals.failed.connect(self._on_job_failed)
+        self._job = job
+        self.status.setText(f"プロジェクト解析中: {root}")
+        self._pool.start(job)
+
+    def _on_project_ready(self, job_id: int, pr, fg, index, report: str):
+        if job_id != self._job_id: return
+        self.project = pr
+        self._shown_path = self._flow_fg = None
+        self._rewatch()  # プロジェクト表示中は監視しない
+        self.def_positions = pr.def_positions
+        self.def_kinds = pr.def_kinds
+        self.metrics = {}
+        self.symbol_index = index
+        self.focus_graph = fg
+        self.flow_base = f"{pr.package}_project"
+        with span("tree"):
+            self._fill_project_tree(pr)
+        st = pr.stats
+        self._project_done = (f"プロジェクト解析完了: {st['modules']}モジュール / 定義 {st['definitions']} / "
+                              f"解決済み呼び出し {st['resolved_calls']} → {report}")
+
+    def _on_project_flow_ready(self, job_id: int, png_path, svg_path, msg: str):
+        if job_id != self._job_id: return
+        with span("scene"):
+            note = self._show_flow_image(svg_path, png_path)
+        self.status.setText(f"{self._project_done} / {msg}{note}{self._perf_tail(self.flow_base)}")
+        self._job = None
+
+    def _fill_project_tree(self, pr):
+        self.tree_model.set_project(pr)
+        self.tree.expandToDepth(0)
+
+    def _open_source(self, path: str) -> bool:
+        """解析せずにエディタへ読み込むだけ（プロジェクト内の別ファイルへのジャンプ用）"""
+        if path == self.current_file: return True
+        try:
+            with open(path, "r", encoding="utf-8") as fp: code = fp.read()
+        except Exception as e:
+            self.status.setText(f"読み込み失敗: {e}"); return False
+        self.current_file = path; self.current_code = code
+        self.code.setPlainText(code)
+        return True
 
-    # ---- ツリー構築 ----
+    # ---- ツリー構築（モデルが結果を直接読み、子は展開した分だけ作る）----
     def _fill_tree(self, result):
-        self.tree.clear()
-        pep = QTreeWidgetItem(self.tree, ["PEP8スタイルチェック"])
-        pep_pat = re.compile(r":(\d+):(\d+):\s*([A-Z]\d+)\s*(.*)")
-        for line in result.style_issues or ["(問題なし or flake8未検出)"]:
-            item = QTreeWidgetItem(pep, [line])
-            m = pep_pat.search(line)
-            if m:
-                item.setData(0, self.ROLE_PEP8_LINE, int(m.group(1)))
-
-        ref = QTreeWidgetItem(self.tree, ["リファクタリングの提案"])
-        for s in result.refactor_suggestions or ["(特になし)"]:
-            QTreeWidgetItem(ref, [s])
-
-        defs_root = QTreeWidgetItem(self.tree, ["定義（行番号）"])
-        classes = sorted([n for n,k in result.def_kinds.items() if k=="class"], key=lambda n: result.def_positions.get(n,0))
-        methods = [n for n,k in result.def_kinds.items() if k=="method"]
-        methods_by_class = {}
-        for m in methods:
-            cls, meth = m.split(".",1)
-            methods_by_class.setdefault(cls, []).append(m)
-        for cls in classes:
-            ci = QTreeWidgetItem(defs_root, [f"class {cls} (L{result.def_positions.get(cls,0)})"])
-            ci.setData(0, self.ROLE_DECL_LINE, result.def_positions.get(cls,0))
-            ci.setData(0, self.ROLE_SYMBOL_NAME, cls)
-            for m in sorted(methods_by_class.get(cls, []), key=lambda n: result.def_positions.get(n,0)):
-                mi = QTreeWidgetItem(ci, [f"def {m} (L{result.def_positions.get(m,0)})"])
-                mi.setData(0, self.ROLE_DECL_LINE, result.def_positions.get(m,0))
-                mi.setData(0, self.ROLE_SYMBOL_NAME, m)
-        funcs = sorted([n for n,k in result.def_kinds.items() if k=="function"], key=lambda n: result.def_positions.get(n,0))
-        for f in funcs:
-            fi = QTreeWidgetItem(defs_root, [f"def {f} (L{result.def_positions.get(f,0)})"])
-            fi.setData(0, self.ROLE_DECL_LINE, result.def_positions.get(f,0))
-            fi.setData(0, self.ROLE_SYMBOL_NAME, f)
-
-        calls_root = QTreeWidgetItem(self.tree, ["関数/メソッドの呼び出し関係"])
-        for caller, callees in result.function_calls.items():
-            parent = QTreeWidgetItem(calls_root, [caller])
-            parent.setData(0, self.ROLE_SYMBOL_NAME, caller)
-            parent.setData(0, self.ROLE_DECL_LINE, result.def_positions.get(caller, 0))
-            for c in callees:
-                it = QTreeWidgetItem(parent, [c])
-                if c in result.def_positions:
-                    it.setData(0, self.ROLE_DECL_LINE, result.def_positions.get(c, 0))
-                    it.setData(0, self.ROLE_SYMBOL_NAME, c)
-
-        keys = QTreeWidgetItem(self.tree, ["キーワードと簡易説明"])
-        for k, v in {**result.keywords_in_code, **result.builtins_in_code}.items():
-            QTreeWidgetItem(keys, [f"{k}: {v}"])
-
-        self.tree.expandToDepth(1)
+        self.tree_model.set_result(result)
+        self._expand_tree()
+
+    def _expand_tree(self):
+        # 小さい結果は従来どおりクラス/呼び出し元まで開く。大きいとセクションだけ（開くと全件読み込みになるため）
+        self.tree.expandToDepth(1 if self.tree_model.total_rows() < 2000 else 0)
+
+    def _apply_tree_filter(self):
+        self.tree_model.set_filter(self.tree_filter.text())
+        self._expand_tree()
 
     # ---- ツリーのダブルクリック ----
-    def _on_tree_double_clicked(self, item: QTreeWidgetItem):
-        line = item.data(0, self.ROLE_PEP8_LINE)
+    def _on_tree_double_clicked(self, index):
+        line = index.data(self.ROLE_PEP8_LINE)
         if isinstance(line, int) and line > 0:
             self.code.goto_line(line); return
-        decl = item.data(0, self.ROLE_DECL_LINE)
+        sym = index.data(self.ROLE_SYMBOL_NAME)
+        if self.project is not None and sym in self.project.locations:
+            self._jump_to_symbol(sym); return
+        decl = index.data(self.ROLE_DECL_LINE)
         if isinstance(decl, int) and decl > 0:
             self.code.goto_line(decl); return
-        text = item.text(0)
+        text = index.data(Qt.DisplayRole) or ""
         if ":" in text:
             key = text.split(":")[0].strip()
             positions = highlight_positions_in_text(self.current_code, key)
             if positions:
-                self.code._search_positions = positions
-                self.code._search_index = 0
-                self.code._goto_pos(positions[0][0])
-
-    # ---- Flow画像表示（SVG優先 + ホットスポット） ----
-    def _show_flow_image(self, svg_path: str | None, png_path: str | None):
+                self.code.set_search_positions(positions)
+
+    # ---- Flow表示（レイアウトJSON → ネイティブ描画 / SVG + ホットスポット / PNG） ----
+    def _flow_tooltip(self, name: str) -> str:
+        fg = self.focus_graph
+        if fg is not None and name in fg.placeholders: return f"クリックで {fg.placeholders[name]} を中心に展開"
+        m = self.metrics.get(name)
+        cx = f"  複雑度 {m.cc}（認知的 {m.cognitive}, 入れ子 {m.nest}, {m.lines}行）" if m else ""
+        own = sorted(fg.pattern_tags.get(name, ())) if fg is not None else []
+        inh = fg.inherited_tags.get(name, {}) if fg is not None else {}
+        tags = ", ".join(own + [f"{t}←{v}" for t, v in sorted(inh.items())])
+        return f"{name}  (L{self.def_positions.get(name, 0)}){cx}{f'  [{tags}]' if tags else ''}  —  クリックでジャンプ"
+
+    def _show_flow_image(self, svg_path: str | None, png_path: str | None) -> str:
+        """表示して、ステータスに足す注記を返す（レイアウト JSON が読めず SVG 表示にしたときだけ）"""
+        note = ""
+        layout_path = os.path.splitext(svg_path or png_path or "")[0] + "_layout.json"
+        if FLOW_RENDERER != "svg" and (svg_path or png_path) and os.path.exists(layout_path):
+            try:
+                scene = load_flow_scene(layout_path, self._on_hotspot_clicked, self._flow_tooltip)
+                self.flowview.setScene(scene)
+                self.flowview.fitInView(scene.sceneRect(), Qt.KeepAspectRatio)
+                return note
+            except Exception as e:
+                note = f" / レイアウト読み込み失敗のため SVG で表示: {e}"  # 下の SVG 表示へ
         scene = QGraphicsScene()
         self.flowview.setScene(scene)
         if svg_path and os.path.exists(svg_path):
+            from PySide6.QtSvgWidgets import QGraphicsSvgItem  # SVG 表示のときだけ読み込む（起動を軽く）
             item = QGraphicsSvgItem(svg_path)
             scene.addItem(item)
             scene.setSceneRect(item.boundingRect())
@@ -551,9 +1135,8 @@ class MainWindow(QWidget):
                         if not isinstance(rect, (list, tuple)) or len(rect) != 4:
                             continue
                         x,y,w,h = rect
-                        hs = HotSpotItem(QRect(int(x), int(y), int(w), int(h)), name, self._jump_to_symbol)
-                        line = self.def_positions.get(name, 0)
-                        hs.setToolTipText(f"{name}  (L{line})  —  クリックでジャンプ")
+                        hs = HotSpotItem(QRect(int(x), int(y), int(w), int(h)), name, self._on_hotspot_clicked)
+                        hs.setToolTipText(self._flow_tooltip(name))
                         scene.addItem(hs)
                 except Exception as e:
                     print("hotspot load error:", e)
@@ -565,14 +1148,27 @@ class MainWindow(QWidget):
                 scene.setSceneRect(pix.rect())
         if not scene.sceneRect().isEmpty():
             self.flowview.fitInView(scene.sceneRect(), Qt.KeepAspectRatio)
+        return note
 
     def _jump_to_symbol(self, name: str):
+        if self.project is not None and name in self.project.locations:
+            path, line = self.project.locations[name]
+            if self._open_source(path): self.code.goto_line(line)
+            return
         line = self.def_positions.get(name)
         if isinstance(line, int) and line>0:
             self.code.goto_line(line)
         elif name in self.def_positions:
             self.code.goto_line(self.def_positions[name])
 
+    def _show_symbol_palette(self):
+        if self.symbol_index is None:
+            self.status.setText("シンボルへ移動: 先にファイルを解析してください"); return
+        dlg = SymbolPalette(self.symbol_index, self._jump_to_symbol, self)
+        dlg.move(self.mapToGlobal(QPoint((self.width() - dlg.width()) // 2, 60)))
+        dlg.exec()
+        self.code.setFocus()
+
     # ---- メニュー（重なり順修正）----
     def _toggle_menu(self, show: bool | None = None):
         if show is None: show = not self._menu_visible
@@ -678,6 +1274,11 @@ class MainWindow(QWidget):
             h = max(minh, h + dy)
         self.setGeometry(x, y, w, h)
 
+    def closeEvent(self, e):
+        self._cancel_job()
+        self._pool.waitForDone(3000)
+        super().closeEvent(e)
+
     # ---- その他 ----
     def _show_readme(self):
         dlg = ReadmeDialog(self)
@@ -0,0 +1,85 @@
+"""
+処理段ごとの時間計測（span）と Chrome trace_event 形式の書き出し（Perfetto / chrome://tracing で開く）。Qt を使わない。
+
+- span(name, **args): with で囲んだ区間を記録する。無効のときは共有の nullcontext を返すだけ（ほぼゼロコスト）
+- take(): 記録した span を取り出して空にする（GUI は解析1回ごと）
+- totals / summary: 名前ごとの合計（ステータスバー用）。入れ子の span はそれぞれに数える
+- write_chrome_trace / save_trace: {"traceEvents": [{"ph": "X", ...}]} を書く（save_trace は SAVE_DIR/trace/ へ）
+
+有効/無効は utils.PERF_TRACE が既定、enable() で切り替え（GUI はメニューの「計測」）。
+"""
+import os, json, time, threading
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Tuple
+
+from utils import PERF_TRACE, ensure_save_dir
+
+ENABLED = PERF_TRACE
+_NULL = nullcontext()
+# (名前, 開始 ns, 長さ ns, スレッド名, args)。list.append は GIL 下で原子的なので記録側はロックしない
+_events: List[Tuple[str, int, int, str, Optional[dict]]] = []
+_take_lock = threading.Lock()
+
+class _Span:
+    __slots__ = ("name", "args", "t0")
+
+    def __init__(self, name: str, args: Optional[dict]):
+        self.name, self.args = name, args
+
+    def __enter__(self):
+        self.t0 = time.perf_counter_ns(); return self
+
+    def __exit__(self, *exc):
+        t1 = time.perf_counter_ns()
+        _events.append((self.name, self.t0, t1 - self.t0, threading.current_thread().name, self.args))
+
+def span(name: str, **args):
+    return _Span(name, args or None) if ENABLED else _NULL
+
+def enable(on: bool = True):
+    global ENABLED
+    ENABLED = on
+    if not on: take()
+
+def take() -> List[Tuple[str, int, int, str, Optional[dict]]]:
+    global _events
+    with _take_lock:
+        ev, _events = _events, []
+    return ev
+
+def totals(events) -> Dict[str, float]:
+    """名前 → 合計秒（最初に始まった順）"""
+    out: Dict[str, float] = {}
+    for name, _, dur, _, _ in sorted(events, key=lambda e: e[1]):
+        out[name] = out.get(name, 0.0) + dur / 1e9
+    return out
+
+def summary(events, limit: int = 10) -> str:
+    """"parse 12ms / style 80ms / ..."（長いものから limit 個、表示は開始順）"""
+    tot = totals(events)
+    keep = set(sorted(tot, key=tot.get, reverse=True)[:limit])
+    return " / ".join(f"{n} {s*1000:.0f}ms" for n, s in tot.items() if n in keep)
+
+def write_chrome_trace(events, path: str, meta: Optional[dict] = None) -> str:
+    """Chrome trace_event JSON（完了イベント "X"、時刻は最初の span からの μs）"""
+    pid = os.getpid()
+    t_min = min((e[1] for e in events), default=0)
+    tids: Dict[str, int] = {}
+    out = []
+    for name, t0, dur, thread, args in sorted(events, key=lambda e: e[1]):
+        tid = tids.setdefault(thread, len(tids) + 1)
+        ev = {"name": name, "cat": "pcd", "ph": "X", "ts": (t0 - t_min) / 1000, "dur": dur / 1000,
+              "pid": pid, "tid": tid}
+        if args: ev["args"] = {k: v if isinstance(v, (int, float, bool)) or v is None else str(v) for k, v in args.items()}
+        out.append(ev)
+    out += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread}}
+            for thread, tid in tids.items()]
+    with open(path, "w", encoding="utf-8") as fp:
+        json.dump({"traceEvents": out, "displayTimeUnit": "ms", "otherData": meta or {}}, fp, ensure_ascii=False)
+    return path
+
+def save_trace(events, base: str) -> str:
+    """SAVE_DIR/trace/<base>_trace.json（同じファイルは上書き）"""
+    d = os.path.join(ensure_save_dir(), "trace")
+    os.makedirs(d, exist_ok=True)
+    return write_chrome_trace(events, os.path.join(d, f"{base}_trace.json"), {"source": base})
@@ -1,10 +1,21 @@
-import os, re, ast, subprocess, math, textwrap, json
-from dataclasses import dataclass
-from typing import Dict, List, Tuple, Optional, Set
-from graphviz import Digraph
-from xml.etree import ElementTree as ET
+import os, re, ast, bisect, hashlib, subprocess, math, textwrap, json, threading, shutil, zlib
+from dataclasses import dataclass, asdict, field, replace
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import islice
+from typing import TYPE_CHECKING, Dict, FrozenSet, List, NamedTuple, Tuple, Optional, Set
 
-from utils import SAVE_DIR, FONT_PATH, ensure_save_dir, graphviz_available
+from utils import (FONT_PATH, ANALYSIS_CACHE_MAX_BYTES, RENDER_CACHE_MAX_BYTES, FOCUS_MAX_NODES, STYLE_BACKEND,
+                   STRUCTURED_OUTPUT, INCREMENTAL_FILES, COMPLEXITY_WARN, COMPLEXITY_HIGH, ensure_save_dir,
+                   graphviz_available)
+from cache_store import DiskCache, content_key
+import stylecheck
+from callgraph import (CallGraph, MODULE_CALLER, propagate_tags, repropagate_tags, analyze_graph, config_symbols,
+                       without_module_calls, is_module_caller)
+from perftrace import span
+
+if TYPE_CHECKING:
+    from graphviz import Digraph  # 実行時は build_flowchart_dot の中で読み込む
 
 # --- 用語説明（GUIのツリーで使う） ---
 python_keywords_meaning = {
@@ -117,57 +128,92 @@ python_builtin_functions_meaning = {
 }
 
 
+class FuncMetrics(NamedTuple):
+    """関数/メソッド1つ分の指標（AnalysisEngine が走査のついでに数える）"""
+    cc: int         # 循環的複雑度: 1 + 分岐（if/elif/for/while/except/case/三項/and・or/内包の for・if）
+    cognitive: int  # 認知的複雑度: 分岐ごとに 1 + その位置の入れ子の深さ（elif/else は 1、and・or は連なりごとに 1）
+    nest: int       # 制御構造の最大の入れ子（if/for/while/with/try/match。else/except の中も数える）
+    stmts: int      # 文の数（入れ子の関数/クラスの中身は含めない）
+    lines: int      # 行数（def から最後の行まで）
+
 @dataclass
 class AnalyzeResult:
     style_issues: List[str]
     refactor_suggestions: List[str]
-    function_calls: Dict[str, List[str]]
+    function_calls: CallGraph  # dict {呼び出し元: [呼び出し先, ...]} としても読める
     def_positions: Dict[str, int]
     def_kinds: Dict[str, str]
     keywords_in_code: Dict[str, str]
     builtins_in_code: Dict[str, str]
+    metrics: Dict[str, FuncMetrics] = field(default_factory=dict)  # 定義名 → 指標（def_positions の行の定義のもの）
+
+# ========= キャンセル（GUIのバックグラウンド解析用） =========
+class Cancelled(Exception):
+    pass
+
+class CancelToken:
+    """cancel() で以降の check() が Cancelled を送出し、実行中の子プロセス（flake8/dot）も kill する"""
+    def __init__(self):
+        self._ev = threading.Event()
+        self._lock = threading.Lock()
+        self._procs: Set[subprocess.Popen] = set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._ev.is_set()
+
+    def cancel(self):
+        self._ev.set()
+        with self._lock: procs = list(self._procs)
+        for p in procs:
+            try: p.kill()
+            except Exception: pass
+
+    def check(self):
+        if self._ev.is_set(): raise Cancelled()
+
+    def run(self, args: List[str], input_text: Optional[str] = None) -> subprocess.CompletedProcess:
+        self.check()
+        p = subprocess.Popen(args, stdin=subprocess.PIPE if input_text is not None else None,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding="utf-8")
+        with self._lock: self._procs.add(p)
+        if self._ev.is_set(): p.kill()  # 登録前に cancel された場合
+        try:
+            out, err = p.communicate(input_text)
+        finally:
+            with self._lock: self._procs.discard(p)
+        self.check()
+        return subprocess.CompletedProcess(args, p.returncode, out, err)
 
-def perform_style_check(file_path: str) -> List[str]:
+def _run(args: List[str], cancel: Optional[CancelToken] = None, input_text: Optional[str] = None):
+    if cancel is not None: return cancel.run(args, input_text)
+    return subprocess.run(args, input=input_text, capture_output=True, text=True, encoding='utf-8')
+
+def resolve_style_backend(backend: Optional[str] = None) -> str:
+    """'auto' は pycodestyle/pyflakes が import できればプロセス内、なければ flake8 サブプロセス"""
+    b = backend or STYLE_BACKEND
+    if b == "auto": b = "inprocess" if stylecheck.HAVE_INPROCESS else "flake8"
+    if b == "inprocess" and not stylecheck.HAVE_INPROCESS: b = "flake8"
+    return b
+
+def perform_style_check(file_path: str, cancel: Optional[CancelToken] = None, code: Optional[str] = None,
+                        tree: Optional[ast.AST] = None, backend: Optional[str] = None) -> List[str]:
+    """code を渡すとプロセス内バックエンドが使える（tree も渡せば再 parse しない）"""
+    if code is not None and resolve_style_backend(backend) == "inprocess":
+        try:
+            with span("style", backend="inprocess"):
+                return stylecheck.check_source(file_path, code, tree)
+        except Exception:
+            pass  # pycodestyle 側の想定外エラーは flake8 にフォールバック
     try:
-        out = subprocess.run(['flake8', file_path], capture_output=True, text=True, encoding='utf-8')
+        with span("style", backend="flake8"):
+            out = _run(['flake8', file_path], cancel)
         lines = [l for l in out.stdout.splitlines() if l.strip()]
         return lines if lines else []
+    except Cancelled:
+        raise
     except Exception:
-        return ["flake8が見つかりませんでした。インストールされているか確認してください。"]
-
-def _nest_depth(node, depth=0) -> int:
-    if not hasattr(node, 'body') or not node.body: return depth
-    m = depth
-    for child in node.body:
-        m = max(m, _nest_depth(child, depth+1))
-    return m
-
-def suggest_refactoring(code: str) -> List[str]:
-    sug = []
-    try:
-        tree = ast.parse(code)
-    except SyntaxError:
-        return ["構文エラーが発生しています。コードの構文を確認してください。"]
-    if len(re.findall(r'(\w+)\s*=\s*\1', code)) > 3:
-        sug.append("同じ処理が繰り返されています。関数化を検討してください。")
-    for node in ast.walk(tree):
-        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and len(node.body) > 20:
-            sug.append(f"関数 '{node.name}' が長すぎます（20行超）。分割を検討。")
-    for node in ast.walk(tree):
-        if isinstance(node, (ast.If, ast.For, ast.While)) and _nest_depth(node) > 3:
-            sug.append("ネストが深すぎる箇所があります。フラット化を検討。")
-    used, allv = set(), set()
-    for n in ast.walk(tree):
-        if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Load): used.add(n.id)
-        elif isinstance(n, ast.Name) and isinstance(n.ctx, ast.Store): allv.add(n.id)
-    unused = (allv - used) - set(dir(__builtins__))
-    if unused: sug.append("未使用の変数: " + ", ".join(sorted(unused)))
-    for n in ast.walk(tree):
-        if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef)) and len(n.name) < 3:
-            sug.append(f"関数 '{n.name}' の名前が短すぎます。説明的に。")
-    if "for " in code and "append(" in code:
-        sug.append("リスト作成で for+append が使われています。内包表記を検討。")
-    return sug
+        return [stylecheck.FLAKE8_MISSING]
 
 class AstAnalyzer(ast.NodeVisitor):
     def __init__(self):
@@ -179,6 +225,7 @@ class AstAnalyzer(ast.NodeVisitor):
         self._known_methods_by_class: Dict[str, Set[str]] = {}
         self.pattern_tags: Dict[str, Set[str]] = {}
         self._http_sessions: Set[str] = set()
+        self._yield_stack: List[bool] = []  # 関数ごとの「配下に yield があるか」（ネスト関数は外側へ伝播）
 
     def _mark_tag(self, key: str, tag: str): self.pattern_tags.setdefault(key, set()).add(tag)
 
@@ -206,9 +253,18 @@ class AstAnalyzer(ast.NodeVisitor):
             self.def_positions[key] = getattr(node, "lineno", 1); self.def_kinds[key] = kind
         self.calls.setdefault(key, [])
         if is_async: self._mark_tag(key, "async")
-        if any(isinstance(n, (ast.Yield, ast.YieldFrom)) for n in ast.walk(node)): self._mark_tag(key, "generator")
         prev = self._current_symbol; self._current_symbol = key
+        self._yield_stack.append(False)
         self.generic_visit(node); self._current_symbol = prev
+        has_yield = self._yield_stack.pop()
+        if has_yield:
+            self._mark_tag(key, "generator")
+            if self._yield_stack: self._yield_stack[-1] = True
+
+    def visit_Yield(self, node: ast.Yield):
+        if self._yield_stack: self._yield_stack[-1] = True
+        self.generic_visit(node)
+    visit_YieldFrom = visit_Yield
 
     def visit_Assign(self, node: ast.Assign):
         try:
@@ -232,11 +288,13 @@ class AstAnalyzer(ast.NodeVisitor):
 
     def visit_Call(self, node: ast.Call):
         callee = self._format_callee(node.func)
-        if self._current_symbol and callee:
-            if "." not in callee and self._class_stack:
-                cls = self._class_stack[-1]
-                if callee in self._known_methods_by_class.get(cls, set()):
-                    callee = f"{cls}.{callee}"
+        if callee and "." not in callee and self._class_stack:
+            cls = self._class_stack[-1]
+            if callee in self._known_methods_by_class.get(cls, set()):
+                callee = f"{cls}.{callee}"
+        if callee and not self._current_symbol:  # モジュール直下 / クラス本体（import 時に動く）。タグは付けない
+            self.calls.setdefault(MODULE_CALLER, []).append(callee)
+        elif callee:
             self.calls.setdefault(self._current_symbol, []).append(callee)
             base = callee.split(".", 1)[-1]
             if base in ("open","print","read","write","readlines","writelines"): self._mark_tag(self._current_symbol,"io")
@@ -266,8 +324,176 @@ class AstAnalyzer(ast.NodeVisitor):
             return f"{left}.{func.attr}" if left else func.attr
         return None
 
+class _Frame:
+    """走査中の関数1つ分の指標"""
+    __slots__ = ("key", "cc", "cog", "nest", "stmts")
+
+    def __init__(self, key: str):
+        self.key, self.cc, self.cog, self.nest, self.stmts = key, 1, 0, 0, 0
+
+# 走査で見る構文（type → 種別。ノードごとに isinstance を並べないように）。ast.TryStar は 3.11 から
+_M_KIND = {ast.FunctionDef: "def", ast.AsyncFunctionDef: "def", ast.ClassDef: "class", ast.If: "if", ast.For: "loop", ast.AsyncFor: "loop", ast.While: "loop", ast.With: "with",
+           ast.AsyncWith: "with", ast.Try: "try", ast.ExceptHandler: "except", ast.IfExp: "ifexp",
+           ast.BoolOp: "boolop", ast.Lambda: "lambda", ast.comprehension: "comp"}
+if hasattr(ast, "TryStar"): _M_KIND[ast.TryStar] = "try"
+if hasattr(ast, "Match"): _M_KIND[ast.Match] = "match"
+_STMT_TYPES = frozenset(c for c in vars(ast).values() if isinstance(c, type) and issubclass(c, ast.stmt))
+
+class AnalysisEngine(AstAnalyzer):
+    """
+    1回の ast.parse + 1回の走査で、AstAnalyzer の結果とリファクタ提案の材料、関数ごとの指標（FuncMetrics）をまとめて集める。
+    提案の並び順は旧実装（ast.walk＝幅優先）に合わせ、(深さ, 先行順) で並べ直して再現する。
+    指標の入れ子は、親の文が子の文に (認知的複雑度の入れ子, 制御構造の深さ) を割り当てて下へ渡す（各ノード1回で O(n)）。
+    条件式などブロック以外の子は親と同じ深さ。入れ子の関数は別に数え、クラスの本体は外側の関数に含めない。
+    """
+    _NEST_TYPES = (ast.If, ast.For, ast.While)
+
+    def __init__(self):
+        super().__init__()
+        self.long_funcs: List[Tuple[int,int,str]] = []   # (深さ, 先行順, 関数名)
+        self.short_funcs: List[Tuple[int,int,str]] = []
+        self.deep_nests = 0
+        self.names_load: Set[str] = set()
+        self.names_store: Set[str] = set()
+        self.metrics: Dict[str, FuncMetrics] = {}
+        self._depth = 0
+        self._seq = 0
+        self._heights: Dict[int,int] = {}  # id(node) → .body を辿ったネストの高さ
+        self._frame: Optional[_Frame] = None
+        self._lvl = (0, 0)                       # 今のノードの (認知的複雑度の入れ子, 制御構造の深さ)
+        self._blk: Dict[int, Tuple[int,int]] = {}  # id(子) → 親が割り当てた _lvl
+        self._elif: Set[int] = set()
+        self._chain: Set[int] = set()            # 親と同じ演算子の BoolOp（a and (b and c) は1つの連なり）
+
+    def visit(self, node):
+        self._seq += 1; seq, depth = self._seq, self._depth
+        outer, fr = self._lvl, self._frame
+        if self._blk:
+            lvl = self._blk.pop(id(node), None)
+            if lvl is not None: self._lvl = lvl
+        t = type(node)
+        kind = _M_KIND.get(t)
+        if t is ast.Name:
+            if isinstance(node.ctx, ast.Load): self.names_load.add(node.id)
+            elif isinstance(node.ctx, ast.Store): self.names_store.add(node.id)
+        elif kind is None:
+            if fr is not None and t in _STMT_TYPES: fr.stmts += 1
+        elif kind == "def":
+            if len(node.body) > 20: self.long_funcs.append((depth, seq, node.name))
+            if len(node.name) < 3: self.short_funcs.append((depth, seq, node.name))
+            if fr is not None: fr.stmts += 1
+            self._frame = _Frame(f"{self._class_stack[-1]}.{node.name}" if self._class_stack else node.name)
+            self._lvl = (0, 0)
+        elif kind == "class":
+            if fr is not None: fr.stmts += 1
+            self._frame = None
+        elif fr is not None:
+            if t in _STMT_TYPES: fr.stmts += 1
+            self._measure(kind, node, fr)
+        self._depth += 1
+        ret = super().visit(node)
+        self._depth -= 1
+        done, self._lvl, self._frame = self._frame, outer, fr
+        if kind == "def": self._close_frame(done, node)
+        # 子は訪問済みなので、帰りがけにネストの高さを確定（旧 _nest_depth と同じく .body のみ）
+        body = getattr(node, "body", None)
+        if isinstance(body, list) and body:
+            h = 1 + max(self._heights.get(id(c), 0) for c in body)
+            self._heights[id(node)] = h
+            if h > 3 and isinstance(node, self._NEST_TYPES): self.deep_nests += 1
+        return ret
+
+    def _block(self, stmts, lvl: Tuple[int,int], fr: _Frame):
+        if not stmts: return
+        for st in stmts: self._blk[id(st)] = lvl
+        if lvl[1] > fr.nest: fr.nest = lvl[1]
+
+    def _measure(self, kind: str, node, fr: _Frame):
+        cog, dep = self._lvl
+        inner = (cog + 1, dep + 1)
+        if kind == "if":
+            fr.cc += 1
+            if id(node) in self._elif: self._elif.discard(id(node)); fr.cog += 1
+            else: fr.cog += 1 + cog
+            self._block(node.body, inner, fr)
+            els = node.orelse
+            if len(els) == 1 and isinstance(els[0], ast.If) and els[0].col_offset == node.col_offset:  # elif
+                self._elif.add(id(els[0])); self._blk[id(els[0])] = (cog, dep)
+            elif els:
+                fr.cog += 1; self._block(els, inner, fr)
+        elif kind == "loop":
+            fr.cc += 1; fr.cog += 1 + cog
+            self._block(node.body, inner, fr)
+            if node.orelse: fr.cog += 1; self._block(node.orelse, inner, fr)
+        elif kind == "with":
+            self._block(node.body, (cog, dep + 1), fr)
+        elif kind == "try":
+            for part in (node.body, node.orelse, node.finalbody): self._block(part, (cog, dep + 1), fr)
+            for h in node.handlers: self._blk[id(h)] = (cog, dep)
+        elif kind == "except":
+            fr.cc += 1; fr.cog += 1 + cog
+            self._block(node.body, inner, fr)
+        elif kind == "match":
+            fr.cog += 1 + cog
+            for c in node.cases:
+                if not (isinstance(c.pattern, ast.MatchAs) and c.pattern.pattern is None and c.guard is None):
+                    fr.cc += 1  # case _: / case x: は分岐に数えない
+                self._block(c.body, inner, fr)
+        elif kind == "ifexp":
+            fr.cc += 1; fr.cog += 1 + cog
+            self._blk[id(node.body)] = self._blk[id(node.orelse)] = (cog + 1, dep)
+        elif kind == "boolop":
+            fr.cc += len(node.values) - 1
+            if id(node) in self._chain: self._chain.discard(id(node))
+            else: fr.cog += 1
+            for v in node.values:
+                if isinstance(v, ast.BoolOp) and type(v.op) is type(node.op): self._chain.add(id(v))
+        elif kind == "lambda":
+            self._blk[id(node.body)] = (cog + 1, dep)
+        elif kind == "comp":
+            fr.cc += 1 + len(node.ifs)
+
+    def _close_frame(self, fr: _Frame, node):
+        # def_positions と同じ定義のもの（関数は最初の定義、クラスを定義し直したときのメソッドは後の定義）
+        if self.def_positions.get(fr.key) == getattr(node, "lineno", 1):
+            self.metrics[fr.key] = FuncMetrics(fr.cc, fr.cog, fr.nest, fr.stmts,
+                                               (node.end_lineno or node.lineno) - node.lineno + 1)
+
+    def refactor_suggestions(self, code: str) -> List[str]:
+        sug = []
+        if sum(1 for _ in islice(re.finditer(r'(\w+)\s*=\s*\1', code), 4)) > 3:  # 4件見つかれば十分
+            sug.append("同じ処理が繰り返されています。関数化を検討してください。")
+        for _, _, name in sorted(self.long_funcs):
+            sug.append(f"関数 '{name}' が長すぎます（20行超）。分割を検討。")
+        sug.extend(["ネストが深すぎる箇所があります。フラット化を検討。"] * self.deep_nests)
+        unused = (self.names_store - self.names_load) - set(dir(__builtins__))
+        if unused: sug.append("未使用の変数: " + ", ".join(sorted(unused)))
+        for _, _, name in sorted(self.short_funcs):
+            sug.append(f"関数 '{name}' の名前が短すぎます。説明的に。")
+        if "for " in code and "append(" in code:
+            sug.append("リスト作成で for+append が使われています。内包表記を検討。")
+        return sug
+
+def run_engine(code: str, tree: Optional[ast.AST] = None) -> Optional[AnalysisEngine]:
+    """構文エラーなら None。parse 済みの tree があればそれを使う。"""
+    if tree is None:
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            return None
+    eng = AnalysisEngine(); eng.visit(tree)
+    return eng
+
+def suggest_refactoring(code: str) -> List[str]:
+    eng = run_engine(code)
+    if eng is None:
+        return ["構文エラーが発生しています。コードの構文を確認してください。"]
+    return eng.refactor_suggestions(code)
+
 def extract_keywords_in_code(code: str):
-    words = set(re.findall(r'\b\w+\b', code))
+    return _keywords_in(set(re.findall(r'\b\w+\b', code)))
+
+def _keywords_in(words: Set[str]):
     keys = {k:v for k,v in python_keywords_meaning.items() if k in words}
     built = {k:v for k,v in python_builtin_functions_meaning.items() if k in words}
     return keys, built
@@ -276,56 +502,588 @@ def extract_keywords_in_code(code: str):
 class _Shared:
     PATTERN_TAGS: Dict[str, Set[str]]
     MODULE_NAME: str
-_SHARED = _Shared(PATTERN_TAGS={}, MODULE_NAME="module")
-
-try:
-    import config as _appcfg
-    CFG_ENTRY_OVERRIDE = set(getattr(_appcfg, "entry_symbols", []) or [])
-    CFG_LEAF_OVERRIDE  = set(getattr(_appcfg, "leaf_symbols",  []) or [])
-except Exception:
-    CFG_ENTRY_OVERRIDE = set(); CFG_LEAF_OVERRIDE = set()
-
-def analyze_file(code: str, original_path: str) -> AnalyzeResult:
-    ensure_save_dir()
-    style = perform_style_check(original_path)
-    refac = suggest_refactoring(code)
-    calls: Dict[str,List[str]] = {}
-    def_positions: Dict[str,int] = {}
-    def_kinds: Dict[str,str] = {}
+    METRICS: Dict[str, FuncMetrics]
+    INHERITED_TAGS: Dict[str, Dict[str, str]]  # 呼び出し先から引き継いだタグ → 経由する呼び出し先（callgraph.propagate_tags）
+_SHARED = _Shared(PATTERN_TAGS={}, MODULE_NAME="module", METRICS={}, INHERITED_TAGS={})
+
+def set_pattern_tags(tags: Dict[str, Set[str]], calls: CallGraph, inherited: Optional[Dict[str, Dict[str, str]]] = None):
+    """
+    直接のタグを _SHARED に置き、呼び出しグラフ全体で引き継ぐタグも求めておく（フォーカス表示の部分グラフでも同じ結果に）。
+    inherited: 求めてあればそれを使う（差分解析）
+    """
+    _SHARED.PATTERN_TAGS = tags
+    if inherited is not None:
+        _SHARED.INHERITED_TAGS = inherited; return
+    with span("tag_propagation"):
+        _SHARED.INHERITED_TAGS = propagate_tags(calls, tags)
+
+def complexity_level(m: Optional[FuncMetrics]) -> int:
+    """0: ふつう / 1: COMPLEXITY_WARN 以上 / 2: COMPLEXITY_HIGH 以上（循環的複雑度で判定）"""
+    if m is None or m.cc < COMPLEXITY_WARN: return 0
+    return 2 if m.cc >= COMPLEXITY_HIGH else 1
+
+def _complexity_levels(metrics: Dict[str, FuncMetrics]) -> Dict[str, int]:
+    return {k: complexity_level(m) for k, m in metrics.items() if m.cc >= COMPLEXITY_WARN}
+
+# ========= 解析結果キャッシュ（SAVE_DIR/cache/analysis） =========
+ANALYZER_VERSION = "4"  # 解析ロジックや AnalyzeResult の形を変えたら上げる（旧エントリは自然に無効化）
+_analysis_cache = DiskCache("analysis", ANALYSIS_CACHE_MAX_BYTES)
+_FILE_TOKEN = "<file>"  # flake8 出力のパス部分（同内容の別パスでも使い回せるように置換して保存）
+
+@lru_cache(maxsize=1)
+def _flake8_version() -> str:
     try:
-        tree = ast.parse(code)
-        az = AstAnalyzer(); az.visit(tree)
-        def_positions = dict(az.def_positions)
-        def_kinds = dict(az.def_kinds)
-        calls = {caller:list(callees) for caller,callees in az.calls.items()}
-        for caller,callees in calls.items():
-            for c in callees:
-                if c not in def_positions:
-                    def_positions[c]=1; def_kinds[c]="external"
-        _SHARED.PATTERN_TAGS = az.pattern_tags
-    except SyntaxError:
-        refac = ["構文エラーのためAST解析は一部スキップされました。"]; _SHARED.PATTERN_TAGS={}
-    _SHARED.MODULE_NAME = os.path.splitext(os.path.basename(original_path))[0]
+        from importlib.metadata import version
+        return version("flake8")
+    except Exception:
+        return "none"
+
+_FLAKE8_CONFIGS = ("setup.cfg", "tox.ini", ".flake8")
+
+def _style_config_stamp() -> str:
+    """flake8 が読む設定ファイル（作業ディレクトリから上へ）の内容のダイジェスト。stat が同じ間は読み直さない"""
+    found = []
+    try:
+        d = os.getcwd()
+    except OSError:
+        return "none"
+    while True:
+        for name in _FLAKE8_CONFIGS:
+            p = os.path.join(d, name)
+            try: st = os.stat(p)
+            except OSError: continue
+            found.append((p, st.st_mtime_ns, st.st_size))
+        up = os.path.dirname(d)
+        if up == d: break
+        d = up
+    return _config_digest(tuple(found))
+
+@lru_cache(maxsize=8)
+def _config_digest(files: Tuple[Tuple[str, int, int], ...]) -> str:
+    parts = []
+    for p, _, _ in files:
+        try:
+            with open(p, "rb") as fp: parts.append(f"{p}={hashlib.sha256(fp.read()).hexdigest()}")
+        except OSError:
+            pass
+    return content_key(*parts)[:16] if parts else "none"
+
+def _style_stamp(backend: Optional[str] = None) -> str:
+    # プロセス内は設定ファイルを読まない（stylecheck._style_guide）ので、設定のダイジェストは flake8 のときだけ
+    b = resolve_style_backend(backend)
+    if b == "inprocess": return f"style=inprocess:{stylecheck.versions()}"
+    return f"style=flake8={_flake8_version()},config={_style_config_stamp()}"
+
+def analysis_cache_key(code: str, backend: Optional[str] = None) -> str:
+    return content_key(code, f"analyzer={ANALYZER_VERSION}", _style_stamp(backend))
+
+def analysis_cache_stats() -> Dict[str, int]:
+    return _analysis_cache.stats()
 
-    k,b = extract_keywords_in_code(code)
+def result_to_dict(result: AnalyzeResult, pattern_tags: Dict[str, Set[str]], path: str = "") -> dict:
+    d = asdict(replace(result, function_calls=None))  # CallGraph は配列のまま JSON へ（名前の重複を展開しない）
+    d["function_calls"] = result.function_calls.to_json()
+    if path:
+        pre = path + ":"
+        d["style_issues"] = [_FILE_TOKEN + l[len(path):] if l.startswith(pre) else l for l in result.style_issues]
+    d["pattern_tags"] = {k: sorted(v) for k, v in pattern_tags.items()}
+    return d
 
-    base = os.path.splitext(os.path.basename(original_path))[0]
-    out = os.path.join(SAVE_DIR, f"{base}_analysis_with_pep8.txt")
+def result_from_dict(d: dict, path: str = "") -> Tuple[AnalyzeResult, Dict[str, Set[str]]]:
+    d = dict(d)
+    tags = {k: set(v) for k, v in d.pop("pattern_tags", {}).items()}
+    if path:
+        pre = _FILE_TOKEN + ":"
+        d["style_issues"] = [path + l[len(_FILE_TOKEN):] if l.startswith(pre) else l for l in d["style_issues"]]
+    d["metrics"] = {k: FuncMetrics(*v) for k, v in d.get("metrics", {}).items()}  # JSON では配列
+    d["function_calls"] = CallGraph.from_json(d["function_calls"])
+    return AnalyzeResult(**d), tags
+
+def _write_report(out: str, r: AnalyzeResult):
     try:
         with open(out,"w",encoding="utf-8") as fp:
-            fp.write("PEP8スタイルチェック:\n"); fp.writelines("\n".join(style)); fp.write("\n\n")
-            fp.write("リファクタリングの提案:\n"); fp.writelines("\n".join(refac)); fp.write("\n\n")
+            fp.write("PEP8スタイルチェック:\n"); fp.writelines("\n".join(r.style_issues)); fp.write("\n\n")
+            fp.write("リファクタリングの提案:\n"); fp.writelines("\n".join(r.refactor_suggestions)); fp.write("\n\n")
             fp.write("関数/メソッド呼び出し関係(回数込み):\n")
-            for fn, cal in calls.items(): fp.write(f"{fn}: {', '.join(cal) if cal else '呼び出しなし'}\n")
+            for fn in r.function_calls: fp.write(f"{fn}: {_callee_text(r.function_calls.callees(fn)) or '呼び出しなし'}\n")
+            _write_graph_report(fp, analyze_graph(r.function_calls, r.def_kinds))
             fp.write("\n\n定義位置(行):\n")
-            for name, line in sorted(def_positions.items(), key=lambda x: x[1]): fp.write(f"{name}: {line}\n")
+            for name, line in sorted(r.def_positions.items(), key=lambda x: x[1]): fp.write(f"{name}: {line}\n")
+            fp.write("\n\n関数ごとの複雑度（循環的 / 認知的 / 入れ子 / 文 / 行。循環的の高い順）:\n")
+            for name, m in sorted(r.metrics.items(), key=lambda x: (-x[1].cc, -x[1].cognitive, x[0])):
+                fp.write(f"{name}: {m.cc} / {m.cognitive} / {m.nest} / {m.stmts} / {m.lines}\n")
+            fp.write("\n\n実行パターン（直接 / 呼び出し先から引き継いだもの ← 経由する呼び出し先）:\n")
+            tags, inh = _SHARED.PATTERN_TAGS, _SHARED.INHERITED_TAGS
+            for name in sorted(set(tags) | set(inh), key=lambda n: (r.def_positions.get(n, 0), n)):
+                own = ", ".join(sorted(tags.get(name, ()))) or "-"
+                via = ", ".join(f"{t}←{v}" for t, v in sorted(inh.get(name, {}).items()))
+                fp.write(f"{name}: {own}" + (f" / {via}" if via else "") + "\n")
             fp.write("\n\nコード内のキーワードと簡易説明:\n")
-            for d in (k,b):
+            for d in (r.keywords_in_code, r.builtins_in_code):
                 for kk,vv in d.items(): fp.write(f"{kk}: {vv}\n")
     except Exception:
         pass
 
-    return AnalyzeResult(style, refac, calls, def_positions, def_kinds, k, b)
+def _callee_text(callees: List[Tuple[str, int]]) -> str:
+    """[(呼び出し先, 回数)] → "a, b ×3" """
+    return ", ".join(v if n == 1 else f"{v} ×{n}" for v, n in callees)
+
+def _write_graph_report(fp, g):
+    """呼び出しグラフの分析（callgraph.analyze_graph）。プロジェクト解析のレポートでも使う"""
+    fp.write(f"\n\n呼び出しの輪（互いに呼び合う定義、{len(g.cycles)}）:\n")
+    for c in g.cycles: fp.write(", ".join(c) + "\n")
+    fp.write(f"\n\n到達できない定義（入口 {len(g.entries)} から辿れない。未使用の候補、{len(g.unreachable)}）:\n")
+    for n in g.unreachable: fp.write(n + "\n")
+    fp.write("\n\nファンイン上位（呼び出し元の数 / 呼ばれた回数）:\n")
+    for n, k, c in g.fan_in: fp.write(f"{n}: {k} / {c}\n")
+    fp.write("\n\nファンアウト上位（呼び出し先の数 / 呼んだ回数）:\n")
+    for n, k, c in g.fan_out: fp.write(f"{n}: {k} / {c}\n")
+
+def _write_structured(fmt: str, out_dir: str, base: str, path: str, r: AnalyzeResult):
+    if not fmt: return
+    try:
+        import structured
+        with structured.open_sink(fmt, out_dir, base) as sink:
+            sink.add(path, structured.result_rows(r, _SHARED.PATTERN_TAGS))
+    except Exception:
+        pass
+
+# ========= 差分解析（トップレベルの関数/クラス単位で前回の結果を使い回す） =========
+# ファイルをトップレベルの文（デコレータ込み、同じ行の文はまとめる）ごとの「区間」= その文 + 次の文までの
+# 空行/コメント に分け、区間の内容ハッシュで前回の結果を引く。
+# - 構文解析: 前回の行と先頭/末尾から比べ、変わった行を含む区間だけを元の行番号のまま ast.parse する（_splice）。
+#   前後の区間とつながる（構文エラー、最初の文が区間の先頭から始まらない）ときは1区間ずつ広げ、それでもだめなら
+#   ファイル全体。変わっていない区間の文は要るときだけ parse する（_SegmentParser）
+# - AST の走査: 区間ごと。行番号は区間の先頭からの相対で持つ（上に行を足しても使い回せる）
+# - pycodestyle: 鍵は (前, 自分, 次の区間のハッシュ, E402 の状態)。変わった区間の連続だけを前後1区間付きでチェック
+# - pyflakes: 変わっていない関数の本体は前回の結果を使う（stylecheck.pyflakes_units）。
+#   前回がない・import * がある・__future__ が変わったときはファイル全体
+# - 呼び出しグラフ/タグ: 呼び出しとタグが前回と同じならそのまま、呼び出し元の並びが同じなら変わった行だけ差し替えて
+#   決め直す（CallGraph.with_rows / repropagate_tags）。ほかは作り直す
+# - キーワード: 区間ごとの単語集合
+# 結果は全体を解析したときと同じ。
+
+@dataclass
+class _UnitFacts:
+    """区間1つ分の AnalysisEngine の結果"""
+    seed_sessions: frozenset              # 走査時に前の区間から受け取った状態（同じときだけ使い回す）
+    seed_known: Dict[str, frozenset]
+    defs: List[Tuple[str, int, str, bool]]  # (名前, 相対行, 種別, 前の区間の値を上書きするか)
+    calls: Dict[str, List[str]]
+    tags: Dict[str, Set[str]]
+    metrics: Dict[str, FuncMetrics]
+    long_funcs: List[Tuple[int, int, str]]  # 先行順は区間内の相対
+    short_funcs: List[Tuple[int, int, str]]
+    deep_nests: int
+    names_load: Set[str]
+    names_store: Set[str]
+    nseq: int
+    sessions: frozenset                   # 走査後の状態（次の区間へ渡す）
+    known: Dict[str, frozenset]
+
+class _UnitEngine(AnalysisEngine):
+    """トップレベルの文だけを走査する。visit_ClassDef が無条件に書き込む名前（前の定義を上書きする）を控える"""
+    def __init__(self, sessions, known):
+        super().__init__()
+        self._http_sessions = set(sessions)
+        self._known_methods_by_class = {c: set(ms) for c, ms in known.items()}
+        self._depth = 1  # Module の子と同じ深さ
+        self.forced: Set[str] = set()
+
+    def visit_ClassDef(self, node: ast.ClassDef):
+        self.forced.add(node.name)
+        self.forced.update(f"{node.name}.{b.name}" for b in node.body if isinstance(b, (ast.FunctionDef, ast.AsyncFunctionDef)))
+        super().visit_ClassDef(node)
+
+def _scan_unit(stmts: List[ast.stmt], start: int, sessions: frozenset, known: Dict[str, frozenset]) -> _UnitFacts:
+    e = _UnitEngine(sessions, {})
+    for st in stmts: e.visit(st)
+    seed_known = {c: known.get(c, frozenset()) for c in e._known_methods_by_class}
+    if any(seed_known.values()):  # 同名のクラスが前にもある（メソッド呼び出しの解決が変わる）ので引き継いで走査し直す
+        e = _UnitEngine(sessions, seed_known)
+        for st in stmts: e.visit(st)
+    return _UnitFacts(
+        sessions, seed_known,
+        [(k, ln - start, e.def_kinds[k], k in e.forced) for k, ln in e.def_positions.items()],
+        e.calls, e.pattern_tags, e.metrics, e.long_funcs, e.short_funcs, e.deep_nests, e.names_load, e.names_store, e._seq,
+        frozenset(e._http_sessions), {c: frozenset(ms) for c, ms in e._known_methods_by_class.items()})
+
+def _segments(body: List[ast.stmt], first: int = 1) -> List[Tuple[int, List[ast.stmt]]]:
+    """(先頭行, トップレベルの文)。first 行から最初の文までに行があれば、文なしの区間を先頭に置く"""
+    segs: List[Tuple[int, List[ast.stmt]]] = []
+    end = 0
+    for st in body:
+        s = min([st.lineno] + [d.lineno for d in getattr(st, "decorator_list", ())])
+        if segs and s <= end: segs[-1][1].append(st)
+        else: segs.append((s, [st]))
+        end = max(end, st.end_lineno or st.lineno)
+    if not segs or segs[0][0] > first: segs.insert(0, (first, []))
+    return segs
+
+def _parse_lines(lines: List[str], start: int, end: int) -> List[ast.stmt]:
+    """lines の start..end-1 行目を、行番号はそのままで parse"""
+    return ast.parse("\n" * (start - 1) + "".join(lines[start-1:end-1])).body
+
+def _digest(lines: List[str], start: int, end: int) -> bytes:
+    return hashlib.blake2b("".join(lines[start-1:end-1]).encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+def _e402_head(start: int, st: ast.stmt) -> int:
+    """E402 の判定に使う、文の最初の論理行（複合文はヘッダの1行目）の最後の行（区間の先頭からの相対）"""
+    return 0 if hasattr(st, "body") else (st.end_lineno or start) - start
+
+_INC_WORDS = frozenset(python_keywords_meaning) | frozenset(python_builtin_functions_meaning)
+_INC_TABS = re.compile(r"^ *\t", re.M)  # インデントのタブは pycodestyle がファイル全体の状態で見る
+_SPLICE_TRIES = 3  # 変わった区間を前後に広げて parse し直す回数
+
+@dataclass
+class _GraphState:
+    calls: Dict[str, List[str]]  # 前回の AnalysisEngine.calls / pattern_tags と、そこから作ったもの
+    tags: Dict[str, Set[str]]
+    graph: CallGraph
+    called: List[str]
+    inherited: Dict[str, Dict[str, str]]
+
+@dataclass
+class _IncrementalState:
+    units: Dict[bytes, _UnitFacts]
+    style: Dict[tuple, List[stylecheck.Item]]
+    words: Dict[bytes, frozenset]
+    stats: Dict[str, int]
+    lines: List[str] = field(default_factory=list)  # 前回の行と区間（_splice で比べる）
+    starts: List[int] = field(default_factory=list)
+    hashes: List[bytes] = field(default_factory=list)
+    heads: Dict[bytes, Optional[int]] = field(default_factory=dict)  # _e402_head（文のない区間は None）
+    flakes: Dict[Tuple[bytes, int], stylecheck.FlakeUnit] = field(default_factory=dict)  # (ハッシュ, 同じ内容の何個目)
+    keys: List[Tuple[bytes, int]] = field(default_factory=list)  # 区間ごとの flakes の鍵
+    env: Optional[Dict[str, tuple]] = None  # stylecheck.flake_env
+    futures: FrozenSet[str] = frozenset()
+    flake_items: List[stylecheck.Item] = field(default_factory=list)
+    graph: Optional[_GraphState] = None
+
+_INC_FILES: "OrderedDict[str, _IncrementalState]" = OrderedDict()
+_INC_LOCK = threading.Lock()
+
+def incremental_stats(path: str) -> Optional[Dict[str, int]]:
+    """
+    直近の差分解析の {"units": 区間数, "parsed": parse した区間, "reused": AST を使い回した区間,
+    "restyled": PEP8 をやり直した区間, "stubbed": pyflakes で前回の結果を使った関数}
+    """
+    st = _INC_FILES.get(path)
+    return dict(st.stats) if st is not None and st.stats else None
+
+def _incremental_ok(code: str, lines: List[str]) -> bool:
+    # splitlines が \f などでも行を分ける（AST の行番号とずれる）ファイルとタブインデントは全体解析
+    n = code.count("\n") + (0 if not code or code.endswith("\n") else 1)
+    return INCREMENTAL_FILES > 0 and len(lines) == n and not _INC_TABS.search(code)
+
+def _splice(old: _IncrementalState, lines: List[str]) -> Optional[Tuple[List[int], List[bytes], Dict[int, List[ast.stmt]]]]:
+    """
+    前回の行と先頭/末尾から比べ、違う行を含む区間だけを parse する。
+    (区間の先頭行, ハッシュ, parse した区間 {番号: 文})。区間の切れ目が決まらなければ None（ファイル全体を parse）
+    """
+    o, n0, n1 = old.lines, len(old.lines), len(lines)
+    m = min(n0, n1)
+    p = 0
+    while p < m and o[p] == lines[p]: p += 1
+    s = 0
+    while s < m - p and o[n0-1-s] == lines[n1-1-s]: s += 1
+    starts, k = old.starts, len(old.starts)
+    ends = starts[1:] + [n0 + 1]
+    a = max(bisect.bisect_right(starts, max(p, 1)) - 1, 0)  # 前と同じ行だけの区間は a の手前まで、b の後ろから
+    b = bisect.bisect_right(starts, n0 - s + 1) - 1 if s else k - 1
+    delta = n1 - n0
+    for _ in range(_SPLICE_TRIES):
+        ra, rb = starts[a], ends[b] + delta
+        if ra == rb and a == 0: return None  # 先頭の区間が全部消えた
+        try:
+            segs = _segments(_parse_lines(lines, ra, rb), ra)
+        except (SyntaxError, ValueError):
+            segs = None
+        if segs is not None and (a == 0 or (segs[0][1] and segs[0][0] == ra)): break
+        if a == 0 and b == k - 1: return None
+        a, b = max(a - 1, 0), min(b + 1, k - 1)
+    else:
+        return None
+    new_starts = [st for st, _ in segs]
+    return (starts[:a] + new_starts + [x + delta for x in starts[b+1:]],
+            old.hashes[:a] + [_digest(lines, x, y) for x, y in zip(new_starts, new_starts[1:] + [rb])] + old.hashes[b+1:],
+            {a + j: stmts for j, (_, stmts) in enumerate(segs)})
+
+class _SegmentParser:
+    """区間の文（元の行番号のまま）。parse していない区間は1つずつ parse し、多くなったらファイル全体を1回で"""
+    def __init__(self, code: str, lines: List[str], starts: List[int], parsed: Dict[int, List[ast.stmt]]):
+        self.code, self.lines, self.starts = code, lines, starts
+        self.ends = starts[1:] + [len(lines) + 1]
+        self.parsed = parsed
+        self.budget = max(len(starts) // 4, 8)  # 1つずつ parse する区間の数の上限
+
+    def __call__(self, i: int) -> List[ast.stmt]:
+        stmts = self.parsed.get(i)
+        if stmts is not None: return stmts
+        self.budget -= 1
+        if self.budget >= 0:
+            stmts = self.parsed[i] = _parse_lines(self.lines, self.starts[i], self.ends[i])
+            return stmts
+        segs = _segments(ast.parse(self.code).body)
+        if [s for s, _ in segs] != self.starts: raise RuntimeError("区間の切れ目が全体の parse と合わない")
+        self.parsed = {j: stmts for j, (_, stmts) in enumerate(segs)}
+        return self.parsed[i]
+
+def _called_names(calls: CallGraph) -> List[str]:
+    """モジュール直下以外から呼ばれるノード（without_module_calls(calls) のノードの並び）"""
+    nm, off, tgt, nk = calls.names, calls.offsets, calls.targets, calls.n_keys
+    hit = bytearray(len(nm))
+    later: List[int] = []  # 呼び出し先にしか出てこないもの（モジュール直下以外での初出の順）
+    for u in range(nk):
+        if is_module_caller(nm[u]): continue
+        for v in tgt[off[u]:off[u+1]]:
+            if hit[v]: continue
+            hit[v] = 1
+            if v >= nk: later.append(v)
+    return [nm[u] for u in range(nk) if hit[u] and not is_module_caller(nm[u])] + [nm[v] for v in later]
+
+def _incremental_graph(old: Optional[_GraphState], calls: Dict[str, List[str]], tags: Dict[str, Set[str]]) -> _GraphState:
+    # dict の == は順番を見ない。グラフのノード順は呼び出し元の順で決まるので、順番も同じときだけ使い回す
+    if old is not None and old.calls == calls and old.tags == tags and list(old.calls) == list(calls):
+        return _GraphState(calls, tags, old.graph, old.called, old.inherited)
+    g = None
+    if old is not None and len(old.calls) == len(calls) and all(a == b for a, b in zip(old.calls, calls)):
+        rows = {u: vs for u, vs in calls.items() if vs != old.calls[u]}
+        g = old.graph.with_rows(rows) if rows else old.graph
+    if g is None:
+        g = CallGraph.from_calls(calls)
+        return _GraphState(calls, tags, g, _called_names(g), propagate_tags(g, tags))
+    changed = set(rows).union(k for k in tags.keys() | old.tags.keys() if tags.get(k) != old.tags.get(k))
+    called = old.called if not rows else _called_names(g)
+    return _GraphState(calls, tags, g, called, repropagate_tags(g, tags, old.graph, old.tags, old.inherited, changed))
+
+def _analyze_incremental(code: str, path: str, lines: List[str], cancel: Optional[CancelToken] = None):
+    """
+    (区間ごとの結果をまとめた AnalysisEngine, PEP8 の行, コード中の既知の単語, 呼び出しグラフ,
+    モジュール直下以外から呼ばれるノード, 引き継いだタグ)。構文エラーなら SyntaxError。
+    作業中は前回の状態を _INC_FILES から外す（同じパスを同時に解析しても状態を共有しない）。中断されたら戻す。
+    """
+    with _INC_LOCK:
+        old = _INC_FILES.pop(path, None)
+    try:
+        return _run_incremental(code, path, lines, old or _IncrementalState({}, {}, {}, {}), cancel)
+    except Cancelled:
+        if old is not None:
+            with _INC_LOCK: _INC_FILES.setdefault(path, old)
+        raise
+
+def _run_incremental(code: str, path: str, lines: List[str], old: _IncrementalState, cancel: Optional[CancelToken]):
+    with span("parse"):
+        same_text = bool(old.lines) and old.lines == lines
+        sp = (list(old.starts), list(old.hashes), {}) if same_text else _splice(old, lines) if old.lines else None
+        if sp is None:
+            segs = _segments(ast.parse(code).body)
+            starts = [s for s, _ in segs]
+            hashes = [_digest(lines, s, e) for s, e in zip(starts, starts[1:] + [len(lines) + 1])]
+            sp = starts, hashes, {i: stmts for i, (_, stmts) in enumerate(segs)}
+        starts, hashes, parsed = sp
+        parse = _SegmentParser(code, lines, starts, dict(parsed))
+    ends = starts[1:] + [len(lines) + 1]
+    new = _IncrementalState({}, {}, {}, {}, lines, starts, hashes)
+
+    # AST: 前の区間までの状態（Session 変数 / クラスのメソッド名）が走査時と同じなら使い回す
+    eng = AnalysisEngine()
+    seq, sessions, known, reused = 1, frozenset(), {}, 0  # seq: Module 自身が 1
+    e402 = [stylecheck.E402_START]
+    for i, (start, h) in enumerate(zip(starts, hashes)):
+        f = old.units.get(h)
+        if f is not None and f.seed_sessions == sessions and all(known.get(c, frozenset()) == v for c, v in f.seed_known.items()):
+            reused += 1
+        else:
+            f = _scan_unit(parse(i), start, sessions, known)
+        new.units[h] = f
+        for k, rel, kind, forced in f.defs:
+            if forced or k not in eng.def_positions:
+                eng.def_positions[k] = start + rel; eng.def_kinds[k] = kind
+                if k in f.metrics: eng.metrics[k] = f.metrics[k]
+        for k, cs in f.calls.items(): eng.calls.setdefault(k, []).extend(cs)
+        for k, ts in f.tags.items(): eng.pattern_tags.setdefault(k, set()).update(ts)
+        eng.long_funcs += [(d, seq + q, n) for d, q, n in f.long_funcs]
+        eng.short_funcs += [(d, seq + q, n) for d, q, n in f.short_funcs]
+        eng.deep_nests += f.deep_nests
+        eng.names_load |= f.names_load; eng.names_store |= f.names_store
+        seq += f.nseq; sessions = f.sessions; known.update(f.known)
+        if h in old.heads: head = old.heads[h]
+        else:
+            stmts = parse(i)
+            head = _e402_head(start, stmts[0]) if stmts else None
+        new.heads[h] = head
+        state = e402[-1]
+        if head is not None: state = stylecheck.e402_step(state, "".join(lines[start-1:start+head]))
+        e402.append(state)
+    if cancel: cancel.check()
+
+    # pycodestyle: 鍵が変わった区間の連続 [a..b] ごとに、前後1区間を足した範囲だけをチェック
+    n = len(starts)
+    keys = [(hashes[i-1] if i else None, hashes[i], hashes[i+1] if i + 1 < n else None, e402[max(i-1, 0)])
+            for i in range(n)]
+    style: List[Optional[list]] = [old.style.get(k) for k in keys]
+    restyled = 0
+    i = 0
+    while i < n:
+        if style[i] is not None: i += 1; continue
+        b = i
+        while b + 1 < n and style[b+1] is None: b += 1
+        wa, wb = max(i-1, 0), min(b+1, n-1)
+        off = starts[wa] - 1
+        for j in range(i, b + 1): style[j] = []
+        for ln, col, pri, msg in stylecheck.pycodestyle_items(path, lines[off:ends[wb]-1], e402[wa]):
+            j = bisect.bisect_right(starts, ln + off) - 1
+            if i <= j <= b: style[j].append((ln + off - starts[j] + 1, col, pri, msg))
+        restyled += b - i + 1
+        if cancel: cancel.check()
+        i = b + 1
+    # ここから先は中断しない（pyflakes_units が FlakeUnit に次回の分を書き込む）
+
+    # pyflakes: 新しい区間だけそのまま、ほかは変わっていない関数の本体をスタブにして
+    with span("pyflakes"):
+        occ: Dict[bytes, int] = {}
+        units: List[Tuple[int, stylecheck.FlakeUnit]] = []
+        full: Set[int] = set()
+        for i, (start, h) in enumerate(zip(starts, hashes)):
+            key = (h, occ.get(h, 0)); occ[h] = key[1] + 1
+            u = old.flakes.get(key)
+            if u is None: u = stylecheck.flake_unit(parse(i), start); full.add(i)
+            new.flakes[key] = u; new.keys.append(key); units.append((start, u))
+        env, futures, star = stylecheck.flake_env(u for _, u in units)
+        new.env, new.futures = env, futures
+        stubbed = 0
+        if same_text and old.env is not None:
+            items = list(old.flake_items)
+        else:
+            if old.env is None or star or futures != old.futures: full = set(range(n))
+            prev = (list(zip(old.starts, (old.flakes[k] for k in old.keys))), old.flake_items)
+            items, stubbed = stylecheck.pyflakes_units(path, units, parse, full, env, env == old.env, prev)
+        new.flake_items = list(items)
+    for k, its, start in zip(keys, style, starts):
+        new.style[k] = its
+        items.extend((start + ln - 1, col, pri, msg) for ln, col, pri, msg in its)
+
+    words: Set[str] = set()
+    for h, s, e in zip(hashes, starts, ends):
+        w = old.words.get(h)
+        if w is None: w = frozenset(re.findall(r'\b\w+\b', "".join(lines[s-1:e-1]))) & _INC_WORDS
+        new.words[h] = w; words |= w
+
+    with span("graph"):
+        new.graph = _incremental_graph(old.graph, eng.calls, eng.pattern_tags)
+    new.stats = dict(units=n, parsed=len(parse.parsed), reused=reused, restyled=restyled, stubbed=stubbed)
+    with _INC_LOCK:
+        _INC_FILES[path] = new; _INC_FILES.move_to_end(path)
+        while len(_INC_FILES) > INCREMENTAL_FILES: _INC_FILES.popitem(last=False)
+    g = new.graph
+    return eng, stylecheck.format_items(path, items), words, g.graph, g.called, g.inherited
+
+
+def analyze_file(code: str, original_path: str, use_cache: bool = True,
+                 out_dir: Optional[str] = None, report_base: Optional[str] = None,
+                 cancel: Optional[CancelToken] = None, style_backend: Optional[str] = None,
+                 style_issues: Optional[List[str]] = None, structured: Optional[str] = None,
+                 incremental: bool = True) -> AnalyzeResult:
+    """
+    out_dir/report_base 省略時は SAVE_DIR/<ファイル名>_analysis_with_pep8.txt に出力。
+    cancel を渡すと各段の間と flake8 実行中に中断できる（Cancelled を送出）。
+    style_issues を渡すとスタイルチェックを省略してそれを使う（flake8 一括実行の結果など。キャッシュにあってもこちらが優先）。
+    structured: "jsonl" / "sqlite" でテキストと並べて機械可読な出力も書く（None は utils.STRUCTURED_OUTPUT、"" は出さない）。
+    incremental: 同じパスの前回の解析から、変わっていない関数/クラスの結果を使い回す（プロセス内 PEP8 のときだけ）。
+    """
+    fmt = STRUCTURED_OUTPUT if structured is None else structured
+    if incremental:
+        with _INC_LOCK:
+            st = _INC_FILES.get(original_path)
+            if st is not None: st.stats = {}  # 今回使わなければ「なし」
+    out_dir = out_dir or ensure_save_dir()
+    _SHARED.MODULE_NAME = os.path.splitext(os.path.basename(original_path))[0]
+    base = report_base or os.path.splitext(os.path.basename(original_path))[0]
+    out = os.path.join(out_dir, f"{base}_analysis_with_pep8.txt")
+
+    key = analysis_cache_key(code, "flake8" if style_issues is not None else style_backend) if use_cache else ""
+    with span("cache"):
+        cached = _analysis_cache.get_json(key) if use_cache else None
+    if cached is not None:
+        try:
+            result, tags = result_from_dict(cached, original_path)
+            if style_issues is not None and result.style_issues != style_issues:
+                # 渡された結果（flake8 一括実行など）を優先し、キャッシュの PEP8 も置き換える
+                result = replace(result, style_issues=list(style_issues))
+                _analysis_cache.put_json(key, result_to_dict(result, tags, original_path), replace=True)
+            set_pattern_tags(tags, result.function_calls)
+            _SHARED.METRICS = result.metrics
+            with span("report"):
+                _write_report(out, result)
+                _write_structured(fmt, out_dir, base, original_path, result)
+            return result
+        except Exception:
+            pass  # 形式不一致などは作り直す
+
+    calls = CallGraph.from_rows([])
+    def_positions: Dict[str,int] = {}
+    def_kinds: Dict[str,str] = {}
+    metrics: Dict[str, FuncMetrics] = {}
+    inc = None
+    tree, parsed = None, False
+    if incremental and style_issues is None and resolve_style_backend(style_backend) == "inprocess":
+        lines = code.splitlines(True)
+        if _incremental_ok(code, lines):
+            try:
+                with span("incremental"):
+                    inc = _analyze_incremental(code, original_path, lines, cancel)
+            except Cancelled:
+                raise
+            except SyntaxError:
+                parsed = True  # ファイル全体でも構文エラー
+            except Exception:
+                with _INC_LOCK: _INC_FILES.pop(original_path, None)  # 想定外は全体解析へ（途中まで書き換えた状態は捨てる）
+    if inc is None and not parsed:
+        try:
+            with span("parse"):
+                tree = ast.parse(code)
+        except SyntaxError:
+            tree = None
+    if inc is not None:
+        az, style, words = inc[:3]
+    else:
+        with span("visitor"):
+            az = run_engine(code, tree) if tree is not None else None
+        if cancel: cancel.check()
+        style = style_issues if style_issues is not None else \
+            perform_style_check(original_path, cancel, code=code, tree=tree, backend=style_backend)
+    if cancel: cancel.check()
+    if az is not None:
+        with span("refactor"):
+            refac = az.refactor_suggestions(code)
+        def_positions = dict(az.def_positions)
+        def_kinds = dict(az.def_kinds)
+        metrics = dict(az.metrics)
+        if inc is not None:
+            calls, called, inherited = inc[3:]
+        else:
+            calls = CallGraph.from_calls(az.calls)
+            called, inherited = _called_names(calls), None
+        for c in called:  # モジュール直下からしか呼ばれない print などは外部のノードにしない
+            if c not in def_positions:
+                def_positions[c]=1; def_kinds[c]="external"
+        set_pattern_tags(az.pattern_tags, calls, inherited)
+    else:
+        refac = ["構文エラーのためAST解析は一部スキップされました。"]; set_pattern_tags({}, calls)
+
+    if cancel: cancel.check()
+    with span("keywords"):
+        k,b = _keywords_in(words) if inc is not None else extract_keywords_in_code(code)
+    result = AnalyzeResult(style, refac, calls, def_positions, def_kinds, k, b, metrics)
+    _SHARED.METRICS = metrics
+    with span("report"):
+        _write_report(out, result)
+        _write_structured(fmt, out_dir, base, original_path, result)
+    if use_cache:
+        with span("cache"):
+            _analysis_cache.put_json(key, result_to_dict(result, _SHARED.PATTERN_TAGS, original_path))
+    return result
 
 # ========= Graphviz（PNG/SVG + クリックマップJSON） =========
 _COLORS = {
@@ -338,7 +1096,9 @@ _COLORS = {
     "io":        dict(fill="#FFECB3", border="#A86E00"),
     "net":       dict(fill="#B3E5FC", border="#0277BD"),
     "leaf":      dict(fill="#F9FBFF", border=None),
+    "collapsed": dict(fill="#FAFAFA", border="#9E9E9E"),
 }
+_COMPLEXITY_BORDER = {1: "#F57C00", 2: "#C62828"}  # complexity_level → 枠の色
 _EDGE_PALETTE = ['#5B8FF9','#61DDAA','#65789B','#F6BD16','#7262FD','#78D3F8','#9661BC','#F6903D','#008685','#F08BB4']
 
 def _wrap_label(name: str, width: int = 22) -> str:
@@ -362,10 +1122,18 @@ def _node_style(name: str, def_kinds: Dict[str,str], entry:Set[str], leaf:Set[st
     style, shape, peripheries = "filled", "rectangle", "1"
     if kind == "class": shape = "ellipse"
     elif kind == "method": style = "rounded,filled"
+    elif kind == "collapsed": shape, style = "note", "dashed,filled"
     if "recursive" in tags: peripheries = "2"
+    inh = _dominant_tag(set(_SHARED.INHERITED_TAGS.get(name, ())))
+    if inh:  # 呼び出し先経由で届くだけのタグは塗らずに、その色の破線枠
+        base["border"] = _COLORS[inh]["border"]; style += ",dashed"
     penwidth = "1.6"
     if name in entry: penwidth = "3"
     if name in leaf:  base["fill"] = _COLORS["leaf"]["fill"]
+    lv = complexity_level(_SHARED.METRICS.get(name))
+    if lv:
+        base["border"] = _COMPLEXITY_BORDER[lv]
+        if penwidth == "1.6": penwidth = "2.4"
     return dict(shape=shape, style=style, fillcolor=base["fill"], color=(base["border"] or "#666"),
                 peripheries=peripheries, penwidth=penwidth)
 
@@ -374,16 +1142,42 @@ def _edge_color(u: str, v: str) -> str:
         tags = _SHARED.PATTERN_TAGS.get(s, set())
         dom = _dominant_tag(tags)
         if dom: return _COLORS[dom]["border"]
-    idx = abs(hash((u,v))) % len(_EDGE_PALETTE)
+    # hash() はプロセスごとにソルトが変わるので crc32（DOT を毎回同じ文字列にしてキャッシュキーに使う）
+    idx = zlib.crc32(f"{u}\0{v}".encode("utf-8", "surrogatepass")) % len(_EDGE_PALETTE)
     return _EDGE_PALETTE[idx]
 
+_GV_PAD = 4.0  # Graphviz の既定 pad（0.0555inch = 4pt）。SVG では translate(pad, 高さ+pad) で描かれる
+
+def layout_bbox_map(layout: dict) -> Dict[str, Tuple[float,float,float,float]]:
+    """dot -Tjson0 のレイアウトから、SVG座標系（左上原点）のノード矩形 (x,y,w,h) を作る"""
+    try:
+        top = float(layout.get("bb", "0,0,0,0").split(",")[3])
+    except Exception:
+        return {}
+    out: Dict[str, Tuple[float,float,float,float]] = {}
+    for o in layout.get("objects", []):
+        if "nodes" in o or "pos" not in o or "name" not in o: continue  # クラスタ（subgraph）は除外
+        try:
+            x, y = map(float, o["pos"].split(",")[:2])
+            w, h = float(o.get("width", 0)) * 72.0, float(o.get("height", 0)) * 72.0
+        except Exception:
+            continue
+        out[o["name"]] = (x - w/2 + _GV_PAD, top - y - h/2 + _GV_PAD, w, h)
+    return out
+
 def _svg_bbox_map(svg_path: str) -> Dict[str, Tuple[float,float,float,float]]:
+    """JSON レイアウトを出せない古い Graphviz 用のフォールバック（SVG を読み直す）"""
+    from xml.etree import ElementTree as ET
     ns = {"svg": "http://www.w3.org/2000/svg"}
     try:
         tree = ET.parse(svg_path); root = tree.getroot()
     except Exception:
         return {}
     out: Dict[str, Tuple[float,float,float,float]] = {}
+    tx = ty = 0.0  # graph0 の translate（座標は translate 前の値で書かれている）
+    g0 = root.find("svg:g", ns)
+    m = re.search(r"translate\(\s*([-\d.]+)[ ,]+([-\d.]+)\s*\)", (g0.get("transform", "") if g0 is not None else ""))
+    if m: tx, ty = float(m.group(1)), float(m.group(2))
     for g in root.findall(".//svg:g", ns):
         if "node" not in (g.get("class","") or ""): continue
         title_el = g.find("svg:title", ns)
@@ -392,7 +1186,7 @@ def _svg_bbox_map(svg_path: str) -> Dict[str, Tuple[float,float,float,float]]:
         ell = g.find(".//svg:ellipse", ns)
         if ell is not None and all(k in ell.attrib for k in ("cx","cy","rx","ry")):
             cx,cy,rx,ry = map(float,[ell.get("cx"),ell.get("cy"),ell.get("rx"),ell.get("ry")])
-            out[name]=(cx-rx, cy-ry, rx*2, ry*2); continue
+            out[name]=(cx-rx+tx, cy-ry+ty, rx*2, ry*2); continue
         poly = g.find(".//svg:polygon", ns)
         if poly is not None and "points" in poly.attrib:
             pts = poly.get("points").strip().split()
@@ -403,89 +1197,284 @@ def _svg_bbox_map(svg_path: str) -> Dict[str, Tuple[float,float,float,float]]:
                     xs.append(float(x)); ys.append(float(y))
             if xs and ys:
                 minx, maxx = min(xs), max(xs); miny, maxy = min(ys), max(ys)
-                out[name]=(minx, miny, maxx-minx, maxy-miny); continue
+                out[name]=(minx+tx, miny+ty, maxx-minx, maxy-miny); continue
     return out
 
-def generate_flowchart_image(function_calls: Dict[str, List[str]], def_kinds: Dict[str,str], base_name: str):
-    ensure_save_dir()
-    if not graphviz_available():
-        return None, None, "Graphviz(dot.exe) が見つかりません。PNG/SVG未出力。"
-
-    indeg: Dict[str,int] = {}
-    outdeg: Dict[str,int] = {}
-    edge_counts: Dict[Tuple[str,str],int] = {}
-    for u, vs in function_calls.items():
-        outdeg[u] = outdeg.get(u,0) + len(vs)
-        for v in vs:
-            indeg[v] = indeg.get(v,0) + 1
-            edge_counts[(u,v)] = edge_counts.get((u,v),0) + 1
-    nodes = set(def_kinds.keys()) | {u for u,_ in edge_counts} | {v for _,v in edge_counts}
+def build_flowchart_dot(function_calls: CallGraph, def_kinds: Dict[str,str],
+                        module_of: Optional[Dict[str,str]] = None, labels: Optional[Dict[str,str]] = None,
+                        focus: Optional[str] = None) -> "Digraph":
+    """
+    呼び出しグラフの DOT を組み立てる。
+    module_of（ノード→モジュール名）を渡すとモジュールごとにクラスタを分ける（プロジェクト解析用）。
+    省略時は全ノードを _SHARED.MODULE_NAME の1クラスタに入れる。module_of に無いノードはクラスタ外。
+    labels でノードの表示名を上書き、focus のノードは太枠で強調（フォーカス表示用）。
+    function_calls は dict でもよい（CallGraph にしてから使う）。モジュール直下からの呼び出し（MODULE_CALLER）は描かない。
+    """
+    g = without_module_calls(function_calls)
+    indeg, outdeg = g.indegree(), g.outdegree()
+    nodes = set(def_kinds.keys()) | {n for n, i, o in zip(g.names, indeg, outdeg) if i or o}
     defined = {n for n in nodes if def_kinds.get(n) in ("class","method","function")}
-    entry = {n for n in defined if indeg.get(n,0)==0}
-    leaf  = {n for n in defined if outdeg.get(n,0)==0}
+    entry = {n for n in defined if n not in g.ids or indeg[g.ids[n]]==0}
+    leaf  = {n for n in defined if n not in g.ids or outdeg[g.ids[n]]==0}
 
     # 手動上書き（config.py 任意）
-    try:
-        import config as _cfg
-        entry |= set(getattr(_cfg, "entry_symbols", []) or [])
-        leaf  |= set(getattr(_cfg, "leaf_symbols",  []) or [])
-    except Exception:
-        pass
+    cfg_entry, cfg_leaf = config_symbols()
+    entry |= cfg_entry; leaf |= cfg_leaf
 
-    class_members: Dict[str,List[str]] = {}
-    for n,k in def_kinds.items():
-        if k=="method" and "." in n:
-            cls,_ = n.split(".",1)
-            class_members.setdefault(cls,[]).append(n)
+    def _split(n: str) -> Tuple[Optional[str], str]:
+        """(モジュール, モジュール内の名前)"""
+        if module_of is None: return _SHARED.MODULE_NAME, n
+        mod = module_of.get(n)
+        return (mod, n[len(mod)+1:]) if mod and n.startswith(mod + ".") else (mod, n)
 
+    by_module: Dict[Optional[str], List[str]] = {}
+    class_members: Dict[Tuple[Optional[str],str], List[str]] = {}
+    for n in sorted(nodes):
+        mod, local = _split(n)
+        by_module.setdefault(mod, []).append(n)
+        if def_kinds.get(n)=="method" and "." in local:
+            cls,_ = local.split(".",1)
+            class_members.setdefault((mod, cls),[]).append(n)
+
+    from graphviz import Digraph  # 読み込みが重いので最初に描くときに
     dot = Digraph(comment='Function Flowchart')
     if FONT_PATH: dot.attr(fontname=FONT_PATH)
     dot.attr(rankdir='LR', concentrate='true', splines='spline', overlap='false', nodesep='0.6', ranksep='1.0')
 
     def _add_node(g, name: str):
         st = _node_style(name, def_kinds, entry, leaf)
+        if name == focus: st.update(penwidth="4", color="#E53935")
         url = f"pyjump://{name}"
-        g.node(name, label=_wrap_label(name), fontname="Kosugi Maru", id=name, URL=url, **st)
-
-    module_label = _wrap_label(f"module {_SHARED.MODULE_NAME}")
-    with dot.subgraph(name=f"cluster_module_{_SHARED.MODULE_NAME}") as m:
-        m.attr(label=module_label, color="#5A78FF")
-        added = set()
-        for cls, members in class_members.items():
-            with m.subgraph(name=f"cluster_{cls}") as c:
-                c.attr(label=_wrap_label(f"class {cls}"), color=_COLORS["class"]["border"])
-                _add_node(c, cls); added.add(cls)
-                c.attr(rank="same")
-                for meth in sorted(members):
-                    _add_node(c, meth); added.add(meth)
-        for n in nodes:
-            if n in added: continue
-            _add_node(m, n)
-
-    for (u,v), cnt in edge_counts.items():
+        label = labels[name] if labels and name in labels else _wrap_label(_split(name)[1])
+        g.node(name, label=label, fontname="Kosugi Maru", id=name, URL=url, **st)
+
+    for mod in sorted(by_module, key=lambda x: (x is None, x or "")):
+        if mod is None:
+            for n in by_module[mod]: _add_node(dot, n)
+            continue
+        with dot.subgraph(name=f"cluster_module_{mod}") as m:
+            m.attr(label=_wrap_label(f"module {mod}"), color="#5A78FF")
+            added = set()
+            for (cmod, cls), members in class_members.items():
+                if cmod != mod: continue
+                cls_node = cls if module_of is None else f"{mod}.{cls}"
+                with m.subgraph(name=f"cluster_{cls}" if module_of is None else f"cluster_{mod}.{cls}") as c:
+                    c.attr(label=_wrap_label(f"class {cls}"), color=_COLORS["class"]["border"])
+                    _add_node(c, cls_node); added.add(cls_node)
+                    c.attr(rank="same")
+                    for meth in sorted(members):
+                        _add_node(c, meth); added.add(meth)
+            for n in by_module[mod]:
+                if n in added: continue
+                _add_node(m, n)
+
+    for u, v, cnt in g.edges():
         dot.edge(u, v, arrowhead='normal', arrowsize='0.8',
                  color=_edge_color(u,v), penwidth=_edge_penwidth(cnt),
                  label=str(cnt) if cnt>1 else "", fontname='Kosugi Maru', fontsize="10")
+    return dot
+
+def _render_dot(source: str, outputs: List[Tuple[str,str]], cancel: Optional[CancelToken] = None) -> bool:
+    """outputs: [(形式, 出力パス)]。dot を直接起動（cancel で kill できるように）"""
+    args = ["dot"]
+    for fmt, path in outputs: args += [f"-T{fmt}", "-o", path]
+    try:
+        with span("dot", formats=",".join(f for f, _ in outputs)):  # 形式はまとめて1回のレイアウトで出す
+            r = _run(args, cancel, source)
+    except Cancelled:
+        raise
+    except Exception:
+        return False
+    return r.returncode == 0 and all(os.path.exists(p) for _, p in outputs)
+
+# 描画結果キャッシュ（SAVE_DIR/cache/render）。キーは DOT ソース + Graphviz のバージョン
+_render_cache = DiskCache("render", RENDER_CACHE_MAX_BYTES)
+_RENDER_FILES = (("flowchart.png", ".png"), ("flowchart.svg", ".svg"),
+                 ("layout.json", "_layout.json"), ("map.json", "_map.json"))  # (エントリ内の名前, 出力の接尾辞)
+
+@lru_cache(maxsize=1)
+def _graphviz_version() -> str:
+    try:
+        r = subprocess.run(["dot", "-V"], capture_output=True, text=True, encoding="utf-8", errors="replace")
+        return (r.stderr or r.stdout).strip()
+    except Exception:
+        return "unknown"
+
+def render_cache_key(dot_source: str) -> str:
+    return content_key("render", dot_source, _graphviz_version())
+
+def render_cache_stats() -> Dict[str, int]:
+    return _render_cache.stats()
+
+def _restore_render(key: str, outstem: str) -> bool:
+    d = _render_cache.get_dir(key)
+    if d is None: return False
+    try:
+        for name, suffix in _RENDER_FILES:
+            src = os.path.join(d, name)
+            if os.path.exists(src): shutil.copyfile(src, outstem + suffix)
+        return os.path.exists(outstem + ".png") and os.path.exists(outstem + ".svg")
+    except OSError:
+        return False
 
-    outstem = os.path.join(SAVE_DIR, f"{base_name}_function_flowchart")
-    png_path = svg_path = None
-    try: png_path = dot.render(outstem, format='png', cleanup=True)
-    except Exception: png_path = None
-    try: svg_path = dot.render(outstem, format='svg', cleanup=True)
-    except Exception: svg_path = None
+def generate_flowchart_image(function_calls: CallGraph, def_kinds: Dict[str,str], base_name: str,
+                             out_dir: Optional[str] = None, module_of: Optional[Dict[str,str]] = None,
+                             cancel: Optional[CancelToken] = None, use_cache: bool = True,
+                             labels: Optional[Dict[str,str]] = None, focus: Optional[str] = None):
+    out_dir = out_dir or ensure_save_dir()
+    if not graphviz_available():
+        return None, None, "Graphviz(dot.exe) が見つかりません。PNG/SVG未出力。"
+    with span("dot_source"):
+        dot = build_flowchart_dot(function_calls, def_kinds, module_of, labels, focus)
+
+    outstem = os.path.join(out_dir, f"{base_name}_function_flowchart")
+    png_path, svg_path, layout_path = outstem + ".png", outstem + ".svg", outstem + "_layout.json"
+    key = render_cache_key(dot.source) if use_cache else None
+    with span("render_cache"):
+        hit = bool(key) and _restore_render(key, outstem)
+    if hit:
+        return png_path, svg_path, "フローチャート出力（キャッシュ）。"
+    for suffix in ("_layout.json", "_map.json"):  # 前回の残りをキャッシュに混ぜない
+        try: os.remove(outstem + suffix)
+        except OSError: pass
+    # レイアウトは1回だけ。PNG/SVG/JSON を同じ dot 実行で出し、クリックマップは JSON の座標から作る
+    bbox_map = None
+    if _render_dot(dot.source, [("png", png_path), ("svg", svg_path), ("json0", layout_path)], cancel):
+        try:
+            with span("bbox", source="layout"), open(layout_path, "r", encoding="utf-8") as fp:
+                bbox_map = layout_bbox_map(json.load(fp))
+        except Exception:
+            bbox_map = None
+    elif _render_dot(dot.source, [("png", png_path), ("svg", svg_path)], cancel):
+        with span("bbox", source="svg"):
+            bbox_map = _svg_bbox_map(svg_path)  # json 非対応の Graphviz
+    else:
+        png_path = svg_path = None
 
-    if svg_path and os.path.exists(svg_path):
+    if bbox_map is not None:
         try:
-            bbox_map = _svg_bbox_map(svg_path)
             with open(outstem + "_map.json", "w", encoding="utf-8") as fp:
                 json.dump({"bboxes": bbox_map}, fp, ensure_ascii=False, indent=2)
         except Exception:
             pass
+    if key and png_path and svg_path:
+        _render_cache.put_files(key, {name: outstem + suffix for name, suffix in _RENDER_FILES
+                                      if os.path.exists(outstem + suffix)})
 
     status = "フローチャート出力（PNG/SVG/マップ）。"
     if not (png_path or svg_path): status = "フローチャート出力に失敗しました。"
     return png_path, svg_path, status
 
+# ========= フォーカス表示（大きな呼び出しグラフの k ホップ近傍だけを描く） =========
+class FocusGraph:
+    """
+    呼び出しグラフの隣接表を1回だけ作り、注目ノードから呼び出し元/呼び出し先へ k ホップの近傍を切り出す。
+    近傍の外へ出る辺は「+N 呼び出し元 / +N 呼び出し先」のプレースホルダ1つに畳む。
+    切り出し結果はメモ化し、描画は render キャッシュを通る（同じ近傍なら dot を起動しない）。
+    作成時点の PATTERN_TAGS（と引き継ぎタグ）/ MODULE_NAME / METRICS を控えておき、描画時に _SHARED へ戻す。
+    引き継ぎタグはグラフ全体で求めたもの（近傍の外にある I/O も、切り出したノードの破線枠に出る）。
+    """
+    def __init__(self, function_calls: CallGraph, def_kinds: Dict[str,str],
+                 module_of: Optional[Dict[str,str]] = None, max_nodes: int = 0,
+                 pattern_tags: Optional[Dict[str, Set[str]]] = None, module_name: Optional[str] = None,
+                 metrics: Optional[Dict[str, FuncMetrics]] = None):
+        self.function_calls = function_calls = CallGraph.of(function_calls)
+        self.def_kinds = def_kinds
+        self.module_of = module_of
+        self.max_nodes = max_nodes or FOCUS_MAX_NODES
+        self.pattern_tags = _SHARED.PATTERN_TAGS if pattern_tags is None else pattern_tags
+        self.inherited_tags = _SHARED.INHERITED_TAGS if pattern_tags is None else propagate_tags(function_calls, pattern_tags)
+        self.module_name = _SHARED.MODULE_NAME if module_name is None else module_name
+        self.metrics = _SHARED.METRICS if metrics is None else metrics
+        self._levels = _complexity_levels(self.metrics)  # 描画に効くのは段階だけ（行数などの変化では描き直さない）
+        self.succ: Dict[str, Set[str]] = {}
+        self.pred: Dict[str, Set[str]] = {}
+        for u, v, _ in without_module_calls(function_calls).edges():
+            self.succ.setdefault(u, set()).add(v); self.pred.setdefault(v, set()).add(u)
+        self.nodes = set(def_kinds) | set(self.succ) | set(self.pred)
+        self.placeholders: Dict[str, str] = {}  # プレースホルダ名 → 元のノード（クリックでそこへフォーカス）
+        self._memo: "OrderedDict[Tuple[str,int], tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def same_graph(self, function_calls: CallGraph, def_kinds: Dict[str,str],
+                   pattern_tags: Optional[Dict[str, Set[str]]] = None,
+                   metrics: Optional[Dict[str, FuncMetrics]] = None) -> bool:
+        """再解析で描くものが変わらないか（行番号だけの変化なら True。フローチャートは描き直さなくてよい）"""
+        tags = _SHARED.PATTERN_TAGS if pattern_tags is None else pattern_tags
+        levels = _complexity_levels(_SHARED.METRICS if metrics is None else metrics)
+        return (function_calls == self.function_calls and def_kinds == self.def_kinds and tags == self.pattern_tags
+                and levels == self._levels)
+
+    def default_center(self) -> Optional[str]:
+        """最初に表示するノード（呼び出し元＋呼び出し先が最も多い定義）"""
+        cands = [n for n in self.nodes if self.def_kinds.get(n) in ("class","method","function")] or list(self.nodes)
+        if not cands: return None
+        return min(cands, key=lambda n: (-(len(self.succ.get(n, ())) + len(self.pred.get(n, ()))), n))
+
+    def _reach(self, center: str, adj: Dict[str, Set[str]], hops: int, keep: Set[str]):
+        frontier = [center]
+        for _ in range(hops):
+            nxt = []
+            for n in frontier:
+                for m in sorted(adj.get(n, ())):
+                    if m in keep: continue
+                    if len(keep) >= self.max_nodes: return
+                    keep.add(m); nxt.append(m)
+            if not nxt: return
+            frontier = nxt
+
+    def neighbourhood(self, center: str, hops: int = 2):
+        """(CallGraph, def_kinds, labels, module_of) の部分グラフ"""
+        key = (center, hops)
+        hit = self._memo.get(key)
+        if hit is not None:
+            self._memo.move_to_end(key); return hit
+        keep = {center}
+        self._reach(center, self.succ, hops, keep)  # 呼び出し先
+        self._reach(center, self.pred, hops, keep)  # 呼び出し元
+        calls: Dict[str, List[Tuple[str, int]]] = {}  # 呼び出し元 → [(呼び出し先, 回数)]
+        kinds = {n: self.def_kinds.get(n, "function") for n in keep if n in self.def_kinds}
+        labels: Dict[str, str] = {}
+        mod = {} if self.module_of is not None else None
+        for n in sorted(keep):
+            if mod is not None and n in self.module_of: mod[n] = self.module_of[n]
+            vs = [(v, c) for v, c in self.function_calls.callees(n) if v in keep]
+            hidden_out = len(self.succ.get(n, set()) - keep)
+            hidden_in = len(self.pred.get(n, set()) - keep)
+            if hidden_out:
+                ph = f"{n} ⋯callees"; self.placeholders[ph] = n
+                kinds[ph] = "collapsed"; labels[ph] = f"+{hidden_out} 呼び出し先"; vs.append((ph, 1))
+            if hidden_in:
+                ph = f"{n} ⋯callers"; self.placeholders[ph] = n
+                kinds[ph] = "collapsed"; labels[ph] = f"+{hidden_in} 呼び出し元"
+                calls.setdefault(ph, []).append((n, 1))
+            if vs: calls.setdefault(n, []).extend(vs)
+        res = (CallGraph.from_rows(list(calls.items())), kinds, labels, mod)
+        self._memo[key] = res
+        if len(self._memo) > 64: self._memo.popitem(last=False)
+        return res
+
+    def _restore_shared(self):
+        _SHARED.PATTERN_TAGS, _SHARED.INHERITED_TAGS = self.pattern_tags, self.inherited_tags
+        _SHARED.MODULE_NAME, _SHARED.METRICS = self.module_name, self.metrics
+
+    def render(self, center: str, hops: int, base_name: str, out_dir: Optional[str] = None,
+               cancel: Optional[CancelToken] = None):
+        """近傍だけの PNG/SVG/マップを出力（戻り値は generate_flowchart_image と同じ）"""
+        calls, kinds, labels, mod = self.neighbourhood(center, hops)
+        self._restore_shared()
+        png, svg, msg = generate_flowchart_image(calls, kinds, f"{base_name}_focus", out_dir=out_dir, module_of=mod,
+                                                 cancel=cancel, labels=labels, focus=center)
+        n = sum(1 for k in kinds.values() if k != "collapsed")
+        return png, svg, f"{msg} フォーカス: {center}（{hops}ホップ, {n}/{len(self.nodes)}ノード）"
+
+    def render_full(self, base_name: str, out_dir: Optional[str] = None, cancel: Optional[CancelToken] = None):
+        self._restore_shared()
+        return generate_flowchart_image(self.function_calls, self.def_kinds, base_name, out_dir=out_dir,
+                                        module_of=self.module_of, cancel=cancel)
+
 def highlight_positions_in_text(text: str, keyword: str):
     matches = [m.span() for m in re.finditer(rf'\b{re.escape(keyword)}\b', text)]
     return [(s, e - s) for (s, e) in matches]
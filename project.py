@@ -0,0 +1,238 @@
+"""
+プロジェクト（複数ファイル）解析。
+
+パッケージ内の全モジュールを1回ずつ解析してシンボル表（定義 + import 別名）を作り、
+`import` / `from ... import` の別名を実際の定義へ解決して、モジュール横断の呼び出しグラフを作る。
+シンボル表は (パス, mtime, サイズ) が同じ間は使い回す。解決は1呼び出しあたり辞書引き数回（メモ化あり）。
+
+    python PyCodeDictionary.py --project path/to/pkg [-o out_dir] [--external]
+"""
+import os, sys, ast, time, argparse
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple, Optional, Set
+
+from utils import ensure_save_dir
+from processor import AstAnalyzer, _SHARED, generate_flowchart_image, set_pattern_tags, _write_graph_report, _callee_text
+from callgraph import CallGraph, MODULE_CALLER, analyze_graph
+
+_DEFINED_KINDS = ("class", "method", "function")
+
+class _ModuleAnalyzer(AstAnalyzer):
+    """AstAnalyzer の走査ついでに import 別名と、呼び出しのドット付き完全名を集める"""
+    def __init__(self, module: str, is_package: bool):
+        super().__init__()
+        self.module = module
+        self.is_package = is_package
+        self.imports: Dict[str, str] = {}   # 別名 → 絶対ドット名（モジュール or モジュール.シンボル）
+        self.star_imports: List[str] = []
+        self.full_calls: Dict[str, List[Tuple[str, str]]] = {}  # caller → [(AstAnalyzer の callee, 完全名)]
+
+    def visit_Import(self, node: ast.Import):
+        for a in node.names:
+            if a.asname: self.imports[a.asname] = a.name
+            else:
+                head = a.name.split(".", 1)[0]; self.imports[head] = head
+        self.generic_visit(node)
+
+    def visit_ImportFrom(self, node: ast.ImportFrom):
+        base = self._absolute(node.module, node.level)
+        for a in node.names:
+            if a.name == "*": self.star_imports.append(base); continue
+            self.imports[a.asname or a.name] = f"{base}.{a.name}" if base else a.name
+        self.generic_visit(node)
+
+    def _absolute(self, module: Optional[str], level: int) -> str:
+        if not level: return module or ""
+        parts = self.module.split(".")
+        if not self.is_package: parts = parts[:-1]
+        parts = parts[:len(parts) - (level - 1)] if level > 1 else parts
+        return ".".join(parts + ([module] if module else []))
+
+    def visit_Call(self, node: ast.Call):
+        callee = self._format_callee(node.func)
+        if callee:  # モジュール直下は MODULE_CALLER（AstAnalyzer.calls と同じ）
+            full = self._call_full_name(node.func) or callee
+            self.full_calls.setdefault(self._current_symbol or MODULE_CALLER, []).append((callee, full))
+        super().visit_Call(node)
+
+@dataclass
+class ModuleInfo:
+    name: str
+    path: str
+    def_positions: Dict[str, int]
+    def_kinds: Dict[str, str]
+    full_calls: Dict[str, List[Tuple[str, str]]]
+    imports: Dict[str, str]
+    star_imports: List[str]
+    pattern_tags: Dict[str, Set[str]]
+    error: str = ""
+
+@dataclass
+class ProjectResult:
+    root: str
+    package: str
+    modules: Dict[str, ModuleInfo]
+    function_calls: CallGraph
+    def_positions: Dict[str, int]
+    def_kinds: Dict[str, str]
+    module_of: Dict[str, str]
+    locations: Dict[str, Tuple[str, int]]          # 修飾名 → (ファイル, 行)
+    pattern_tags: Dict[str, Set[str]]
+    stats: Dict[str, float] = field(default_factory=dict)
+
+_TABLE_CACHE: Dict[str, Tuple[Tuple[float, int], ModuleInfo]] = {}
+
+def _module_table(path: str, name: str, is_package: bool) -> ModuleInfo:
+    try:
+        st = os.stat(path); stamp = (st.st_mtime, st.st_size)
+    except OSError:
+        stamp = (0.0, -1)
+    hit = _TABLE_CACHE.get(path)
+    if hit and hit[0] == stamp and hit[1].name == name: return hit[1]
+    az = _ModuleAnalyzer(name, is_package); err = ""
+    try:
+        with open(path, "r", encoding="utf-8") as fp:
+            az.visit(ast.parse(fp.read()))
+    except (SyntaxError, UnicodeDecodeError, OSError) as e:
+        err = f"{type(e).__name__}: {e}"
+    info = ModuleInfo(name, path, az.def_positions, az.def_kinds, az.full_calls,
+                      az.imports, az.star_imports, az.pattern_tags, err)
+    _TABLE_CACHE[path] = (stamp, info)
+    return info
+
+def discover_modules(root: str) -> Tuple[str, List[Tuple[str, str, bool]]]:
+    """(パッケージ名, [(モジュール名, パス, __init__か)])。root が __init__.py を持てばそれ自体がパッケージ"""
+    root = os.path.abspath(root)
+    package = os.path.basename(root) if os.path.exists(os.path.join(root, "__init__.py")) else ""
+    out = []
+    for d, dirs, files in os.walk(root):
+        dirs[:] = sorted(x for x in dirs if not x.startswith(".") and x != "__pycache__")
+        rel = os.path.relpath(d, root)
+        prefix = [package] if package else []
+        if rel != ".": prefix += rel.split(os.sep)
+        for f in sorted(files):
+            if not f.endswith(".py"): continue
+            if f == "__init__.py":
+                if prefix: out.append((".".join(prefix), os.path.join(d, f), True))
+            else:
+                out.append((".".join(prefix + [f[:-3]]), os.path.join(d, f), False))
+    return package or os.path.basename(root), out
+
+class _Resolver:
+    def __init__(self, modules: Dict[str, ModuleInfo]):
+        self.modules = modules
+        self._memo: Dict[str, Optional[str]] = {}
+
+    def find(self, dotted: str, depth: int = 0) -> Optional[str]:
+        """絶対ドット名 → 定義の修飾名（モジュール名.モジュール内の名前）。再エクスポートも辿る"""
+        if dotted in self._memo: return self._memo[dotted]
+        self._memo[dotted] = None  # 循環 import 対策
+        res = None
+        parts = dotted.split(".")
+        for i in range(len(parts), 0, -1):
+            mod = ".".join(parts[:i]); info = self.modules.get(mod)
+            if info is None: continue
+            rest = parts[i:]
+            if not rest: break
+            local = ".".join(rest)
+            if info.def_kinds.get(local) in _DEFINED_KINDS:
+                res = f"{mod}.{local}"
+            elif rest[0] in info.imports and depth < 8:
+                res = self.find(".".join([info.imports[rest[0]]] + rest[1:]), depth + 1)
+            break
+        self._memo[dotted] = res
+        return res
+
+    def resolve(self, info: ModuleInfo, callee: str, full: str) -> Optional[str]:
+        if info.def_kinds.get(callee) in _DEFINED_KINDS:
+            return f"{info.name}.{callee}"
+        parts = full.split(".")
+        head = parts[0]
+        if head in info.imports:
+            return self.find(".".join([info.imports[head]] + parts[1:]))
+        if info.def_kinds.get(full) in _DEFINED_KINDS:  # ClassName.method()
+            return f"{info.name}.{full}"
+        if len(parts) == 1:
+            for star in info.star_imports:
+                r = self.find(f"{star}.{head}")
+                if r: return r
+        return None
+
+def analyze_project(root: str, include_external: bool = False) -> ProjectResult:
+    t0 = time.perf_counter()
+    package, found = discover_modules(root)
+    modules = {name: _module_table(path, name, is_pkg) for name, path, is_pkg in found}
+    t1 = time.perf_counter()
+    rs = _Resolver(modules)
+    calls: Dict[str, List[str]] = {}
+    def_positions: Dict[str, int] = {}
+    def_kinds: Dict[str, str] = {}
+    module_of: Dict[str, str] = {}
+    locations: Dict[str, Tuple[str, int]] = {}
+    tags: Dict[str, Set[str]] = {}
+    resolved = unresolved = 0
+    for name, info in modules.items():
+        for local, kind in info.def_kinds.items():
+            q = f"{name}.{local}"
+            def_kinds[q] = kind; def_positions[q] = info.def_positions.get(local, 1)
+            module_of[q] = name; locations[q] = (info.path, def_positions[q])
+        for local, t in info.pattern_tags.items():
+            tags[f"{name}.{local}"] = set(t)
+        for caller, lst in info.full_calls.items():
+            out = calls.setdefault(f"{name}.{caller}", [])
+            for callee, full in lst:
+                q = rs.resolve(info, callee, full)
+                if q: out.append(q); resolved += 1
+                else:
+                    unresolved += 1
+                    if include_external and caller != MODULE_CALLER:
+                        out.append(full)
+                        if full not in def_kinds: def_kinds[full] = "external"; def_positions[full] = 1
+    stats = dict(modules=len(modules), definitions=len(module_of), resolved_calls=resolved,
+                 external_calls=unresolved, index_sec=round(t1 - t0, 4),
+                 resolve_sec=round(time.perf_counter() - t1, 4))
+    return ProjectResult(os.path.abspath(root), package, modules, CallGraph.from_calls(calls), def_positions, def_kinds,
+                         module_of, locations, tags, stats)
+
+def generate_project_flowchart(pr: ProjectResult, out_dir: Optional[str] = None):
+    set_pattern_tags(pr.pattern_tags, pr.function_calls); _SHARED.MODULE_NAME = pr.package; _SHARED.METRICS = {}
+    return generate_flowchart_image(pr.function_calls, pr.def_kinds, f"{pr.package}_project", out_dir=out_dir,
+                                    module_of=pr.module_of)
+
+def write_project_report(pr: ProjectResult, out_dir: Optional[str] = None) -> str:
+    out_dir = out_dir or ensure_save_dir()
+    out = os.path.join(out_dir, f"{pr.package}_project_calls.txt")
+    lines = [f"プロジェクト: {pr.root}", "統計: " + ", ".join(f"{k}={v}" for k, v in pr.stats.items()), ""]
+    for name, info in pr.modules.items():
+        lines.append(f"[{name}] {info.path}" + (f"  ※{info.error}" if info.error else ""))
+        for local, line in sorted(info.def_positions.items(), key=lambda x: x[1]):
+            q = f"{name}.{local}"
+            cal = _callee_text(pr.function_calls.callees(q))
+            lines.append(f"  {local} (L{line})" + (f" → {cal}" if cal else ""))
+    with open(out, "w", encoding="utf-8") as fp:
+        fp.write("\n".join(lines) + "\n")
+        _write_graph_report(fp, analyze_graph(pr.function_calls, pr.def_kinds))
+    return out
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="PyCodeDictionary --project", description="パッケージ全体の呼び出し関係を解析")
+    ap.add_argument("root", help="パッケージ（またはソース）ディレクトリ")
+    ap.add_argument("-o", "--out", default=None, help="出力先（既定: 保存フォルダ）")
+    ap.add_argument("--external", action="store_true", help="未解決（外部）呼び出しもノードとして含める")
+    ap.add_argument("--no-flowchart", action="store_true", help="フローチャートを出力しない")
+    a = ap.parse_args(argv)
+    if not os.path.isdir(a.root):
+        print(f"ディレクトリではありません: {a.root}", file=sys.stderr); return 2
+    out_dir = a.out or ensure_save_dir(); os.makedirs(out_dir, exist_ok=True)
+    pr = analyze_project(a.root, include_external=a.external)
+    report = write_project_report(pr, out_dir)
+    msg = ""
+    if not a.no_flowchart:
+        from utils import set_graphviz_on_path
+        set_graphviz_on_path()
+        _, _, msg = generate_project_flowchart(pr, out_dir)
+    print(f"{pr.stats} → {report} {msg}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
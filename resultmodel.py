@@ -0,0 +1,282 @@
+"""
+解析結果ツリーのモデル（QTreeView 用）。
+
+AnalyzeResult / ProjectResult を直接読み、子ノードは展開・スクロールされた分だけ
+canFetchMore/fetchMore で FETCH_BATCH 件ずつ作る（PEP8 行の正規表現もその時に1回だけ）。
+絞り込みは元のリスト（文字列）に対して行い、モデルを作り直す。ノード用のアイテムは作らない。
+同じファイルの再解析（update_result）は、中身の変わったセクションだけを差し替える（ほかの展開状態はそのまま）。
+ロール（宣言行 / PEP8行 / シンボル名）は従来の QTreeWidget と同じ値。
+"""
+import re
+from typing import Callable, Dict, List, Optional
+
+from PySide6.QtCore import Qt, QAbstractItemModel, QModelIndex
+
+from utils import COMPLEXITY_WARN
+from callgraph import CallGraph, analyze_graph
+
+ROLE_DECL_LINE = Qt.UserRole + 1
+ROLE_PEP8_LINE = Qt.UserRole + 2
+ROLE_SYMBOL_NAME = Qt.UserRole + 3
+
+FETCH_BATCH = 500
+_PEP_PAT = re.compile(r":(\d+):(\d+):\s*([A-Z]\d+)\s*(.*)")
+
+
+class _Node:
+    __slots__ = ("parent", "row", "text", "roles", "count", "make", "kids", "sig")
+
+    def __init__(self, text: str, roles: Optional[Dict[int, object]] = None,
+                 count: int = 0, make: Optional[Callable[[int], "_Node"]] = None, sig: object = None):
+        self.parent: Optional[_Node] = None
+        self.row = 0
+        self.text = text
+        self.roles = roles
+        self.count = count    # 子の総数（作成済みは len(kids)）
+        self.make = make      # i → i 番目の子
+        self.kids: List[_Node] = []
+        self.sig = sig        # 子の元データ（同じなら作り直さない）
+
+def _lazy(text: str, items: list, make: Callable[[object], "_Node"], roles=None, sig=None) -> _Node:
+    """sig: 子の表示が items 以外（行番号など）にもよるときはそれも含めた比較用の値"""
+    return _Node(text, roles, len(items), lambda i: make(items[i]), items if sig is None else sig)
+
+def _leaf(text: str, **roles) -> _Node:
+    return _Node(text, {r: v for r, v in ((ROLE_DECL_LINE, roles.get("decl")), (ROLE_PEP8_LINE, roles.get("pep8")),
+                                          (ROLE_SYMBOL_NAME, roles.get("symbol"))) if v is not None} or None)
+
+def _match(needle: str, *texts: str) -> bool:
+    return not needle or any(needle in t.lower() for t in texts)
+
+
+# ---- AnalyzeResult（単一ファイル）----
+def result_sections(result, needle: str = "") -> List[_Node]:
+    pos, kinds = result.def_positions, result.def_kinds
+    out = []
+
+    def _pep(line: str) -> _Node:
+        m = _PEP_PAT.search(line)
+        return _leaf(line, pep8=int(m.group(1)) if m else None)
+    pep = [s for s in result.style_issues if _match(needle, s)]
+    if pep or not needle:
+        out.append(_lazy("PEP8スタイルチェック", pep or ["(問題なし or flake8未検出)"], _pep))
+
+    ref = [s for s in result.refactor_suggestions if _match(needle, s)]
+    if ref or not needle:
+        out.append(_lazy("リファクタリングの提案", ref or ["(特になし)"], _leaf))
+
+    methods_by_class: Dict[str, List[str]] = {}
+    for n, k in kinds.items():
+        if k == "method": methods_by_class.setdefault(n.split(".", 1)[0], []).append(n)
+    byline = lambda n: pos.get(n, 0)
+    defs = []  # (名前, 表示する子)
+    for cls in sorted((n for n, k in kinds.items() if k == "class"), key=byline):
+        ms = sorted(methods_by_class.get(cls, []), key=byline)
+        if not _match(needle, cls): ms = [m for m in ms if _match(needle, m)]
+        if ms or _match(needle, cls): defs.append((cls, ms))
+    defs += [(f, None) for f in sorted((n for n, k in kinds.items() if k == "function"), key=byline) if _match(needle, f)]
+
+    def _def(entry) -> _Node:
+        name, ms = entry
+        if ms is None: return _leaf(f"def {name} (L{pos.get(name,0)})", decl=pos.get(name, 0), symbol=name)
+        return _lazy(f"class {name} (L{pos.get(name,0)})", ms,
+                     lambda m: _leaf(f"def {m} (L{pos.get(m,0)})", decl=pos.get(m, 0), symbol=m),
+                     {ROLE_DECL_LINE: pos.get(name, 0), ROLE_SYMBOL_NAME: name})
+    if defs or not needle:
+        out.append(_lazy("定義（行番号）", defs, _def, sig=(defs, pos)))
+
+    # 循環的複雑度の高い順（COMPLEXITY_WARN 以上に ⚠）
+    mets = sorted(((n, m) for n, m in result.metrics.items() if _match(needle, n)),
+                  key=lambda e: (-e[1].cc, -e[1].cognitive, e[0]))
+
+    def _met(e) -> _Node:
+        n, m = e
+        return _leaf(f"{'⚠ ' if m.cc >= COMPLEXITY_WARN else ''}{n}  循環的 {m.cc} / 認知的 {m.cognitive} / "
+                     f"入れ子 {m.nest} / {m.stmts}文 / {m.lines}行", decl=pos.get(n, 0), symbol=n)
+    if mets or not needle:
+        out.append(_lazy("複雑度（関数ごと）", mets, _met, sig=(mets, pos)))
+
+    out += _call_section("関数/メソッドの呼び出し関係", result.function_calls, pos, needle)
+    out += _graph_section(result.function_calls, kinds, pos, needle)
+
+    kw = [f"{k}: {v}" for k, v in {**result.keywords_in_code, **result.builtins_in_code}.items() if _match(needle, k, v)]
+    if kw or not needle:
+        out.append(_lazy("キーワードと簡易説明", kw, _leaf))
+    return out
+
+def _call_section(title: str, calls: CallGraph, pos: Dict[str, int], needle: str,
+                  keep: Optional[Callable[[str, str], bool]] = None) -> List[_Node]:
+    """呼び出し元ごとに、呼び出し先を1つずつ（同じ先への重複は「×回数」にまとめる）"""
+    calls = CallGraph.of(calls)
+    entries = []
+    for caller in calls:
+        cs = [e for e in calls.callees(caller) if keep is None or keep(caller, e[0])]
+        if keep is not None and not cs: continue
+        if not _match(needle, caller): cs = [e for e in cs if _match(needle, e[0])]
+        if cs or _match(needle, caller): entries.append((caller, cs))
+    if not entries and needle: return []
+
+    def _callee(e) -> _Node:
+        c, n = e
+        return _leaf(c if n == 1 else f"{c} ×{n}", decl=pos.get(c) if c in pos else None, symbol=c if c in pos else None)
+    def _caller(e) -> _Node:
+        caller, cs = e
+        return _lazy(caller, cs, _callee, {ROLE_SYMBOL_NAME: caller, ROLE_DECL_LINE: pos.get(caller, 0)})
+    return [_lazy(title, entries, _caller, sig=(entries, pos))]
+
+def _graph_section(calls: CallGraph, kinds: Dict[str, str], pos: Dict[str, int], needle: str) -> List[_Node]:
+    """呼び出しの輪 / 到達できない定義 / ファンイン・ファンアウト上位（callgraph.analyze_graph）"""
+    g = analyze_graph(calls, kinds)
+    cycles = [c for c in g.cycles if any(_match(needle, n) for n in c)]
+    dead = [n for n in g.unreachable if _match(needle, n)]
+    fan_in = [r for r in g.fan_in if _match(needle, r[0])]
+    fan_out = [r for r in g.fan_out if _match(needle, r[0])]
+
+    def _sym(n: str, text: str) -> _Node:
+        return _leaf(text, decl=pos.get(n) if n in pos else None, symbol=n if n in pos else None)
+    def _cycle(c) -> _Node:
+        return _lazy(f"{len(c)}個: {', '.join(c[:4])}{' …' if len(c) > 4 else ''}", c, lambda n: _sym(n, n))
+    groups = [
+        (f"呼び出しの輪（{len(cycles)}）", cycles, _cycle),
+        (f"到達できない定義（{len(dead)}、入口 {len(g.entries)} から）", dead, lambda n: _sym(n, n)),
+        ("ファンイン上位（呼び出し元 / 回数）", fan_in, lambda r: _sym(r[0], f"{r[0]}  {r[1]} / {r[2]}")),
+        ("ファンアウト上位（呼び出し先 / 回数）", fan_out, lambda r: _sym(r[0], f"{r[0]}  {r[1]} / {r[2]}")),
+    ]
+    groups = [e for e in groups if e[1] or not needle]
+    if not groups: return []
+    return [_lazy("呼び出しグラフの分析", groups, lambda e: _lazy(e[0], e[1], e[2]),
+                  sig=(cycles, dead, fan_in, fan_out, g.entries, pos))]
+
+
+# ---- ProjectResult（複数ファイル）----
+def project_sections(pr, needle: str = "") -> List[_Node]:
+    mods = []
+    for name, info in pr.modules.items():
+        defs = sorted(info.def_positions.items(), key=lambda x: x[1])
+        if not _match(needle, name): defs = [d for d in defs if _match(needle, d[0])]
+        if defs or _match(needle, name): mods.append((name, info, defs))
+
+    def _module(e) -> _Node:
+        name, info, defs = e
+        return _lazy(name + (f"  ※{info.error}" if info.error else ""), defs,
+                     lambda d: _leaf(f"{info.def_kinds.get(d[0], '')} {d[0]} (L{d[1]})",
+                                     decl=d[1], symbol=f"{name}.{d[0]}"))
+    out = []
+    if mods or not needle:
+        out.append(_lazy(f"モジュール（{len(pr.modules)}）", mods, _module))
+    cross = lambda caller, c: pr.module_of.get(c) not in (None, pr.module_of.get(caller, caller.rsplit(".", 1)[0]))
+    locs = {q: 0 for q in pr.locations}
+    out += _call_section("モジュール間の呼び出し", pr.function_calls, locs, needle, cross)
+    out += _graph_section(pr.function_calls, pr.def_kinds, locs, needle)
+    return out
+
+
+class ResultTreeModel(QAbstractItemModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._root = _Node("")
+        self._build: Callable[[str], List[_Node]] = lambda needle: []
+        self.filter_text = ""
+        self._fetching = False
+
+    # ---- 内容の差し替え ----
+    def set_result(self, result):
+        self._reset(lambda needle: result_sections(result, needle))
+
+    def set_project(self, pr):
+        self._reset(lambda needle: project_sections(pr, needle))
+
+    def set_filter(self, text: str):
+        self.filter_text = text.strip().lower()
+        self._reset(self._build)
+
+    def update_result(self, result):
+        """同じファイルの再解析。見出しの並びが同じなら、中身の変わったセクションだけ子を作り直す"""
+        build = lambda needle: result_sections(result, needle)
+        fresh = self._sections(build)
+        if [s.text for s in fresh] != [s.text for s in self._root.kids]:
+            self._reset(build); return
+        self._build = build
+        for sec, new in zip(self._root.kids, fresh):
+            if sec.sig == new.sig: continue
+            index = self.createIndex(sec.row, 0, sec)
+            fetched = bool(sec.kids)
+            if fetched:
+                self.beginRemoveRows(index, 0, len(sec.kids) - 1); sec.kids = []; self.endRemoveRows()
+            sec.count, sec.make, sec.sig = new.count, new.make, new.sig
+            if fetched: self.fetchMore(index)  # 開いていたセクションは開いたまま中身だけ入れ替わる
+
+    def clear(self):
+        self._reset(lambda needle: [])
+
+    def _sections(self, build) -> List[_Node]:
+        secs = build(self.filter_text)
+        for sec in secs:
+            if self.filter_text: sec.text = f"{sec.text}（{sec.count}）"
+        return secs
+
+    def _reset(self, build):
+        self.beginResetModel()
+        self._build = build
+        root = _Node("")
+        for i, sec in enumerate(self._sections(build)):
+            sec.parent, sec.row = root, i
+            root.kids.append(sec)
+        root.count = len(root.kids)
+        self._root = root
+        self.endResetModel()
+
+    def total_rows(self) -> int:
+        """セクション直下の件数の合計（展開の深さを決める目安）"""
+        return sum(s.count for s in self._root.kids)
+
+    # ---- QAbstractItemModel ----
+    def _node(self, index: QModelIndex) -> _Node:
+        return index.internalPointer() if index.isValid() else self._root
+
+    def index(self, row: int, column: int, parent: QModelIndex = QModelIndex()) -> QModelIndex:
+        node = self._node(parent)
+        if column != 0 or not (0 <= row < len(node.kids)): return QModelIndex()
+        return self.createIndex(row, 0, node.kids[row])
+
+    def parent(self, index: QModelIndex) -> QModelIndex:
+        if not index.isValid(): return QModelIndex()
+        p = index.internalPointer().parent
+        if p is None or p is self._root: return QModelIndex()
+        return self.createIndex(p.row, 0, p)
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return len(self._node(parent).kids)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 1
+
+    def hasChildren(self, parent: QModelIndex = QModelIndex()) -> bool:
+        return self._node(parent).count > 0
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        node = self._node(parent)
+        return len(node.kids) < node.count
+
+    def fetchMore(self, parent: QModelIndex):
+        if self._fetching: return  # 挿入通知の中から呼ばれても二重に足さない
+        node = self._node(parent)
+        start = len(node.kids)
+        n = min(FETCH_BATCH, node.count - start)
+        if n <= 0: return
+        batch = [node.make(i) for i in range(start, start + n)]
+        for i, kid in enumerate(batch, start): kid.parent, kid.row = node, i
+        self._fetching = True
+        try:
+            self.beginInsertRows(parent, start, start + n - 1)
+            node.kids.extend(batch)
+            self.endInsertRows()
+        finally:
+            self._fetching = False
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid(): return None
+        node = index.internalPointer()
+        if role == Qt.DisplayRole: return node.text
+        if node.roles: return node.roles.get(role)
+        return None
@@ -0,0 +1,121 @@
+"""
+起動時間の計測（PyCodeDictionary.py --profile-startup）。Qt を使わない（計測される側を重くしないため、ここも軽く）。
+
+子プロセスを `python -X importtime PyCodeDictionary.py --startup-probe` で起動し、
+- 節目: プロセス起動 → main → QApplication → gui の import 完了 → ウィンドウ作成 → show → 最初の描画
+- import ごとの時間（-X importtime の出力を木にしたもの。重い順と、このツール自身のモジュール）
+を表示して SAVE_DIR/trace/startup.json（前回との比較用）と startup_trace.json（Chrome trace_event。Perfetto で開く）に保存する。
+PyInstaller の exe では -X importtime を渡せないので節目だけ測る。
+"""
+import os, sys, json, time
+from typing import Dict, List, Optional, Tuple
+
+ENV_T0 = "PCD_STARTUP_T0"  # 親が子を起動する直前の time.time()
+PROBE_TAG = "PCD_STARTUP "  # 子が節目を書き出す行の頭
+_marks: List[Tuple[str, float]] = []
+
+def mark(name: str):
+    """節目を記録（--startup-probe のときだけ呼ばれる）"""
+    _marks.append((name, time.time()))
+
+def report_probe():
+    """子プロセス: 節目を親の起動時刻からの秒で1行に書き出す"""
+    t0 = float(os.environ.get(ENV_T0) or (_marks[0][1] if _marks else time.time()))
+    sys.stdout.write(PROBE_TAG + json.dumps([(n, t - t0) for n, t in _marks]) + "\n")
+    sys.stdout.flush()
+
+
+# ---- -X importtime の出力 ----
+class _Imp:
+    __slots__ = ("name", "self_us", "cum_us", "kids")
+
+    def __init__(self, name: str, self_us: int, cum_us: int):
+        self.name, self.self_us, self.cum_us, self.kids = name, self_us, cum_us, []
+
+def parse_importtime(text: str) -> List[_Imp]:
+    """
+    `import time: self | cumulative | name` の行（子が親より先、字下げ2つで1段）から木を作り、最上位の import を返す。
+    """
+    pending: Dict[int, List[_Imp]] = {}  # 深さ → 親がまだ出ていない import
+    for line in text.splitlines():
+        if not line.startswith("import time:"): continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit(): continue  # 見出し行
+        raw = parts[2].rstrip()
+        depth = (len(raw) - len(raw.lstrip())) // 2
+        node = _Imp(raw.strip(), int(parts[0]), int(parts[1]))
+        node.kids = pending.pop(depth + 1, [])
+        pending.setdefault(depth, []).append(node)
+    return pending.get(0, [])
+
+def _walk(nodes: List[_Imp]):
+    for n in nodes:
+        yield n
+        yield from _walk(n.kids)
+
+def _trace_events(roots: List[_Imp], marks: List[Tuple[str, float]]):
+    """import の木を順に並べた span（開始時刻は実際の順序どおり、自分の時間は子のあと）と節目の区間"""
+    out = []
+    def lay(n: _Imp, t: int):
+        out.append((n.name, t * 1000, n.cum_us * 1000, "import", {"self_us": n.self_us}))
+        for k in n.kids:
+            lay(k, t); t += k.cum_us
+    t = 0
+    for r in roots:
+        lay(r, t); t += r.cum_us
+    prev = 0.0
+    for name, at in marks:
+        out.append((name, int(prev * 1e9), int((at - prev) * 1e9), "startup", None)); prev = at
+    return out
+
+
+# ---- 親プロセス ----
+OWN_MODULES = ("gui", "processor", "utils", "flowscene", "resultmodel", "symbolindex", "stylecheck", "cache_store",
+               "watcher", "perftrace", "structured", "callgraph")
+
+def profile(script: str, top: int = 15) -> int:
+    import subprocess
+    from perftrace import write_chrome_trace
+    from utils import ensure_save_dir
+    frozen = getattr(sys, "frozen", False)
+    args = [sys.executable] + ([] if frozen else ["-X", "importtime", script]) + ["--startup-probe"]
+    env = dict(os.environ)
+    env[ENV_T0] = repr(time.time())
+    r = subprocess.run(args, capture_output=True, text=True, encoding="utf-8", errors="replace", env=env)
+    line = next((l for l in r.stdout.splitlines() if l.startswith(PROBE_TAG)), None)
+    if line is None:
+        print(f"計測に失敗しました（終了コード {r.returncode}）\n{r.stderr[-2000:]}", file=sys.stderr); return 1
+    marks = [(n, float(t)) for n, t in json.loads(line[len(PROBE_TAG):])]
+    roots = parse_importtime(r.stderr)
+
+    print("節目（プロセス起動から）:")
+    prev = 0.0
+    for name, at in marks:
+        print(f"  {name:14} {at*1000:8.1f}ms  (+{(at-prev)*1000:.1f})"); prev = at
+    res = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "marks": dict(marks), "imports": {}}
+    if roots:
+        total = sum(n.cum_us for n in roots)
+        print(f"\nimport 合計 {total/1000:.1f}ms。最上位の import（累積の重い順）:")
+        for n in sorted(roots, key=lambda n: -n.cum_us)[:top]:
+            print(f"  {n.name:40} {n.cum_us/1000:8.1f}ms")
+        own = {n.name: n for n in _walk(roots) if n.name in OWN_MODULES}
+        print("\nこのツールのモジュール（累積 / 自分）:")
+        for name in OWN_MODULES:
+            if name in own: print(f"  {name:16} {own[name].cum_us/1000:8.1f}ms / {own[name].self_us/1000:.1f}ms")
+        res["imports"] = {n.name: n.cum_us for n in sorted(roots, key=lambda n: -n.cum_us)}
+
+    d = os.path.join(ensure_save_dir(), "trace")
+    os.makedirs(d, exist_ok=True)
+    path = os.path.join(d, "startup.json")
+    before: Optional[dict] = None
+    try:
+        with open(path, "r", encoding="utf-8") as fp: before = json.load(fp)
+    except (OSError, ValueError):
+        pass
+    fp_old = (before or {}).get("marks", {}).get("first_paint")
+    if fp_old is not None and "first_paint" in res["marks"]:
+        print(f"\n最初の描画: 前回 {fp_old*1000:.1f}ms → 今回 {res['marks']['first_paint']*1000:.1f}ms（{before.get('time', '')}）")
+    with open(path, "w", encoding="utf-8") as fp: json.dump(res, fp, ensure_ascii=False, indent=2)
+    write_chrome_trace(_trace_events(roots, marks), os.path.join(d, "startup_trace.json"), {"source": "startup"})
+    print(f"\n→ {path}\n→ {os.path.join(d, 'startup_trace.json')}")
+    return 0
@@ -0,0 +1,133 @@
+"""
+解析結果の機械可読な出力（テキストレポートと並べて出す）。Qt を使わない。
+
+- result_rows: AnalyzeResult → 表ごとの行（タプル）。定義 / 呼び出し（回数つき）/ タグ（直接・呼び出し先から引き継いだもの）/
+  PEP8 / 提案 / 関数ごとの複雑度
+- JsonlSink: 1行1レコードの JSON Lines（{"type": "call", "file": ..., "caller": ..., ...}）
+- SqliteSink: SQLite へ executemany でまとめて挿入（commit は commit_every ファイルごと、索引は最後に作る）
+
+バッチでは親プロセスが1つのシンクを開き、ワーカーから受け取った行を順に書く（ファイルを奪い合わない）。
+
+    sqlite3 out/analysis.sqlite "SELECT callee, SUM(count) FROM calls GROUP BY callee ORDER BY 2 DESC LIMIT 10"
+"""
+import os, re, json, sqlite3
+from typing import Dict, List, Optional, Set, Tuple
+
+from callgraph import propagate_tags
+
+# 表名 → 列（SQLite ではこの前に file_id、JSON Lines では type/file が付く）
+TABLES: Dict[str, Tuple[str, ...]] = {
+    "defs": ("name", "kind", "line"),
+    "calls": ("caller", "callee", "count"),
+    "tags": ("symbol", "tag"),
+    "inherited_tags": ("symbol", "tag", "via"),
+    "style": ("line", "col", "code", "message"),
+    "suggestions": ("text",),
+    "metrics": ("symbol", "cc", "cognitive", "nest", "stmts", "lines"),
+}
+FILE_NAMES = {"jsonl": "analysis.jsonl", "sqlite": "analysis.sqlite"}  # バッチ / 単一ファイル SQLite の出力名
+
+_ENCODE = json.JSONEncoder(ensure_ascii=False).encode  # json.dumps(ensure_ascii=False) は呼ぶたびにエンコーダを作る
+_STYLE_PAT = re.compile(r"^(.*?):(\d+):(\d+):\s*(\S+)\s?(.*)$")
+
+def result_rows(result, pattern_tags: Dict[str, Set[str]]) -> Dict[str, List[tuple]]:
+    """ワーカーから親へ送るのもこの形（タプルのリストなので pickle が軽い）"""
+    pos = result.def_positions
+    style = []
+    for s in result.style_issues:
+        m = _STYLE_PAT.match(s)
+        style.append((int(m.group(2)), int(m.group(3)), m.group(4), m.group(5)) if m else (0, 0, "", s))
+    return dict(
+        defs=[(n, k, pos.get(n, 0)) for n, k in result.def_kinds.items()],
+        calls=list(result.function_calls.edges()),
+        tags=[(sym, t) for sym, ts in pattern_tags.items() for t in sorted(ts)],
+        inherited_tags=[(sym, t, via) for sym, d in propagate_tags(result.function_calls, pattern_tags).items()
+                        for t, via in sorted(d.items())],
+        style=style,
+        suggestions=[(s,) for s in result.refactor_suggestions],
+        metrics=[(n,) + tuple(m) for n, m in result.metrics.items()],
+    )
+
+
+class JsonlSink:
+    """append=True は追記（同じファイルが後から出てきたら、後の "file" レコード以降が新しい結果）"""
+    def __init__(self, path: str, append: bool = False):
+        self.path = path
+        self._fp = open(path, "a" if append else "w", encoding="utf-8", buffering=1 << 20)
+
+    def add(self, file: str, rows: Dict[str, List[tuple]]):
+        f = _ENCODE(file)
+        out = [f'{{"type": "file", "file": {f}}}']
+        for table, cols in TABLES.items():
+            head = f'{{"type": "{table}", "file": {f}, '
+            out.extend(head + _ENCODE(dict(zip(cols, r)))[1:] for r in rows.get(table, ()))
+        self._fp.write("\n".join(out) + "\n")
+
+    def remove(self, file: str):
+        self._fp.write(f'{{"type": "file", "file": {_ENCODE(file)}, "removed": true}}\n')
+
+    def close(self):
+        self._fp.close()
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
+
+
+class SqliteSink:
+    """files(id, path) と TABLES の各表（file_id で紐づけ）。同じパスを再度追加すると前の行を置き換える"""
+    def __init__(self, path: str, commit_every: int = 500):
+        self.path = path
+        self.commit_every = commit_every
+        self._n = 0
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL)")
+        for table, cols in TABLES.items():
+            self.db.execute(f"CREATE TABLE IF NOT EXISTS {table} (file_id INTEGER NOT NULL, {', '.join(cols)})")
+        self._inserts = {t: f"INSERT INTO {t} VALUES (?, {', '.join('?' * len(c))})" for t, c in TABLES.items()}
+
+    def add(self, file: str, rows: Dict[str, List[tuple]]):
+        row = self.db.execute("SELECT id FROM files WHERE path = ?", (file,)).fetchone()
+        if row is None:
+            fid = self.db.execute("INSERT INTO files (path) VALUES (?)", (file,)).lastrowid
+        else:
+            fid = row[0]
+            for table in TABLES: self.db.execute(f"DELETE FROM {table} WHERE file_id = ?", (fid,))
+        for table in TABLES:
+            rs = rows.get(table)
+            if rs: self.db.executemany(self._inserts[table], [(fid,) + r for r in rs])
+        self._n += 1
+        if self._n % self.commit_every == 0: self.db.commit()
+
+    def remove(self, file: str):
+        row = self.db.execute("SELECT id FROM files WHERE path = ?", (file,)).fetchone()
+        if row is None: return
+        for table in TABLES: self.db.execute(f"DELETE FROM {table} WHERE file_id = ?", (row[0],))
+        self.db.execute("DELETE FROM files WHERE id = ?", (row[0],))
+
+    def close(self):
+        # 索引は挿入が済んでから（1行ごとの索引更新を避ける）
+        for table in TABLES:
+            self.db.execute(f"CREATE INDEX IF NOT EXISTS {table}_file ON {table} (file_id)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS calls_callee ON calls (callee)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS defs_name ON defs (name)")
+        self.db.commit(); self.db.close()
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
+
+
+def open_sink(fmt: str, out_dir: str, base: Optional[str] = None, append: bool = False):
+    """
+    fmt: "jsonl" / "sqlite"。base を渡すと単一ファイル用（jsonl は <base>_analysis.jsonl を上書き、
+    sqlite は out_dir/analysis.sqlite に追記・置き換え）。省略時はバッチ用に FILE_NAMES の名前で作り直す
+    （append=True は作り直さずに追記。batch --watch で変わったファイルだけ書き足す）。
+    """
+    if fmt == "jsonl":
+        return JsonlSink(os.path.join(out_dir, f"{base}_analysis.jsonl" if base else FILE_NAMES["jsonl"]), append)
+    if fmt == "sqlite":
+        path = os.path.join(out_dir, FILE_NAMES["sqlite"])
+        if base is None and not append and os.path.exists(path): os.remove(path)
+        return SqliteSink(path)
+    raise ValueError(f"unknown structured format: {fmt}")
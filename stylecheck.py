@@ -0,0 +1,510 @@
+"""
+PEP8/pyflakes チェックのバックエンド。
+
+- check_source: 読み込み済みのソースをプロセス内で pycodestyle + pyflakes にかける
+  （flake8 を毎回起動するコスト＝インタプリタ/プラグイン起動を省く）
+- check_many_flake8: 多数のファイルを1回の `flake8 --jobs N` でまとめてチェック
+- pyflakes_items / pycodestyle_items / format_items: 差分解析用の部品（ファイルの一部だけを pycodestyle にかける）
+- flake_unit / flake_env / pyflakes_units: 差分解析用の pyflakes（変わっていない関数の本体はスタブにして前回の結果を使う）
+
+出力はどちらも flake8 と同じ `path:line:col: CODE msg` 形式。
+"""
+import re, ast, bisect, copy, keyword, subprocess
+from dataclasses import dataclass
+from importlib.util import find_spec
+from typing import Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple
+
+# pycodestyle / pyflakes は最初のチェックで読み込む（起動を軽くするため。ここでは有無だけ調べる）
+HAVE_INPROCESS = find_spec("pycodestyle") is not None and find_spec("pyflakes") is not None
+pycodestyle = None
+_pyflakes = None
+_CollectReport = None
+
+# pyflakes のメッセージクラス → flake8 のコード（flake8.plugins.pyflakes と同じ対応）
+PYFLAKES_CODES = {
+    "UnusedImport": "F401", "ImportShadowedByLoopVar": "F402", "ImportStarUsed": "F403",
+    "LateFutureImport": "F404", "ImportStarUsage": "F405", "ImportStarNotPermitted": "F406",
+    "FutureFeatureNotDefined": "F407",
+    "PercentFormatInvalidFormat": "F501", "PercentFormatExpectedMapping": "F502",
+    "PercentFormatExpectedSequence": "F503", "PercentFormatExtraNamedArguments": "F504",
+    "PercentFormatMissingArgument": "F505", "PercentFormatMixedPositionalAndNamed": "F506",
+    "PercentFormatPositionalCountMismatch": "F507", "PercentFormatStarRequiresSequence": "F508",
+    "PercentFormatUnsupportedFormatCharacter": "F509",
+    "StringDotFormatInvalidFormat": "F521", "StringDotFormatExtraNamedArguments": "F522",
+    "StringDotFormatExtraPositionalArguments": "F523", "StringDotFormatMissingArgument": "F524",
+    "StringDotFormatMixingAutomatic": "F525", "FStringMissingPlaceholders": "F541",
+    "TStringMissingPlaceholders": "F542",
+    "MultiValueRepeatedKeyLiteral": "F601", "MultiValueRepeatedKeyVariable": "F602",
+    "TooManyExpressionsInStarredAssignment": "F621", "TwoStarredExpressions": "F622",
+    "AssertTuple": "F631", "IsLiteral": "F632", "InvalidPrintSyntax": "F633", "IfTuple": "F634",
+    "BreakOutsideLoop": "F701", "ContinueOutsideLoop": "F702", "YieldOutsideFunction": "F704",
+    "ReturnOutsideFunction": "F706", "DefaultExceptNotLast": "F707",
+    "LazyImportNotAtModuleScope": "F708", "LazyImportStarNotPermitted": "F709",
+    "DoctestSyntaxError": "F721", "ForwardAnnotationSyntaxError": "F722",
+    "RedefinedWhileUnused": "F811", "UndefinedName": "F821", "UndefinedExport": "F822",
+    "UndefinedLocal": "F823", "UnusedIndirectAssignment": "F824", "DuplicateArgument": "F831",
+    "UnusedVariable": "F841", "UnusedAnnotation": "F842", "EagerUseOfLazyImport": "F851",
+    "RaiseNotImplemented": "F901",
+}
+
+def _load():
+    """pycodestyle / pyflakes を読み込み、報告クラスを作る（2回目からは何もしない）"""
+    global pycodestyle, _pyflakes, _CollectReport
+    if pycodestyle is not None: return
+    import pycodestyle as pcs
+    import pyflakes.checker as pf
+
+    class _Report(pcs.BaseReport):
+        def __init__(self, options):
+            super().__init__(options)
+            self.items: List[Tuple[int, int, int, str]] = []
+        def error(self, line_number, offset, text, check):
+            code = super().error(line_number, offset, text, check)
+            if code: self.items.append((line_number, offset + 1, 1, text))
+            return code
+    _pyflakes, _CollectReport = pf, _Report
+    pycodestyle = pcs  # 最後に入れる（ほかのスレッドは揃ってから使う）
+
+def versions() -> str:
+    if not HAVE_INPROCESS: return "none"
+    _load()
+    import pyflakes
+    return f"pycodestyle={pycodestyle.__version__},pyflakes={pyflakes.__version__}"
+
+_STYLE = None
+def _style_guide():
+    # flake8 の既定（max-line-length=79、E121,E123,... を無視）と同じ設定。設定ファイルは読まない
+    global _STYLE
+    if _STYLE is None:
+        _load()
+        _STYLE = pycodestyle.StyleGuide(quiet=True, reporter=_CollectReport, config_file=False)
+    return _STYLE
+
+Item = Tuple[int, int, int, str]  # (行, 列, 優先: F=0/E,W=1, "CODE msg")
+
+def pyflakes_items(path: str, tree: ast.AST) -> List[Item]:
+    _load()
+    items = []
+    for m in _pyflakes.Checker(tree, filename=path).messages:
+        code_ = PYFLAKES_CODES.get(type(m).__name__, "F999")
+        items.append((m.lineno, m.col + 1, 0, f"{code_} {m.message % m.message_args}"))
+    return items
+
+E402_START = (False, False)  # (docstring を見た, import 以外のコードを見た)
+# E402 の状態を作る1行（pycodestyle の内部状態は触らず、その状態になる行を先頭に足してチェックする）
+_E402_SEED = {(True, False): '""\n', (False, True): "0\n", (True, True): "0\n"}
+# pycodestyle.module_imports_on_top_of_file が import の間に許す文（pycodestyle 2.x と同じ）
+_E402_ALLOWED = ("try", "except", "else", "finally", "with", "if", "elif")
+_STRING_LITERAL = re.compile(r"""^[uUbBrR]?['"]""")  # f"" は文字列リテラル扱いしない
+
+def pycodestyle_items(path: str, lines: List[str], e402: Tuple[bool, bool] = E402_START) -> List[Item]:
+    """
+    lines（行末つき）だけをチェック。行番号は lines の先頭が 1。
+    ファイルの途中から始めるときは、そこまでの E402 の状態（e402_step で求めたもの）を渡す。
+    途中から始めるときの lines の先頭は前の区間（結果を使わない文脈）なので、足した1行はそこにしか効かない。
+    """
+    sg = _style_guide()
+    rep = _CollectReport(sg.options)
+    seed = _E402_SEED.get(e402)
+    pycodestyle.Checker(path, lines=[seed] + lines if seed else lines, options=sg.options, report=rep).check_all()
+    if not seed: return rep.items
+    return [(ln - 1, col, pri, msg) for ln, col, pri, msg in rep.items if ln > 1]
+
+def e402_step(state: Tuple[bool, bool], text: str) -> Tuple[bool, bool]:
+    """
+    トップレベルの文1つ（text: 最初の論理行の物理行）で E402 の状態を進める。
+    pycodestyle.module_imports_on_top_of_file と同じ判定。
+    """
+    _load()
+    doc, non = state
+    line = text.strip()
+    if non or not line or pycodestyle.noqa(line): return state
+    if line.startswith(("import ", "from ", "lazy import ", "lazy from ")): return state
+    if pycodestyle.DUNDER_REGEX.match(line) or line.startswith(_E402_ALLOWED): return state
+    if _STRING_LITERAL.match(line): return (True, doc)  # 2つ目の文字列リテラルからはコード扱い
+    return (doc, True)
+
+def format_items(path: str, items: List[Item]) -> List[str]:
+    items = sorted(items, key=lambda x: (x[0], x[1], x[2]))  # flake8 と同じく (行, 列) 順、同位置は pyflakes が先
+    return [f"{path}:{ln}:{col}: {msg}" for ln, col, _, msg in items]
+
+# ========= pyflakes の差分実行（processor の差分解析で使う） =========
+# pyflakes は関数の本体をモジュール直下を見終わってから見る。本体の結果は「本体の中身」と「本体に出てくる名前の
+# モジュールでの束縛」だけで決まるので、区間（トップレベルの文のまとまり）が前回と同じで、その名前の束縛も同じ本体は
+# 前回のメッセージを使い、本体を「モジュールの名前を読む式だけ」（スタブ）にして pyflakes にかける。
+# モジュール直下・クラス本体・関数のシグネチャ・変わった区間はそのまま渡すので、F401 / F811 などは全体と同じに出る。
+PYFLAKES_LINE_REFS = ("F402", "F811", "F823", "F851")  # ほかの行の番号を文に含む（相対行で持ち越せない）
+_BLOCKS = ("body", "orelse", "finalbody", "handlers", "cases")
+_FUNCS = (ast.FunctionDef, ast.AsyncFunctionDef)
+
+@dataclass
+class FlakeBody:
+    """一番外側の関数（モジュール直下/クラス直下/if などの中の def）の本体1つ"""
+    first: int              # 本体の行の範囲（区間の先頭からの相対。デコレータ込みの最初の文から def の最後まで）
+    last: int
+    loads: FrozenSet[str]   # 本体で読む名前
+    own: FrozenSet[str]     # 本体で束縛する名前 + 文字列（注釈かもしれない）の中の名前
+    names: Tuple[str, ...]  # 本体に出てくる名前すべて（ソート済み）
+    ok: bool                # global/nonlocal がなく、本体がシグネチャより後の行から始まる（メッセージを本体で切り分けられる）
+    items: Optional[List[Item]] = None  # 前回のメッセージ（本体の範囲の相対行）。ほかの行を指すメッセージがあれば None
+    env: Optional[tuple] = None         # そのときの names の束縛
+
+@dataclass
+class FlakeUnit:
+    """区間1つ分の、pyflakes の差分実行に使う情報"""
+    events: Dict[str, tuple]  # 名前 → モジュールのスコープへの束縛（種類と、囲む if/try などの並び）
+    globs: FrozenSet[str]     # 関数/クラスの中の global/nonlocal（モジュールの名前になりうる）
+    futures: FrozenSet[str]
+    star: bool                # from x import *（どの名前が使われたかが全体で決まる）
+    bodies: List[FlakeBody]
+    stmts: Optional[List[ast.stmt]] = None  # 前回 pyflakes に渡した文（スタブ入り）と、そのスタブ・先頭行
+    stubs: Tuple[int, ...] = ()
+    at: int = 0
+    skel: Optional[str] = None  # _skeleton
+
+def _string_names(s: str, depth: int = 0) -> Set[str]:
+    """文字列を注釈として読んだときに出てくる名前（pyflakes は注釈の文字列を ast.parse する）"""
+    if s.isidentifier(): return set() if keyword.iskeyword(s) else {s}
+    if not _IDENT.search(s): return set()
+    try:
+        tree = ast.parse(s)
+    except Exception:  # SyntaxError / ValueError / RecursionError
+        return set()
+    out = set()
+    for n in ast.walk(tree):
+        if isinstance(n, ast.Name): out.add(n.id)
+        elif isinstance(n, ast.Constant) and isinstance(n.value, str) and depth < 2: out |= _string_names(n.value, depth + 1)
+    return out
+_IDENT = re.compile(r"[^\W\d]")
+
+def _flake_body(fn, start: int, globs: Set[str]) -> FlakeBody:
+    loads, binds, strs = set(), set(), set()
+    glob = False
+    stack = list(fn.body)
+    while stack:
+        n = stack.pop()
+        t = type(n)
+        if t is ast.Name:
+            (loads if isinstance(n.ctx, ast.Load) else binds).add(n.id); continue
+        if t is ast.Expr and isinstance(n.value, ast.Constant): continue  # docstring など（注釈にはならない）
+        if t is ast.Constant:
+            if isinstance(n.value, str): strs |= _string_names(n.value)
+            continue
+        if t is ast.Global or t is ast.Nonlocal:
+            glob = True; globs.update(n.names)
+        elif t in _FUNCS or t is ast.ClassDef: binds.add(n.name)
+        elif t is ast.arg: binds.add(n.arg)
+        elif t is ast.alias: binds.add(n.asname or n.name.split(".")[0])
+        elif t is ast.ExceptHandler or t is ast.MatchAs or t is ast.MatchStar:
+            if n.name: binds.add(n.name)
+        elif t is ast.MatchMapping and n.rest: binds.add(n.rest)
+        stack.extend(ast.iter_child_nodes(n))
+    a = fn.args
+    sig = fn.decorator_list + a.posonlyargs + a.args + a.kwonlyargs + [a.vararg, a.kwarg, fn.returns] + a.defaults + \
+        a.kw_defaults + getattr(fn, "type_params", [])
+    sig_end = max([fn.lineno] + [n.end_lineno for n in sig if n is not None])
+    b0 = fn.body[0]
+    first = min([b0.lineno] + [d.lineno for d in getattr(b0, "decorator_list", ())])
+    return FlakeBody(first - start, fn.end_lineno - start, frozenset(loads), frozenset(binds | strs),
+                     tuple(sorted(loads | binds | strs)), not glob and first > sig_end)
+
+class _FlakeScan:
+    """区間の文から FlakeUnit を作る"""
+    def __init__(self, start: int):
+        self.start = start
+        self.events: Dict[str, list] = {}
+        self.globs: Set[str] = set()
+        self.futures: Set[str] = set()
+        self.star = False
+        self.bodies: List[FlakeBody] = []
+
+    def add(self, name: str, kind: tuple, path: tuple):
+        self.events.setdefault(name, []).append(kind + (path,))
+
+    def stmt(self, st: ast.stmt, path: tuple, module: bool):
+        """module: モジュールのスコープか（False はクラス本体）"""
+        kind = type(st).__name__
+        if isinstance(st, _FUNCS) or isinstance(st, ast.ClassDef):
+            if module: self.add(st.name, (kind,), path)
+            head = [f for f, v in ast.iter_fields(st) if f != "body" and isinstance(v, (ast.AST, list))]
+            self.exprs([getattr(st, f) for f in head], kind, path, module)
+            if isinstance(st, ast.ClassDef):
+                for x in st.body: self.stmt(x, path + ((kind, "body"),), False)
+            else:
+                self.bodies.append(_flake_body(st, self.start, self.globs))
+            return
+        if isinstance(st, (ast.Import, ast.ImportFrom)):
+            for a in st.names:
+                if a.name == "*": self.star = True; continue
+                if isinstance(st, ast.ImportFrom) and st.module == "__future__": self.futures.add(a.name)
+                if not module: continue
+                if isinstance(st, ast.Import): self.add(a.asname or a.name.split(".")[0], (kind, a.name, a.asname), path)
+                else: self.add(a.asname or a.name, (kind, st.module, st.level, a.name, a.asname), path)
+            return
+        if isinstance(st, (ast.Global, ast.Nonlocal)):
+            if not module: self.globs.update(st.names)  # モジュール直下の global は pyflakes が無視する
+            return
+        if isinstance(st, ast.AnnAssign) and st.value is None: kind = "Annotation"
+        self.exprs([v for f, v in ast.iter_fields(st) if f not in _BLOCKS], kind, path, module)
+        for f in _BLOCKS:
+            sub = path + ((kind, f),)
+            for x in getattr(st, f, ()):
+                if isinstance(x, ast.stmt): self.stmt(x, sub, module); continue
+                if isinstance(x, ast.ExceptHandler) and x.name and module: self.add(x.name, ("ExceptHandler",), sub)
+                self.exprs([v for g, v in ast.iter_fields(x) if g != "body"], type(x).__name__, sub, module)
+                for y in x.body: self.stmt(y, sub, module)
+
+    def exprs(self, nodes: list, kind: str, path: tuple, module: bool):
+        """式の中の束縛（代入先・:=・match の捕捉）。lambda の本体と内包表記の変数はそれぞれのスコープなので見ない"""
+        stack = [n for v in nodes for n in (v if isinstance(v, list) else [v]) if isinstance(n, ast.AST)]
+        while stack:
+            n = stack.pop()
+            t = type(n)
+            if t is ast.Name:
+                if module and not isinstance(n.ctx, ast.Load): self.add(n.id, (kind, type(n.ctx).__name__), path)
+                continue
+            if t is ast.Lambda: stack.append(n.args); continue
+            if t is ast.comprehension: stack.append(n.iter); stack.extend(n.ifs); continue
+            if (t is ast.MatchAs or t is ast.MatchStar) and n.name and module: self.add(n.name, ("match",), path)
+            elif t is ast.MatchMapping and n.rest and module: self.add(n.rest, ("match",), path)
+            stack.extend(ast.iter_child_nodes(n))
+
+def flake_unit(stmts: List[ast.stmt], start: int) -> FlakeUnit:
+    """区間（start 行から始まるトップレベルの文）の FlakeUnit"""
+    sc = _FlakeScan(start)
+    for st in stmts: sc.stmt(st, (), True)
+    return FlakeUnit({k: tuple(v) for k, v in sc.events.items()}, frozenset(sc.globs), frozenset(sc.futures),
+                     sc.star, sc.bodies)
+
+def flake_env(units: Iterable[FlakeUnit]) -> Tuple[Dict[str, tuple], FrozenSet[str], bool]:
+    """(名前 → ファイル全体でのモジュールのスコープへの束縛の並び, __future__ の機能, import * があるか)"""
+    env: Dict[str, tuple] = {}
+    futures: Set[str] = set()
+    star = False
+    for u in units:
+        for k, evs in u.events.items(): env[k] = env.get(k, ()) + evs
+        for k in u.globs: env[k] = env.get(k, ()) + (("global",),)
+        futures |= u.futures; star = star or u.star
+    return env, frozenset(futures), star
+
+def _stub_ok(b: FlakeBody, env: Dict[str, tuple], same: bool) -> bool:
+    return b.ok and b.items is not None and env.keys().isdisjoint(b.own) and \
+        (same or b.env == tuple(env.get(k) for k in b.names))
+
+def _outer_defs(stmts: list) -> Iterator:
+    """一番外側の関数（FlakeUnit.bodies と同じ順）"""
+    for st in stmts:
+        if isinstance(st, _FUNCS): yield st; continue
+        for f in _BLOCKS:
+            for x in getattr(st, f, ()):
+                yield from _outer_defs([x] if isinstance(x, ast.stmt) else x.body)
+
+def _with_stubs(st, stubs: Dict[int, list]):
+    """st のうち stubs（id(def) → 本体）の関数の本体だけ差し替えたもの（ほかのノードは共有）"""
+    body = stubs.get(id(st))
+    if body is not None:
+        c = copy.copy(st); c.body = body
+        return c
+    if isinstance(st, _FUNCS): return st
+    c = None
+    for f in _BLOCKS:
+        xs = getattr(st, f, None)
+        if not xs: continue
+        ys = [_with_stubs(x, stubs) for x in xs]
+        if any(y is not x for x, y in zip(xs, ys)):
+            if c is None: c = copy.copy(st)
+            setattr(c, f, ys)
+    return c or st
+
+def _reduce(stmts: List[ast.stmt], u: FlakeUnit, stub: Tuple[int, ...], env: Dict[str, tuple]) -> List[ast.stmt]:
+    if not stub: return list(stmts)
+    todo = {}
+    for k, fn in enumerate(_outer_defs(stmts)):
+        if k not in stub: continue
+        b0 = fn.body[0]
+        pos = dict(lineno=b0.lineno, col_offset=b0.col_offset, end_lineno=b0.lineno, end_col_offset=b0.col_offset)
+        todo[id(fn)] = [ast.Expr(ast.Name(n, ast.Load(), **pos), **pos) for n in sorted(u.bodies[k].loads & env.keys())] \
+            or [ast.Pass(**pos)]
+    return [_with_stubs(st, todo) for st in stmts]
+
+def _body_shift(u: FlakeUnit, rel: int) -> int:
+    """区間の先頭からの相対行 rel より前にある本体の行数（本体を1行に縮めたときに詰まる分）"""
+    return sum(b.last - b.first for b in u.bodies if b.last < rel)
+
+def _skeleton(u: FlakeUnit, stmts: List[ast.stmt], start: int) -> str:
+    """
+    本体を除いた文の形と位置。pyflakes のモジュール直下での処理はこれで決まる。
+    位置は区間の先頭からの相対で、本体をそれぞれ1行に縮めたもの（前のメソッドの行数が変わっても同じ）
+    """
+    if u.skel is None:
+        bare = [_with_stubs(st, {id(fn): [] for fn in _outer_defs(stmts)}) for st in stmts]
+        pos = [(n.lineno - start - _body_shift(u, n.lineno - start), n.col_offset)
+               for st in bare for n in ast.walk(st) if hasattr(n, "col_offset")]
+        firsts = [b.first - _body_shift(u, b.first) for b in u.bodies]
+        u.skel = ast.dump(ast.Module(body=bare, type_ignores=[])) + repr(pos) + repr(firsts)
+    return u.skel
+
+def _unit_stmts(i: int, start: int, u: FlakeUnit, parse: Callable[[int], List[ast.stmt]], env: Dict[str, tuple],
+                same: bool, srcs: Dict[int, List[ast.stmt]]) -> Tuple[List[ast.stmt], Tuple[int, ...]]:
+    """pyflakes に渡す文と、スタブにした本体。srcs にある区間はそのまま"""
+    if i in srcs: return srcs[i], ()
+    stub = tuple(k for k, b in enumerate(u.bodies) if _stub_ok(b, env, same))
+    if u.stmts is None or u.stubs != stub:
+        u.stmts, u.stubs, u.at = _reduce(parse(i), u, stub, env), stub, start
+    elif u.at != start:
+        for st in u.stmts: ast.increment_lineno(st, start - u.at)
+        u.at = start
+    return u.stmts, stub
+
+def _body_items(segs: List[Tuple[int, FlakeUnit]], items: List[Item]) -> Dict[Tuple[int, int], List[Item]]:
+    """メッセージを (区間, 本体) に振り分ける（本体の外のものは (区間, -1)）"""
+    starts = [s for s, _ in segs]
+    out: Dict[Tuple[int, int], List[Item]] = {}
+    for it in items:
+        i = bisect.bisect_right(starts, it[0]) - 1
+        k = -1
+        if i >= 0:
+            start, u = segs[i]
+            k = bisect.bisect_right([b.first for b in u.bodies], it[0] - start) - 1
+            if k >= 0 and it[0] - start > u.bodies[k].last: k = -1
+        out.setdefault((i, k), []).append(it)
+    return out
+
+def _keep(b: FlakeBody, start: int, its: List[Item], env: Dict[str, tuple]):
+    """本体をそのまま見た結果を次回のために控える"""
+    if b.ok and not any(msg.startswith(PYFLAKES_LINE_REFS) for _, _, _, msg in its):
+        b.items = [(ln - start, col, pri, msg) for ln, col, pri, msg in its]
+        b.env = tuple(env.get(n) for n in b.names)
+    else:
+        b.items = b.env = None
+
+def _same_use(a: FlakeBody, b: FlakeBody, env: Dict[str, tuple]) -> bool:
+    """本体を差し替えても、モジュール直下の束縛の使われ方（F401 など）と、ほかの行を指すメッセージが変わらない"""
+    mod = env.keys()
+    return a.ok and b.ok and mod.isdisjoint(a.own) and mod.isdisjoint(b.own) and a.loads & mod == b.loads & mod
+
+_LINE_REF = re.compile(r"line (\d+)")
+
+def _pyflakes_patch(path: str, segs: List[Tuple[int, FlakeUnit]], prev: Tuple[List[Tuple[int, FlakeUnit]], List[Item]],
+                    parse: Callable[[int], List[ast.stmt]], full: Set[int], env: Dict[str, tuple]) -> Optional[List[Item]]:
+    """
+    import やトップレベルの名前（env）が前回と同じで、変わった区間が関数の本体の中だけ（本体の外の形と位置が同じ、
+    本体が読むモジュールの名前も同じ）なら、前回のメッセージを行をずらして使い、変わった本体だけを pyflakes にかける。
+    そのときは変わった区間と、本体に出てくる名前を束縛する区間だけのモジュールにする。当てはまらなければ None
+    """
+    old, old_items = prev
+    if len(old) != len(segs) or any(u is not old[i][1] for i, (_, u) in enumerate(segs) if i not in full): return None
+    for i in full:
+        u, o = segs[i][1], old[i][1]
+        if o.stmts is None or len(u.bodies) != len(o.bodies): return None
+        if _skeleton(u, parse(i), segs[i][0]) != _skeleton(o, o.stmts, o.at): return None
+        if not all(_same_use(a, b, env) for a, b in zip(u.bodies, o.bodies)): return None
+    old_starts = [s for s, _ in old]
+    def moved(ln: int) -> Optional[int]:
+        j = bisect.bisect_right(old_starts, ln) - 1
+        rel = ln - old_starts[j]
+        if j in full:
+            o = old[j][1]
+            if any(b.first <= rel <= b.last for b in o.bodies): return None
+            rel += sum((b.last - b.first) - (a.last - a.first) for a, b in zip(o.bodies, segs[j][1].bodies) if a.last < rel)
+        return segs[j][0] + rel
+    out: List[Item] = []
+    for ln, col, pri, msg in old_items:
+        new_ln = moved(ln)
+        if new_ln is None: continue  # 変わった本体の中（見直す）
+        if msg.startswith(PYFLAKES_LINE_REFS):
+            m = _LINE_REF.search(msg)
+            ref = moved(int(m.group(1))) if m else None
+            if ref is None: return None
+            msg = msg[:m.start(1)] + str(ref) + msg[m.end(1):]
+        out.append((new_ln, col, pri, msg))
+
+    names = set().union(*(b.names for i in full for b in segs[i][1].bodies))
+    body: List[ast.stmt] = []
+    srcs = {i: parse(i) for i in full}
+    for i, (start, u) in enumerate(segs):
+        if i in full or not names.isdisjoint(u.events) or not names.isdisjoint(u.globs):
+            body.extend(_unit_stmts(i, start, u, parse, env, True, srcs)[0])
+    got = _body_items(segs, pyflakes_items(path, ast.Module(body=body, type_ignores=[])))
+    for i in full:
+        start, u = segs[i]
+        for k, b in enumerate(u.bodies):
+            its = got.get((i, k), [])
+            if any(msg.startswith(PYFLAKES_LINE_REFS) for _, _, _, msg in its): return None
+            _keep(b, start, its, env)
+            out.extend(its)
+        _reset_stmts(u, srcs[i], start, env)
+    return out
+
+def _reset_stmts(u: FlakeUnit, stmts: List[ast.stmt], start: int, env: Dict[str, tuple]):
+    """次回のためにスタブを入れておく"""
+    nxt = tuple(k for k, b in enumerate(u.bodies) if _stub_ok(b, env, True))
+    u.stmts, u.stubs, u.at = _reduce(stmts, u, nxt, env), nxt, start
+
+def pyflakes_units(path: str, segs: List[Tuple[int, FlakeUnit]], parse: Callable[[int], List[ast.stmt]],
+                   full: Set[int], env: Dict[str, tuple], same: bool,
+                   prev: Optional[Tuple[List[Tuple[int, FlakeUnit]], List[Item]]] = None) -> Tuple[List[Item], int]:
+    """
+    segs: ファイル全体の (先頭行, FlakeUnit)。full の区間（変わったもの）は parse(i) の文をそのまま、ほかは前回の
+    文（スタブ入り）を先頭行に合わせて渡す。same: env が前回と同じか。prev: 前回の (segs, メッセージ)。
+    env の名前の束縛が前回と変わった本体、スタブの入れ方が変わる区間は parse(i) からやり直す。
+    (ファイル全体を pyflakes にかけたときと同じメッセージ, 前回の結果を使った本体の数)
+    """
+    _load()
+    if same and prev is not None:
+        out = _pyflakes_patch(path, segs, prev, parse, full, env)
+        if out is not None: return out, sum(len(u.bodies) for i, (_, u) in enumerate(segs) if i not in full)
+    body: List[ast.stmt] = []
+    plan: List[Tuple[int, ...]] = []
+    srcs = {i: parse(i) for i in full}
+    for i, (start, u) in enumerate(segs):
+        stmts, stub = _unit_stmts(i, start, u, parse, env, same, srcs)
+        body.extend(stmts); plan.append(stub)
+    got = _body_items(segs, pyflakes_items(path, ast.Module(body=body, type_ignores=[])))
+
+    out: List[Item] = []
+    stubbed = 0
+    for i, ((start, u), stub) in enumerate(zip(segs, plan)):
+        out.extend(got.get((i, -1), ()))
+        for k, b in enumerate(u.bodies):
+            if k in stub:  # スタブの中のメッセージは捨てて、前回の結果を使う
+                out.extend((start + ln, col, pri, msg) for ln, col, pri, msg in b.items); stubbed += 1
+            else:
+                its = got.get((i, k), [])
+                _keep(b, start, its, env); out.extend(its)
+        if i in srcs: _reset_stmts(u, srcs[i], start, env)
+    out.extend(got.get((-1, -1), ()))
+    return out, stubbed
+
+def check_source(path: str, code: str, tree: Optional[ast.AST] = None) -> List[str]:
+    """path は表示用（読み込みはしない）。tree を渡すと pyflakes 用の ast.parse を省略"""
+    if tree is None:
+        try:
+            tree = ast.parse(code, filename=path)
+        except SyntaxError as e:
+            return [f"{path}:{e.lineno or 1}:{(e.offset or 1)}: E999 SyntaxError: {e.msg}"]
+    return format_items(path, pyflakes_items(path, tree) + pycodestyle_items(path, code.splitlines(True)))
+
+_LINE_PAT = re.compile(r"^(.*?):(\d+):(\d+): ")
+FLAKE8_MISSING = "flake8が見つかりませんでした。インストールされているか確認してください。"
+
+def check_many_flake8(paths: List[str], jobs: int = 0, chunk: int = 200,
+                      timeout: Optional[float] = None) -> Dict[str, List[str]]:
+    """
+    flake8 を `--jobs` 付きでまとめて実行し、パスごとに振り分ける。
+    コマンドライン長の制限を避けるため chunk 件ずつ起動（起動回数は件数/chunk 回）。
+    起動できない/timeout 秒を超えた回のファイルは、processor.perform_style_check と同じ1行（FLAKE8_MISSING）になる。
+    """
+    out: Dict[str, List[str]] = {p: [] for p in paths}
+    for i in range(0, len(paths), chunk):
+        part = paths[i:i+chunk]
+        args = ["flake8", f"--jobs={jobs}" if jobs else "--jobs=auto"] + part
+        try:
+            r = subprocess.run(args, capture_output=True, text=True, encoding="utf-8", timeout=timeout)
+        except (OSError, subprocess.TimeoutExpired):  # FileNotFoundError は OSError の一種
+            for p in part: out[p] = [FLAKE8_MISSING]
+            continue
+        for line in r.stdout.splitlines():
+            m = _LINE_PAT.match(line)
+            if m and m.group(1) in out: out[m.group(1)].append(line)
+    return out
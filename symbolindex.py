@@ -0,0 +1,126 @@
+"""
+「シンボルへ移動」（Ctrl+P）用の索引。Qt を使わない。
+
+作成時に1回だけ:
+- 名前 / 末尾の名前（Class.method → method）/ 頭文字（generate_flowchart_image → gfi）の各ソート済みリスト
+- 3文字組（トライグラム）→ シンボル番号のリスト
+- 1文字目 → シンボル番号（短い名前順）と、名前に含まれる文字のビットマスク（飛び飛び一致用）
+を作り、検索は 前方一致（bisect）→ 頭文字 → 部分一致（一番短いトライグラムのリストだけを照合）
+→ 飛び飛び一致（候補数に上限、マスクと正規表現で足切りしてから採点）の順に、上位 limit 件が埋まった段階で打ち切る。
+"""
+import re, bisect, heapq
+from collections import defaultdict
+from functools import lru_cache, reduce
+from operator import or_
+from typing import Dict, Iterable, List, Set, Tuple
+
+_WORD = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+
+@lru_cache(maxsize=65536)
+def _part_acronym(part: str) -> str:
+    return "".join(w[0] for w in _WORD.findall(part)).lower()
+
+def _acronym(name: str) -> str:
+    return "".join(_part_acronym(p) for p in name.split("."))
+
+def _trigrams(s: str) -> Set[Tuple[str, str, str]]:
+    return set(zip(s, s[1:], s[2:]))
+
+_BIT = {chr(c): 1 << (c & 63) for c in range(128)}
+
+def _mask(s: str) -> int:
+    return reduce(or_, [_BIT.get(ch, 1 << 63) for ch in set(s)], 0)
+
+
+class SymbolIndex:
+    FUZZY_BUDGET = 1500  # 飛び飛び一致で調べる候補の上限
+
+    def __init__(self, entries: Iterable[Tuple[str, str, int]]):
+        """entries: (名前, 種別, 行)。名前は一意（修飾名）"""
+        self.names: List[str] = []
+        self.kinds: List[str] = []
+        self.lines: List[int] = []
+        for name, kind, line in entries:
+            self.names.append(name); self.kinds.append(kind); self.lines.append(line)
+        self._lower = [n.lower() for n in self.names]
+        self._by_name = sorted((s, i) for i, s in enumerate(self._lower))
+        self._by_tail = sorted((s.rsplit(".", 1)[-1], i) for i, s in enumerate(self._lower))
+        self._by_acro = sorted({(a, i) for i, n in enumerate(self.names)
+                                for a in (_acronym(n), _part_acronym(n.rsplit(".", 1)[-1]))})
+        self._mask = [_mask(s) for s in self._lower]
+        self._first: Dict[str, List[int]] = defaultdict(list)
+        for i in sorted(range(len(self._lower)), key=lambda i: len(self._lower[i])):
+            s = self._lower[i]; t = s.rsplit(".", 1)[-1]
+            self._first[t[:1]].append(i)
+            if s[:1] != t[:1]: self._first[s[:1]].append(i)
+        tri: Dict[Tuple[str, str, str], List[int]] = defaultdict(list)
+        for i, s in enumerate(self._lower):
+            for t in _trigrams(s): tri[t].append(i)  # ここが作成時間の大半（100k 件で約1秒）
+        self._tri = dict(tri)
+        self._bi: Dict[str, List[int]] = {}  # 2文字の検索用（短い名前順）。使われた2文字だけ作る
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @classmethod
+    def from_result(cls, def_positions: Dict[str, int], def_kinds: Dict[str, str]) -> "SymbolIndex":
+        return cls((n, k, def_positions.get(n, 0)) for n, k in def_kinds.items()
+                   if k in ("class", "method", "function"))
+
+    @staticmethod
+    def _prefixed(sorted_list: List[Tuple[str, int]], q: str, limit: int) -> List[int]:
+        out = []
+        k = bisect.bisect_left(sorted_list, (q, -1))
+        while k < len(sorted_list) and len(out) < limit and sorted_list[k][0].startswith(q):
+            out.append(sorted_list[k][1]); k += 1
+        return out
+
+    def search(self, query: str, limit: int = 50) -> List[int]:
+        """順位順のシンボル番号"""
+        q = query.strip().lower()
+        if not q: return []
+        seen: Set[int] = set()
+        out: List[int] = []
+
+        def _take(ids, key=None):
+            if key is not None: ids = heapq.nsmallest(limit - len(out), set(ids) - seen, key=key)
+            for i in ids:
+                if len(out) >= limit: return
+                if i not in seen: seen.add(i); out.append(i)
+
+        lo = self._lower
+        short = lambda i: (len(lo[i]), lo[i])
+        # 1) 末尾の名前 / 修飾名の前方一致（短い順）
+        _take(self._prefixed(self._by_tail, q, limit * 4) + self._prefixed(self._by_name, q, limit * 4), key=short)
+        if len(out) >= limit: return out
+        # 2) 頭文字（gfi → generate_flowchart_image）
+        _take(self._prefixed(self._by_acro, q, limit * 4), key=short)
+        if len(out) >= limit: return out
+        # 3) 部分一致
+        if len(q) >= 3:
+            cand = min((self._tri.get(t, ()) for t in _trigrams(q)), key=len)
+            _take((i for i in cand if q in lo[i]), key=lambda i: (lo[i].find(q), len(lo[i])))
+        elif len(q) == 2:
+            _take(self._bigram(q))
+        else:
+            _take((i for _, i in self._by_name if q in lo[i]), key=None)
+        if len(out) >= limit or len(q) < 2: return out
+        # 4) 飛び飛び一致（名前か末尾の名前が同じ1文字目で始まるものを短い順に、上限付きで）
+        qm, masks = _mask(q), self._mask
+        search = re.compile(re.escape(q[0]) + "".join(f"[^{re.escape(c)}]*{re.escape(c)}" for c in q[1:])).search
+        scored = []
+        for i in [i for i in self._first.get(q[0], [])[:self.FUZZY_BUDGET] if masks[i] & qm == qm]:
+            m = search(lo[i])  # 左から貪欲に取った一致の幅 = 飛び幅の合計 + len(q)
+            if m: scored.append((m.end() - m.start(), len(lo[i]), i))
+        _take(i for _, _, i in heapq.nsmallest(limit - len(out), scored))
+        return out
+
+    def _bigram(self, q: str) -> List[int]:
+        ids = self._bi.get(q)
+        if ids is None:
+            lo = self._lower
+            ids = self._bi[q] = sorted((i for i, s in enumerate(lo) if q in s), key=lambda i: len(lo[i]))
+        return ids
+
+    def label(self, i: int) -> str:
+        return f"{self.kinds[i]:8} {self.names[i]}  (L{self.lines[i]})"
@@ -0,0 +1,4 @@
+import os, sys
+
+# モジュールはリポジトリ直下に平置き（パッケージではない）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,62 @@
+"""processor.analyze_file の結果（AST の呼び出し関係など）"""
+import pytest
+
+import processor
+from callgraph import MODULE_CALLER, analyze_graph
+
+
+@pytest.fixture
+def analyze(tmp_path):
+    def _analyze(code, **kw):
+        kw = dict(dict(use_cache=False, out_dir=str(tmp_path), structured="", incremental=False), **kw)
+        return processor.analyze_file(code, str(tmp_path / "m.py"), **kw)
+    return _analyze
+
+SCRIPT = '''import sys
+
+
+def _parse(argv):
+    return argv[1:]
+
+
+def _main():
+    print(_parse(sys.argv))
+
+
+def _unused():
+    pass
+
+
+class Cli:
+    def run(self):
+        return 0
+    default = run()
+
+
+_main() if False else None
+if __name__ == "__main__":
+    _main()
+'''
+
+def test_module_level_calls_recorded(analyze):
+    r = analyze(SCRIPT)
+    assert r.function_calls[MODULE_CALLER] == ["Cli.run", "_main", "_main"]  # クラス本体もここ
+    assert MODULE_CALLER not in r.def_kinds
+    assert "print" in r.def_kinds  # _main から呼ぶので外部のノード
+
+def test_module_level_calls_are_roots(analyze):
+    r = analyze(SCRIPT)
+    g = analyze_graph(r.function_calls, r.def_kinds, entries=[])
+    assert g.unreachable == ["_unused"]
+    assert "_main" in g.entries and "_parse" not in g.entries
+
+def test_module_only_externals_not_nodes(analyze):
+    r = analyze("import logging\nlogging.basicConfig()\n\n\ndef f():\n    return 1\n")
+    assert r.function_calls[MODULE_CALLER] == ["logging.basicConfig"]
+    assert "logging.basicConfig" not in r.def_kinds
+
+def test_flowchart_dot_has_no_module_node(analyze):
+    pytest.importorskip("graphviz")
+    r = analyze(SCRIPT)
+    src = processor.build_flowchart_dot(r.function_calls, r.def_kinds).source
+    assert MODULE_CALLER not in src and "_main" in src
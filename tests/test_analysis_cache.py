@@ -0,0 +1,41 @@
+"""processor の解析キャッシュのキー（スタイル設定）と、渡された PEP8 結果の扱い"""
+import pytest
+
+import processor
+from cache_store import DiskCache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    c = DiskCache("analysis", 1 << 20); c.root = str(tmp_path / "cache")
+    monkeypatch.setattr(processor, "_analysis_cache", c)
+    return c
+
+def test_key_depends_on_backend():
+    if not processor.stylecheck.HAVE_INPROCESS: pytest.skip("pycodestyle/pyflakes がない")
+    assert processor.analysis_cache_key("x = 1\n", "inprocess") != processor.analysis_cache_key("x = 1\n", "flake8")
+
+@pytest.mark.parametrize("name", ["setup.cfg", "tox.ini", ".flake8"])
+def test_key_follows_flake8_config(tmp_path, monkeypatch, name):
+    monkeypatch.chdir(tmp_path)
+    k0 = processor.analysis_cache_key("x = 1\n", "flake8")
+    cfg = tmp_path / name
+    cfg.write_text("[flake8]\nmax-line-length = 100\n", encoding="utf-8")
+    k1 = processor.analysis_cache_key("x = 1\n", "flake8")
+    cfg.write_text("[flake8]\nmax-line-length = 120\n", encoding="utf-8")
+    k2 = processor.analysis_cache_key("x = 1\n", "flake8")
+    assert len({k0, k1, k2}) == 3
+    assert processor.analysis_cache_key("x = 1\n", "flake8") == k2
+
+def test_supplied_style_issues_win_over_cache(tmp_path, cache):
+    code, path = "def f():\n    return 1\n", str(tmp_path / "m.py")
+    kw = dict(out_dir=str(tmp_path), structured="", incremental=False)
+    r1 = processor.analyze_file(code, path, style_issues=[f"{path}:1:1: E001 one"], **kw)
+    assert r1.style_issues == [f"{path}:1:1: E001 one"]
+    r2 = processor.analyze_file(code, path, style_issues=[f"{path}:2:1: E002 two"], **kw)
+    assert r2.style_issues == [f"{path}:2:1: E002 two"]
+    assert cache.hits == 1  # 2回目はキャッシュの AST 解析を使い、PEP8 だけ差し替える
+    r3 = processor.analyze_file(code, path, style_issues=[f"{path}:2:1: E002 two"], **kw)
+    assert r3.style_issues == r2.style_issues and r3.def_positions == r1.def_positions
+    key = processor.analysis_cache_key(code, "flake8")
+    assert cache.get_json(key)["style_issues"] == ["<file>:2:1: E002 two"]
@@ -0,0 +1,45 @@
+"""batch.run_batch の集計（ワーカーはスレッドに差し替えて同じプロセスで動かす）"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import batch
+
+
+def _files(tmp_path):
+    src = tmp_path / "src"; src.mkdir()
+    (src / "ok.py").write_text("def f():\n    return g()\n\n\ndef g():\n    return 1\n", encoding="utf-8")
+    (src / "boom.py").write_text("x = 1\n", encoding="utf-8")
+    return src
+
+def test_worker_failure_becomes_error_row(tmp_path, monkeypatch):
+    src, out = _files(tmp_path), tmp_path / "out"
+    real = batch._analyze_one
+    def analyze(path, *a, **kw):
+        if path.endswith("boom.py"): raise RuntimeError("worker died")
+        return real(path, *a, **kw)
+    monkeypatch.setattr(batch, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(batch, "_analyze_one", analyze)
+    s = batch.run_batch([str(src)], str(out), 2, flowchart=False, use_cache=False, quiet=True, style="inprocess")
+    assert s["files"] == 2 and s["errors"] == 1
+    bad = [r for r in s["results"] if r["error"]]
+    assert bad[0]["path"].endswith("boom.py") and bad[0]["error"] == "RuntimeError: worker died"
+    txt = (out / "summary.txt").read_text(encoding="utf-8")
+    assert "NG  " + str(src / "boom.py") in txt and "ok  " + str(src / "ok.py") in txt
+
+def test_summary_written_when_sink_fails(tmp_path, monkeypatch):
+    src, out = _files(tmp_path), tmp_path / "out"
+    import structured
+    closed = []
+    class _Sink:
+        path = os.path.join(str(out), "analysis.jsonl")
+        def add(self, path, rows): raise OSError("disk full")
+        def close(self): closed.append(True)
+    monkeypatch.setattr(batch, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(structured, "open_sink", lambda fmt, out_dir: _Sink())
+    with pytest.raises(OSError):
+        batch.run_batch([str(src)], str(out), 1, flowchart=False, use_cache=False, quiet=True,
+                        style="inprocess", structured="jsonl")
+    assert closed == [True]
+    assert (out / "summary.txt").exists() and (out / "summary.json").exists()
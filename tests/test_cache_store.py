@@ -0,0 +1,93 @@
+"""cache_store.DiskCache: 書き込みの原子性、LRU の削除、壊れたエントリ"""
+import json, os
+
+import pytest
+
+import cache_store
+from cache_store import DiskCache
+
+
+@pytest.fixture
+def make(tmp_path):
+    def _make(max_bytes=1 << 20):
+        c = DiskCache("t", max_bytes); c.root = str(tmp_path / "t")
+        return c
+    return _make
+
+def _blob(n):
+    return "x" * (n - 2)  # json.dumps で引用符2つ分増える
+
+def _names(c):
+    return sorted(os.listdir(c.root))
+
+
+# ---- 原子性 ----
+def test_put_is_renamed_in_whole(make, monkeypatch):
+    c = make()
+    seen = []
+    real = os.rename
+    def rename(src, dst):
+        seen.append((os.path.exists(dst), json.load(open(os.path.join(src, "data.json"), encoding="utf-8"))))
+        return real(src, dst)
+    monkeypatch.setattr(cache_store.os, "rename", rename)
+    c.put_json("k", {"a": 1})
+    assert seen == [(False, {"a": 1})]  # 書き終えた一時ディレクトリが、まだない名前へ1回で移る
+    assert _names(c) == ["k"] and c.get_json("k") == {"a": 1}
+
+def test_failed_put_leaves_nothing(make, monkeypatch):
+    c = make()
+    def boom(path, mode="r", *a, **kw):
+        raise OSError("disk full")
+    c.put_json("a", 1)
+    monkeypatch.setattr("builtins.open", boom)
+    c.put_json("k", {"a": 1})
+    monkeypatch.undo()
+    assert c.get_json("k") is None
+    assert [n for n in _names(c) if not n.startswith(".tmp_")] == ["a"]
+    assert c._entries()[0][2].endswith("a")  # 書きかけの一時ディレクトリはエントリに数えない
+
+def test_second_put_keeps_first_unless_replace(make):
+    c = make()
+    c.put_json("k", 1); c.put_json("k", 2)
+    assert c.get_json("k") == 1
+    assert not [n for n in _names(c) if n.startswith(".tmp_")]
+    c.put_json("k", 3, replace=True)
+    assert c.get_json("k") == 3 and _names(c) == ["k"]
+    assert c._total == c._scan_total()
+
+
+# ---- LRU ----
+def test_evicts_least_recently_used_down_to_90_percent(make):
+    c = make(1000)
+    for i, k in enumerate(["e1", "e2", "e3"]):
+        c.put_json(k, _blob(300))
+        os.utime(os.path.join(c.root, k), (100 + i, 100 + i))
+    assert c.evictions == 0
+    assert c.get_json("e1") is not None  # 参照で新しくなる → e2 が一番古い
+    c.put_json("e4", _blob(300))         # 1200 > 1000 → 900 以下まで削る
+    assert _names(c) == ["e1", "e3", "e4"]
+    assert c.evictions == 1 and c._scan_total() == 900 == c._total
+
+def test_evict_removes_several(make):
+    c = make(1000)
+    for i in range(3):
+        k = f"e{i}"; c.put_json(k, _blob(300)); os.utime(os.path.join(c.root, k), (100 + i, 100 + i))
+    c.put_json("big", _blob(500))  # 1400 → 古い順に 2 つ消して 1000 * 0.9 以下
+    assert _names(c) == ["big", "e2"] and c.evictions == 2
+
+
+# ---- 壊れたエントリ ----
+def test_corrupted_entry_is_a_miss_and_removed(make):
+    c = make()
+    c.put_json("k", {"a": 1})
+    with open(os.path.join(c.root, "k", "data.json"), "w", encoding="utf-8") as fp: fp.write("{trunc")
+    assert c.get_json("k") is None
+    assert c.stats() == dict(hits=0, misses=1, evictions=0)
+    assert not os.path.exists(os.path.join(c.root, "k"))
+    c.put_json("k", {"a": 2})  # 作り直せる
+    assert c.get_json("k") == {"a": 2}
+
+def test_entry_without_data_file_is_a_miss(make):
+    c = make()
+    os.makedirs(os.path.join(c.root, "k"))
+    assert c.get_json("k") is None and c.stats()["misses"] == 1
@@ -0,0 +1,199 @@
+"""callgraph（Qt を使わない部分）の挙動。グラフは手で組んだ小さいもの"""
+import json
+
+from callgraph import (CallGraph, MODULE_CALLER, strongly_connected, propagate_tags, repropagate_tags, analyze_graph,
+                       without_module_calls)
+
+
+def _follow(inherited, tags, node, tag):
+    """経由先を辿って、タグを直接持つノードに着くまでの道のり（輪に入ったら失敗）"""
+    path = [node]
+    while tag not in tags.get(path[-1], ()):
+        nxt = inherited[path[-1]][tag]
+        assert nxt not in path, f"経由先が輪になっている: {path + [nxt]}"
+        path.append(nxt)
+    return path
+
+
+# ---- strongly_connected ----
+def test_scc_callees_first():
+    calls = {"main": ["a"], "a": ["b"], "b": ["a", "leaf"], "leaf": []}
+    comps = [sorted(c) for c in strongly_connected(calls)]
+    assert sorted(map(tuple, comps)) == [("a", "b"), ("leaf",), ("main",)]
+    assert comps.index(["leaf"]) < comps.index(["a", "b"]) < comps.index(["main"])
+
+def test_scc_includes_callee_only_nodes():
+    comps = strongly_connected({"f": ["os.listdir", "f"]})
+    assert sorted(map(sorted, comps)) == [["f"], ["os.listdir"]]
+
+
+# ---- propagate_tags ----
+def test_propagate_chain():
+    calls = {"main": ["helper"], "helper": ["save"], "save": ["open"]}
+    tags = {"save": {"io"}}
+    assert propagate_tags(calls, tags) == {"helper": {"io": "save"}, "main": {"io": "helper"}}
+
+def test_propagate_skips_own_and_local_tags():
+    calls = {"a": ["b", "gen"], "b": [], "gen": []}
+    tags = {"a": {"io"}, "b": {"io", "net"}, "gen": {"generator"}}
+    assert propagate_tags(calls, tags) == {"a": {"net": "b"}}  # io は本人にある。generator は伝えない
+
+def test_propagate_self_recursion():
+    calls = {"walk": ["walk", "fetch"], "fetch": []}
+    assert propagate_tags(calls, {"fetch": {"net"}}) == {"walk": {"net": "fetch"}}
+
+def test_propagate_through_cycle_via_terminates():
+    # walk ⇄ walk2 の輪。I/O は輪の出口 helper → save の先にだけある
+    calls = {"main": ["walk2"], "walk": ["walk2", "helper"], "walk2": ["walk"], "helper": ["save"], "save": []}
+    tags = {"save": {"io"}}
+    out = propagate_tags(calls, tags)
+    assert set(out) == {"main", "walk", "walk2", "helper"}
+    assert out["walk"] == {"io": "helper"} and out["walk2"] == {"io": "walk"}
+    for n in out:
+        assert _follow(out, tags, n, "io")[-1] == "save"
+
+def test_propagate_cycle_with_tag_inside():
+    calls = {"a": ["b"], "b": ["c"], "c": ["a"]}
+    tags = {"b": {"async"}}
+    out = propagate_tags(calls, tags)
+    assert out == {"a": {"async": "b"}, "c": {"async": "a"}}
+    for n in out:
+        assert _follow(out, tags, n, "async")[-1] == "b"
+
+def test_propagate_same_for_dict_and_callgraph():
+    calls = {"m": ["x", "y", "x"], "x": ["y"], "y": ["m", "io_fn"], "io_fn": []}
+    tags = {"io_fn": {"io"}, "x": {"net"}}
+    assert propagate_tags(calls, tags) == propagate_tags(CallGraph.from_calls(calls), tags)
+
+def _repropagate(calls, tags, new_calls, new_tags):
+    g0 = CallGraph.from_calls(calls)
+    g = g0.with_rows({u: vs for u, vs in new_calls.items() if vs != calls[u]})
+    changed = {u for u in calls if calls[u] != new_calls[u]}
+    changed |= {k for k in tags.keys() | new_tags.keys() if tags.get(k) != new_tags.get(k)}
+    return repropagate_tags(g, new_tags, g0, tags, propagate_tags(g0, tags), changed)
+
+def test_repropagate_same_as_full():
+    calls = {"main": ["helper", "log"], "helper": ["save"], "save": ["open"], "log": ["print"], "fetch": []}
+    tags = {"save": {"io"}, "fetch": {"net"}}
+    cases = [
+        (calls, {"save": {"io"}, "fetch": {"net"}, "log": {"io"}}),  # 直接のタグだけ変わる
+        (dict(calls, log=["print", "fetch"]), tags),           # 呼び出し先が増える
+        (dict(calls, helper=[]), tags),                        # 届くタグが変わる（呼び出し元も）
+        (dict(calls, save=["open", "main"]), tags),            # 輪ができる
+    ]
+    for new_calls, new_tags in cases:
+        assert _repropagate(calls, tags, new_calls, new_tags) == propagate_tags(new_calls, new_tags)
+
+def test_repropagate_cycle_changes():
+    calls = {"a": ["b"], "b": ["c"], "c": ["a"], "d": ["a"], "e": []}
+    tags = {"b": {"async"}, "e": {"io"}}
+    for new_calls in (dict(calls, c=[]), dict(calls, c=["a", "e"]), dict(calls, e=["d"])):
+        assert _repropagate(calls, tags, new_calls, tags) == propagate_tags(new_calls, tags)
+
+
+# ---- analyze_graph ----
+def _kinds(*names, kind="function"):
+    return {n: kind for n in names}
+
+def test_graph_public_self_recursion_is_entry():
+    g = analyze_graph({"walk": ["walk", "os.listdir"]}, {**_kinds("walk"), "os.listdir": "external"}, entries=[])
+    assert g.entries == ["walk"] and g.unreachable == []
+    assert g.cycles == []  # 自分だけの再帰は輪に数えない
+
+def test_graph_public_mutual_recursion_is_entry():
+    g = analyze_graph({"ping": ["pong"], "pong": ["ping"]}, _kinds("ping", "pong"), entries=[])
+    assert g.entries == ["ping", "pong"] and g.unreachable == []
+    assert g.cycles == [["ping", "pong"]]
+
+def test_graph_cycle_called_from_outside_is_not_entry():
+    calls = {"main": ["ping"], "ping": ["pong"], "pong": ["ping"]}
+    g = analyze_graph(calls, _kinds("main", "ping", "pong"), entries=[])
+    assert g.entries == ["main"] and g.unreachable == []
+
+def test_graph_unreachable_private():
+    calls = {"main": ["_used"], "_used": [], "_dead": ["_dead2"], "_dead2": ["_dead"], "_lonely": []}
+    g = analyze_graph(calls, _kinds("main", "_used", "_dead", "_dead2", "_lonely"), entries=[])
+    assert g.entries == ["main"]
+    assert g.unreachable == ["_dead", "_dead2", "_lonely"]
+    assert g.cycles == [["_dead", "_dead2"]]
+
+def test_graph_explicit_entries():
+    g = analyze_graph({"_boot": ["_init"], "_init": []}, _kinds("_boot", "_init"), entries=["_boot"])
+    assert g.entries == ["_boot"] and g.unreachable == []
+
+def test_graph_cycles_sorted_by_size():
+    calls = {"a": ["b"], "b": ["a"], "x": ["y"], "y": ["z"], "z": ["x"]}
+    assert analyze_graph(calls, _kinds(*calls), entries=[]).cycles == [["x", "y", "z"], ["a", "b"]]
+
+def test_graph_fan_in_fan_out():
+    calls = {"a": ["log", "log", "io"], "b": ["log"], "c": ["log", "b"], "log": [], "io": []}
+    g = analyze_graph(calls, _kinds(*calls), entries=[], top=2)
+    assert g.fan_in == [("log", 3, 4), ("b", 1, 1)]     # (名前, 呼び出し元の数, 呼ばれた回数)
+    assert g.fan_out == [("a", 2, 3), ("c", 2, 2)]      # (名前, 呼び出し先の数, 呼んだ回数)
+
+def test_graph_module_level_calls_are_roots():
+    # if __name__ == "__main__": _main()  /  トップレベルの _setup()
+    calls = {"_main": ["_step"], "_step": [], "_setup": [], "_dead": [], MODULE_CALLER: ["_setup", "_main", "print"]}
+    g = analyze_graph(calls, _kinds("_main", "_step", "_setup", "_dead"), entries=[])
+    assert g.entries == ["_main", "_setup"]
+    assert g.unreachable == ["_dead"]
+    assert [r[0] for r in g.fan_out] == ["_main"]  # MODULE_CALLER は定義ではない
+
+def test_graph_project_module_callers_are_roots():
+    calls = {"pkg.cli._run": [], "pkg.cli.<module>": ["pkg.cli._run"], "pkg.util._x": []}
+    g = analyze_graph(calls, _kinds("pkg.cli._run", "pkg.util._x"), entries=[])
+    assert g.entries == ["pkg.cli._run"] and g.unreachable == ["pkg.util._x"]
+
+def test_without_module_calls():
+    calls = {"main": ["helper"], "helper": [], MODULE_CALLER: ["main", "print"]}
+    g = without_module_calls(calls)
+    assert list(g) == ["main", "helper"] and "print" not in g.ids
+    plain = CallGraph.from_calls({"a": ["b"]})
+    assert without_module_calls(plain) is plain
+
+
+# ---- CallGraph（整数 ID + CSR） ----
+def test_callgraph_interning_and_counts():
+    calls = {"main": ["load", "save", "load", "print", "load"], "load": ["open"], "save": [], "idle": []}
+    g = CallGraph.from_calls(calls)
+    assert g.names[:4] == ["main", "load", "save", "idle"]  # 呼び出し元が先
+    assert sorted(g.names[4:]) == ["open", "print"] and g.n_keys == 4 and len(g) == 4
+    assert len(set(g.names)) == len(g.names)  # 同じ名前は1つの ID
+    assert g.callees("main") == [("load", 3), ("save", 1), ("print", 1)]  # 最初に呼んだ順、重複は回数
+    assert list(g.edges()) == [("main", "load", 3), ("main", "save", 1), ("main", "print", 1), ("load", "open", 1)]
+    assert g.n_calls == 6 and len(g.targets) == 4
+    assert g.offsets.tolist() == [0, 3, 4, 4, 4, 4, 4]  # 呼び出し先だけのノードも空の行を持つ
+    ids = g.ids
+    assert g.indegree()[ids["load"]] == 3 and g.outdegree()[ids["main"]] == 5 and g.outdegree()[ids["open"]] == 0
+
+def test_callgraph_dict_view():
+    calls = {"main": ["load", "save", "load"], "load": [], "save": ["os.remove"]}
+    g = CallGraph.from_calls(calls)
+    assert "main" in g and "os.remove" not in g  # キーは呼び出し元だけ
+    assert list(g) == ["main", "load", "save"]
+    assert g["main"] == ["load", "load", "save"]  # 同じ先はまとまる
+    assert g.get("os.remove") is None and g.callees("unknown") == []
+    assert dict(g) == {"main": ["load", "load", "save"], "load": [], "save": ["os.remove"]}
+    assert CallGraph.from_calls(dict(g)) == g and CallGraph.of(g) is g
+
+def test_callgraph_from_rows_merges_counts():
+    g = CallGraph.from_rows([("a", [("b", 2), ("c", 1), ("b", 1)]), ("b", [])])
+    assert g.callees("a") == [("b", 3), ("c", 1)] and list(g) == ["a", "b"]
+
+def test_callgraph_json_roundtrip():
+    g = CallGraph.from_calls({"f": ["g", "g", "h"], "g": ["f"]})
+    h = CallGraph.from_json(json.loads(json.dumps(g.to_json())))
+    assert h == g and h.ids == g.ids and list(h.edges()) == list(g.edges())
+    assert g != CallGraph.from_calls({"f": ["g", "h"], "g": ["f"]})  # 回数が違えば別物
+
+def test_callgraph_with_rows():
+    calls = {"main": ["load", "save"], "load": ["open"], "save": ["open", "print"]}
+    g = CallGraph.from_calls(calls)
+    for rows in ({"load": ["open", "open"]}, {"main": ["save"]}, {"save": ["print", "open"]}, {"load": []}):
+        h = g.with_rows(rows)
+        want = CallGraph.from_calls(dict(calls, **rows))
+        assert h == want and h.names == want.names and list(h.edges()) == list(want.edges())
+    assert g.with_rows({}) == g
+    assert g.with_rows({"load": ["json.load"]}) is None   # 知らない名前
+    assert g.with_rows({"unknown": []}) is None           # 呼び出し元が増える
+    assert g.with_rows({"load": ["print"]}) is None       # 呼び出し先にしか出てこない名前の初出の順が変わる
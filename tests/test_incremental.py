@@ -0,0 +1,123 @@
+"""analyze_file(..., incremental=True) の差分解析が全体解析と同じ結果になること"""
+import os
+
+import pytest
+
+import processor
+
+BASE = '''import os
+import sys
+from typing import List
+
+
+def load(path):
+    with open(path) as fh:
+        return fh.read()
+
+
+def save(path, text):
+    print(os.path.join(path, text))
+
+
+class Store:
+    kind = "disk"
+
+    def get(self, key):
+        return load(key)
+
+    def put(self, key, value):
+        save(key, value)
+
+
+def main():
+    s = Store()
+    s.put("a", s.get("b"))
+
+
+if __name__ == "__main__":
+    main()
+'''
+
+
+@pytest.fixture
+def run(tmp_path):
+    path = str(tmp_path / "m.py")
+
+    def _run(code, incremental):
+        r = processor.analyze_file(code, path, use_cache=False, out_dir=str(tmp_path), report_base="r",
+                                   structured="", incremental=incremental)
+        with open(os.path.join(str(tmp_path), "r_analysis_with_pep8.txt"), encoding="utf-8") as fp:
+            report = fp.read()
+        return (r, list(r.def_positions.items()), dict(processor._SHARED.PATTERN_TAGS),
+                dict(processor._SHARED.INHERITED_TAGS), report)
+    _run.path = path
+    return _run
+
+def _same(run, code):
+    inc = run(code, True)
+    assert inc == run(code, False)
+    return processor.incremental_stats(run.path)
+
+def _edits(run, *codes):
+    run(BASE, True)
+    return [_same(run, code) for code in codes]
+
+
+# ---- 関数の追加・削除・移動 ----
+def test_add_function(run):
+    added = BASE.replace("class Store:", "def extra():\n    return sys.argv\n\n\nclass Store:")
+    _edits(run, added)
+
+def test_remove_function(run):
+    _edits(run, BASE.replace("def save(path, text):\n    print(os.path.join(path, text))\n\n\n", ""))
+
+def test_shift_function(run):
+    # 前に空行を足して後ろの定義の行番号をずらす、関数の順番を入れ替える
+    shifted = BASE.replace("def load(path):", "\n\n\ndef load(path):")
+    load = "def load(path):\n    with open(path) as fh:\n        return fh.read()\n\n\n"
+    swapped = BASE.replace(load, "").replace("def main():", load + "def main():")
+    _edits(run, shifted, swapped, BASE)
+
+def test_edit_function_body_parses_one_segment(run):
+    stats = _edits(run, BASE.replace("return fh.read()", "return fh.read().strip()"))
+    assert stats[0]["parsed"] == 1 and stats[0]["reused"] == stats[0]["units"] - 1
+
+def test_edit_method_body_and_class_body(run):
+    _edits(run, BASE.replace("return load(key)", "return load(key) or os.sep"),
+           BASE.replace('kind = "disk"', 'kind = "disk"\n    size = len(kind)'))
+
+def test_identical_text(run):
+    stats = _edits(run, BASE)
+    assert stats[0]["parsed"] == 0
+
+
+# ---- import と pyflakes ----
+def test_edit_import(run):
+    _edits(run, BASE.replace("import sys\n", "import sys\nimport json\n"),
+           BASE.replace("import sys\n", ""),
+           BASE.replace("from typing import List\n", "from typing import Dict, List\n"))
+
+def test_body_edit_changes_unused_import(run):
+    # 本体の変更で import が使われる／使われなくなる
+    _edits(run, BASE.replace("print(os.path.join(path, text))", "print(sys.argv, path, text)"),
+           BASE.replace("return fh.read()", "return List[fh.read()]"))
+
+def test_undefined_global_and_redefinition(run):
+    _edits(run, BASE.replace("return fh.read()", "return missing(fh)"),
+           BASE.replace("return fh.read()", "global cache\n        cache = fh.read()\n        return cache"),
+           BASE.replace("def main():", "def save(path):\n    pass\n\n\ndef main():"))
+
+def test_string_annotation_and_star_import(run):
+    _edits(run, BASE.replace("def save(path, text):", "def save(path, text: 'List[str]'):"),
+           BASE.replace("import sys\n", "import sys\nfrom os.path import *\n"))
+
+def test_import_after_code(run):
+    # E402 は前の区間の状態を引き継ぐ
+    _edits(run, BASE.replace("from typing import List\n", "print(1)\nfrom typing import List\n"), BASE)
+
+
+# ---- 構文エラー ----
+def test_syntax_error_then_recovery(run):
+    # 構文エラーでも全体解析と同じ結果（PEP8 のみ）、直した後も同じ
+    _edits(run, BASE.replace("def save(path, text):", "def save(path, text:"),
+           BASE.replace("return fh.read()", "return fh.read(1)"))
@@ -0,0 +1,84 @@
+"""project: import の別名をたどってモジュール横断の呼び出しを解決する（小さいパッケージを tmp_path に作る）"""
+import os
+
+import pytest
+
+import project
+
+
+def _write(root, rel, text):
+    p = root / rel
+    p.parent.mkdir(parents=True, exist_ok=True)
+    p.write_text(text, encoding="utf-8")
+    return p
+
+@pytest.fixture
+def pkg(tmp_path):
+    root = tmp_path / "pkg"
+    _write(root, "__init__.py", "from .core import run as start\n")
+    _write(root, "util.py", "def helper():\n    return 1\n\n\ndef other():\n    return 2\n")
+    _write(root, "core.py",
+           "import pkg.util as u\n"
+           "from pkg.util import helper as h\n"
+           "from . import util\n"
+           "from .sub.deep import leaf\n"
+           "import os\n\n\n"
+           "def run():\n"
+           "    u.helper()\n"
+           "    h()\n"
+           "    util.other()\n"
+           "    leaf()\n"
+           "    os.getcwd()\n\n\n"
+           "class Engine:\n"
+           "    def go(self):\n"
+           "        self.step()\n"
+           "        Engine.step(self)\n\n"
+           "    def step(self):\n"
+           "        return run()\n")
+    _write(root, "sub/__init__.py", "")
+    _write(root, "sub/deep.py", "from ..util import helper\n\n\ndef leaf():\n    return helper()\n")
+    _write(root, "app.py", "import pkg\nfrom pkg.util import *\n\n\ndef main():\n    pkg.start()\n    other()\n")
+    return root
+
+def _callees(pr, name):
+    return sorted(v for v, _ in pr.function_calls.callees(name))
+
+def test_discover(pkg):
+    package, found = project.discover_modules(str(pkg))
+    assert package == "pkg"
+    assert [(n, is_pkg) for n, _, is_pkg in found] == [
+        ("pkg", True), ("pkg.app", False), ("pkg.core", False), ("pkg.util", False),
+        ("pkg.sub", True), ("pkg.sub.deep", False)]
+
+def test_resolved_edges(pkg):
+    pr = project.analyze_project(str(pkg))
+    # import a.b as u / from a.b import c as h / from . import util / from .sub.deep import leaf
+    assert _callees(pr, "pkg.core.run") == ["pkg.sub.deep.leaf", "pkg.util.helper", "pkg.util.other"]
+    assert dict(pr.function_calls.callees("pkg.core.run"))["pkg.util.helper"] == 2
+    # from ..util import（2段上の相対 import）
+    assert _callees(pr, "pkg.sub.deep.leaf") == ["pkg.util.helper"]
+    # パッケージの __init__ での再エクスポート（別名つき）と from x import *
+    assert _callees(pr, "pkg.app.main") == ["pkg.core.run", "pkg.util.other"]
+    # self.method() と Class.method()
+    assert dict(pr.function_calls.callees("pkg.core.Engine.go")) == {"pkg.core.Engine.step": 2}
+    assert _callees(pr, "pkg.core.Engine.step") == ["pkg.core.run"]
+    assert pr.stats["external_calls"] == 1  # os.getcwd
+    assert pr.locations["pkg.util.helper"] == (str(pkg / "util.py"), 1)
+
+def test_external_calls_optional(pkg):
+    pr = project.analyze_project(str(pkg), include_external=True)
+    assert "os.getcwd" in _callees(pr, "pkg.core.run")
+    assert pr.def_kinds["os.getcwd"] == "external"
+
+def test_table_cache_follows_mtime(pkg):
+    util = pkg / "util.py"
+    a = project.analyze_project(str(pkg))
+    b = project.analyze_project(str(pkg))
+    assert b.modules["pkg.util"] is a.modules["pkg.util"]  # 変わっていないモジュールは読み直さない
+    util.write_text("def helper():\n    return 1\n", encoding="utf-8")  # other を消す
+    st = os.stat(util); os.utime(util, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    c = project.analyze_project(str(pkg))
+    assert c.modules["pkg.util"] is not a.modules["pkg.util"]
+    assert c.modules["pkg.core"] is a.modules["pkg.core"]
+    assert "pkg.util.other" not in c.def_kinds
+    assert _callees(c, "pkg.core.run") == ["pkg.sub.deep.leaf", "pkg.util.helper"]
@@ -0,0 +1,21 @@
+"""stylecheck の flake8 一括実行が失敗したときの振る舞い"""
+import subprocess
+
+import stylecheck
+
+
+def test_many_flake8_missing(monkeypatch):
+    monkeypatch.setenv("PATH", "")
+    out = stylecheck.check_many_flake8(["a.py", "b.py"])
+    assert out == {"a.py": [stylecheck.FLAKE8_MISSING], "b.py": [stylecheck.FLAKE8_MISSING]}
+
+def test_many_flake8_timeout_only_that_chunk(monkeypatch):
+    calls = []
+    def fake_run(args, **kw):
+        calls.append(args)
+        if len(calls) == 1: raise subprocess.TimeoutExpired(args, kw.get("timeout"))
+        return subprocess.CompletedProcess(args, 1, stdout="c.py:1:1: E111 x\n", stderr="")
+    monkeypatch.setattr(stylecheck.subprocess, "run", fake_run)
+    out = stylecheck.check_many_flake8(["a.py", "b.py", "c.py"], chunk=2, timeout=1)
+    assert out == {"a.py": [stylecheck.FLAKE8_MISSING], "b.py": [stylecheck.FLAKE8_MISSING],
+                   "c.py": ["c.py:1:1: E111 x"]}
@@ -0,0 +1,58 @@
+"""symbolindex.SymbolIndex（Ctrl+P）の並び順と、解析し直したあとの索引"""
+import processor
+from symbolindex import SymbolIndex
+
+
+def _index(*names):
+    return SymbolIndex((n, "function", i + 1) for i, n in enumerate(names))
+
+def _search(ix, q, limit=50):
+    return [ix.names[i] for i in ix.search(q, limit)]
+
+
+def test_stage_order_prefix_acronym_substring_fuzzy():
+    ix = _index("ru_xn", "prune", "Engine.run_all", "runner", "run", "unrelated", "r_u_n_x")
+    # 前方一致（末尾の名前でも。短い順）→ 頭文字（r_u_n_x → runx）→ 部分一致 → 飛び飛び一致
+    assert _search(ix, "run") == ["run", "runner", "Engine.run_all", "r_u_n_x", "prune", "ru_xn"]
+
+def test_acronym_after_prefix_before_substring():
+    ix = _index("config_gfi_x", "generate_flowchart_image", "GraphFocusIndex", "gfind")
+    assert _search(ix, "gfi") == ["gfind", "GraphFocusIndex", "generate_flowchart_image", "config_gfi_x"]
+
+def test_substring_earlier_match_first():
+    ix = _index("zz_load", "load_all", "x_load")
+    assert _search(ix, "oad") == ["load_all", "x_load", "zz_load"]
+
+def test_fuzzy_tighter_span_first():
+    ix = _index("axxxxxx_bxc", "ax_bc", "ab_c")
+    assert _search(ix, "abc") == ["ab_c", "ax_bc", "axxxxxx_bxc"]
+
+def test_case_insensitive_limit_and_empty():
+    ix = _index("Alpha", "alphabet", "ALPHA_2", "beta")
+    assert _search(ix, "ALP", limit=2) == ["Alpha", "ALPHA_2"]
+    assert ix.search("   ") == []
+    assert _search(ix, "zzz") == []
+
+def test_from_result_only_definitions():
+    ix = SymbolIndex.from_result({"f": 3, "C": 5, "C.m": 6, "os.path": 1},
+                                 {"f": "function", "C": "class", "C.m": "method", "os.path": "external"})
+    assert sorted(ix.names) == ["C", "C.m", "f"]
+    i = ix.names.index("C.m")
+    assert (ix.kinds[i], ix.lines[i]) == ("method", 6)
+
+
+def test_index_after_reanalysis(tmp_path):
+    path = str(tmp_path / "m.py")
+    kw = dict(use_cache=False, out_dir=str(tmp_path), structured="")
+    v1 = "def load_items():\n    return 1\n\n\nclass Store:\n    def save(self):\n        return load_items()\n"
+    r = processor.analyze_file(v1, path, **kw)
+    ix = SymbolIndex.from_result(r.def_positions, r.def_kinds)
+    assert _search(ix, "load") == ["load_items"] and _search(ix, "sav") == ["Store.save"]
+    # 関数名を変え、上に行を足して解析し直す（差分解析の経路）
+    v2 = "import os\n\n\ndef fetch_items():\n    return os.sep\n\n\n" + v1.split("\n\n\n", 1)[1].replace("load_items", "fetch_items")
+    r = processor.analyze_file(v2, path, **kw)
+    ix = SymbolIndex.from_result(r.def_positions, r.def_kinds)
+    assert _search(ix, "load") == []
+    assert _search(ix, "fi") == ["fetch_items"]
+    i = ix.search("save")[0]
+    assert (ix.names[i], ix.lines[i]) == ("Store.save", 9)
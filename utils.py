@@ -1,8 +1,6 @@
 import os, sys, shutil, textwrap
 from typing import Optional
-from PySide6.QtCore import Qt
-from PySide6.QtGui import QColor, QFont
-from PySide6.QtWidgets import QGraphicsDropShadowEffect
+# Qt はここでは import しない（ヘッドレスのバッチ実行が utils/processor だけで動くように）
 
 # ====== アプリ定数 ======
 APP_TITLE = "PyCodeDictionary Qt"
@@ -12,12 +10,55 @@ RESIZE_MARGIN = 8
 
 # 保存先
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-SAVE_DIR = os.path.join(BASE_DIR, "[output]PyCodeDictionary")
-os.makedirs(SAVE_DIR, exist_ok=True)
+SAVE_DIR = os.path.join(BASE_DIR, "[output]PyCodeDictionary")  # 作るのは最初に書き込むとき（ensure_save_dir）
 
 # フォント（Graphviz向けに任意）
 FONT_PATH = ""
 
+# 解析結果キャッシュの上限（SAVE_DIR/cache/analysis、超えたら古い順に削除）
+ANALYSIS_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# フローチャート描画キャッシュの上限（SAVE_DIR/cache/render。PNG/SVG/レイアウト/マップを DOT ごとに保存）
+RENDER_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# フォーカス表示: ノード数がこれを超えるファイルは全体図を描かず、クリックしたシンボルの近傍だけを描く
+FOCUS_AUTO_NODES = 150
+FOCUS_HOPS = 2          # 呼び出し元/呼び出し先を何ホップまで表示するか
+FOCUS_MAX_NODES = 120   # 近傍が大きすぎるとき（ハブ関数など）の上限。超えた分はプレースホルダに畳む
+
+# 関数ごとの複雑度（循環的複雑度）のしきい値: これ以上のノードはフローチャートの枠を橙/赤に、ツリーでは ⚠ を付ける
+COMPLEXITY_WARN = 10
+COMPLEXITY_HIGH = 20
+
+# フローチャートの表示方式: "native"（レイアウトJSONから QGraphicsItem を直接組み立てる）/ "svg"（SVG + 透明ホットスポット）
+FLOW_RENDERER = "native"
+
+# 大きいファイル: これ以上の文字数はエディタへ分割して流し込み（1回 LARGE_FILE_CHUNK_LINES 行、UI を止めない）、
+# 入力のたびの検索をやめて Enter で検索する
+LARGE_FILE_CHARS = 1_000_000
+LARGE_FILE_CHUNK_LINES = 2000
+
+# PEP8チェックの方式: "auto"（pycodestyle/pyflakes があればプロセス内）/ "inprocess" / "flake8"（毎回サブプロセス）
+STYLE_BACKEND = "auto"
+
+# ファイル監視（メニューの「ファイル監視」で切り替え）: 開いているファイルが保存されたら自動で解析し直す。
+# 書き込みが WATCH_DEBOUNCE_MS 止んでから内容のハッシュを比べ、変わっていたときだけ（スクロール位置と検索は保つ）
+WATCH_FILES = False
+WATCH_DEBOUNCE_MS = 300
+
+# 処理段ごとの時間計測（perftrace）: 解析のたびに段ごとの合計をステータスバーに出し、
+# SAVE_DIR/trace/<名前>_trace.json（Chrome trace_event 形式。Perfetto で開く）に書く。メニューの「計測」でも切り替え
+PERF_TRACE = False
+
+# 差分解析: 直近に解析したファイルいくつ分の「トップレベルの関数/クラスごとの結果」をメモリに持つか（0 で無効）
+INCREMENTAL_FILES = 8
+
+# 機械可読な解析結果の出力: ""（なし）/ "jsonl"（<名前>_analysis.jsonl）/ "sqlite"（保存フォルダの analysis.sqlite に追記）
+STRUCTURED_OUTPUT = ""
+
+# バッチ（ヘッドレス）実行の既定出力先
+BATCH_DIR = os.path.join(SAVE_DIR, "batch")
+
 # README
 README_MD = textwrap.dedent("""\
 # PyCodeDictionary ©️2025 KisaragiIchigo
@@ -43,6 +84,7 @@ SVGをクリックすれば、対応するコード行にジャンプするこ
   - エッジの太さ＝呼び出し回数
   - `async` / `generator` / `I/O` / `ネットワーク` 呼び出しは色分け
   - 入口ノード＝太枠、出口ノード＝淡色
+  - 複雑度（分岐の多さ）が高い関数は枠を橙／赤に
   - クラス内メソッドは横並びに整列
 - **ドラッグ＆ドロップ対応**：.py ファイルを投下して解析
 - **READMEダイアログ**：この説明をGUI内で確認可能
@@ -88,7 +130,7 @@ def build_qss(compact: bool) -> str:
 #overlay {{
   background: rgba(0,0,0,0.15);
 }}
-QTreeWidget {{
+QTreeView, QListWidget {{
   background: rgba(255,250,250,0.92);
   color: #000;
   border-radius: 10px;
@@ -152,11 +194,15 @@ QPushButton:hover {{
 """
 
 def apply_drop_shadow(widget):
+    from PySide6.QtGui import QColor
+    from PySide6.QtWidgets import QGraphicsDropShadowEffect
     eff = QGraphicsDropShadowEffect(widget)
     eff.setBlurRadius(24); eff.setOffset(0, 6); eff.setColor(QColor(0,0,0,180))
     widget.setGraphicsEffect(eff); return eff
 
 def apply_text_shadow(label):
+    from PySide6.QtGui import QColor
+    from PySide6.QtWidgets import QGraphicsDropShadowEffect
     eff = QGraphicsDropShadowEffect(label)
     eff.setBlurRadius(8); eff.setOffset(1,1); eff.setColor(QColor(192,192,192,110))
     label.setGraphicsEffect(eff); return eff
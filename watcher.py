@@ -0,0 +1,139 @@
+"""
+ファイル監視（Qt を使わない。ヘッドレスの batch --watch 用。GUI は QFileSystemWatcher で、判定の text_digest だけ共有）。
+
+- text_digest / file_digest: 内容のハッシュ。保存し直しただけ（mtime だけ変わった）なら再解析しない
+- ContentWatcher: パスの集合を監視し、書き込みが settle 秒止んでから「内容が変わったファイル」をまとめて返す。
+  Linux は inotify（ctypes。ディレクトリ単位で見るので、一時ファイル → rename で保存するエディタも拾う）、
+  それ以外は stat（mtime, サイズ）のポーリング
+"""
+import os, sys, time, struct, select, hashlib
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+def text_digest(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+def file_digest(path: str) -> Optional[str]:
+    """読めなければ None（削除された / 書き込み途中で UTF-8 として壊れている）"""
+    try:
+        with open(path, "r", encoding="utf-8") as fp:
+            return text_digest(fp.read())
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+# IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_IN_MASK = 0x2 | 0x8 | 0x40 | 0x80 | 0x100 | 0x200
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len（この後に名前）
+
+class _Inotify:
+    def __init__(self):
+        import ctypes, ctypes.util  # GUI は text_digest しか使わないので、ここで読み込む
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0: raise OSError(ctypes.get_errno(), "inotify_init1")
+        self._dirs: Dict[str, int] = {}
+        self._wds: Dict[int, str] = {}
+
+    def watch(self, paths: Set[str]):
+        dirs = {os.path.dirname(p) for p in paths}
+        for d in dirs - set(self._dirs):
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(d), _IN_MASK)
+            if wd >= 0: self._dirs[d] = wd; self._wds[wd] = d
+        for d in set(self._dirs) - dirs:
+            self._libc.inotify_rm_watch(self.fd, self._wds.pop(self._dirs.pop(d)))
+
+    def read(self, timeout: float) -> Set[str]:
+        if not select.select([self.fd], [], [], max(0.0, timeout))[0]: return set()
+        try:
+            buf = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return set()
+        out, i = set(), 0
+        while i + _EVENT.size <= len(buf):
+            wd, _, _, n = _EVENT.unpack_from(buf, i)
+            name = buf[i + _EVENT.size:i + _EVENT.size + n].rstrip(b"\0")
+            if name and wd in self._wds: out.add(os.path.join(self._wds[wd], os.fsdecode(name)))
+            i += _EVENT.size + n
+        return out
+
+    def close(self):
+        os.close(self.fd)
+
+class _Poll:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._stat: Dict[str, Optional[Tuple[int, int]]] = {}
+
+    @staticmethod
+    def _stat_of(p: str) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(p); return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def watch(self, paths: Set[str]):
+        self._stat = {p: self._stat[p] if p in self._stat else self._stat_of(p) for p in paths}
+
+    def read(self, timeout: float) -> Set[str]:
+        time.sleep(max(0.0, min(timeout, self.interval)))
+        out = set()
+        for p, old in self._stat.items():
+            now = self._stat_of(p)
+            if now != old: self._stat[p] = now; out.add(p)
+        return out
+
+    def close(self):
+        pass
+
+
+class ContentWatcher:
+    """
+    wait() は、監視中のファイル（と監視ディレクトリに現れた suffixes のファイル）のうち内容が変わった/消えたものを返す。
+    イベントが続く間は待ち、settle 秒静かになってからハッシュを比べる（保存1回で何度も解析しない）。
+    """
+    def __init__(self, paths: Iterable[str], settle: float = 0.3, interval: float = 0.5,
+                 backend: str = "auto", suffixes: Tuple[str, ...] = (".py",)):
+        self.settle, self.suffixes = settle, suffixes
+        self._digest: Dict[str, Optional[str]] = {}
+        self._be = None
+        if backend in ("auto", "inotify") and sys.platform.startswith("linux"):
+            try:
+                self._be = _Inotify(); self.backend = "inotify"
+            except (OSError, AttributeError):
+                if backend == "inotify": raise
+        if self._be is None:
+            self._be = _Poll(interval); self.backend = "poll"
+        self.set_paths(paths)
+
+    def set_paths(self, paths: Iterable[str]):
+        paths = {os.path.abspath(p) for p in paths}
+        self._digest = {p: self._digest[p] if p in self._digest else file_digest(p) for p in paths}
+        self._be.watch(paths)
+
+    def _relevant(self, p: str) -> bool:
+        return p in self._digest or p.endswith(self.suffixes)
+
+    def wait(self, timeout: Optional[float] = None) -> List[str]:
+        """timeout 秒（None は無期限）以内に内容が変わったファイルがなければ []"""
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            left = 3600.0 if end is None else end - time.monotonic()
+            if left <= 0: return []
+            touched = {p for p in self._be.read(left) if self._relevant(p)}
+            if not touched: continue
+            while True:  # 書き込みが続く間はまとめる
+                more = {p for p in self._be.read(self.settle) if self._relevant(p)}
+                if not more: break
+                touched |= more
+            changed = []
+            for p in sorted(touched):
+                d = file_digest(p)
+                if d != self._digest.get(p):
+                    self._digest[p] = d; changed.append(p)
+            if changed: return changed
+
+    def close(self):
+        self._be.close()
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()